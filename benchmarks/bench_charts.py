@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import platform
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import plotly
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+project_root_for_imports = os.path.join(os.path.dirname(__file__), '..')
+if project_root_for_imports not in sys.path:
+    sys.path.insert(0, project_root_for_imports)
+
+from pia_project_energy_analysis.schema import apply_master_schema
+
+try:
+    import kaleido  # noqa: F401
+    KALEIDO_AVAILABLE = True
+except ImportError:
+    KALEIDO_AVAILABLE = False
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+TEMP_LABEL = "Max Temperature (°F)"
+
+def generate_view_rows(city_count, years, seed=42):
+    """Generates the rows of a dashboard view at daily detail: a seasonal temperature and a noisy demand per city and day."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(f"{2024 - years}-01-01", "2023-12-31", freq='D')
+    season = np.sin(2 * np.pi * (dates.dayofyear.to_numpy() - 110) / 365.25)
+    temperature = 60 + 25 * season + rng.normal(0, 6, size=(city_count, len(dates)))
+    energy = 300000 + 60000 * np.abs(season) + rng.normal(0, 20000, size=(city_count, len(dates)))
+    df = apply_master_schema(pd.DataFrame({
+        'date': np.tile(dates, city_count),
+        'city': np.repeat([f"City {i}" for i in range(city_count)], len(dates)),
+        'TMAX_F': temperature.ravel().round(2),
+        'energy_mwh': energy.ravel().round(0)
+    }))
+    return df.assign(temp_for_analysis=df['TMAX_F'])
+
+def legacy_time_series_figure(df, total_energy_df, temp_col, temp_label, selected_city):
+    """The previous time-series figure, one SVG point per row and one shape per weekend day, kept as the benchmark baseline."""
+    fig = make_subplots(specs=[[{"secondary_y": True}]])
+    if selected_city == 'All Cities':
+        for city_name in df['city'].unique():
+            city_df = df[df['city'] == city_name]
+            fig.add_trace(go.Scatter(x=city_df['date'], y=city_df[temp_col], name=f"{city_name} ({temp_label.split(' ')[0]})", mode='lines'), secondary_y=False)
+        fig.add_trace(go.Scatter(x=total_energy_df['date'], y=total_energy_df['energy_mwh'], name='Total Energy (MWh)', line=dict(color='rgba(135, 206, 250, 0.6)', dash='dot', width=3)), secondary_y=True)
+    else:
+        fig.add_trace(go.Scatter(x=df['date'], y=df[temp_col], name=temp_label, mode='lines', line=dict(color='rgba(255, 165, 0, 0.8)')), secondary_y=False)
+        fig.add_trace(go.Scatter(x=df['date'], y=df['energy_mwh'], name='Energy (MWh)', line=dict(color='skyblue', dash='dot')), secondary_y=True)
+
+    weekends_df = df[df['day_of_week'].cat.codes >= 5]
+    for d in weekends_df['date'].unique():
+        fig.add_vrect(x0=pd.to_datetime(d) - pd.Timedelta(hours=12), x1=pd.to_datetime(d) + pd.Timedelta(hours=12), fillcolor="rgba(211, 211, 211, 0.25)", layer="below", line_width=0)
+    return fig
+
+def _figure_points(fig):
+    return sum(len(trace.x) for trace in fig.data if trace.x is not None)
+
+def measure_figure(build):
+    """
+    Builds a figure and serializes it as Streamlit does before sending it to the browser.
+    With kaleido installed, the figure is also rendered to a PNG as a stand-in for the
+    browser's render time.
+    """
+    started = time.perf_counter()
+    fig = build()
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    payload = fig.to_json()
+    serialize_seconds = time.perf_counter() - started
+    result = {
+        'build_seconds': round(build_seconds, 4),
+        'serialize_seconds': round(serialize_seconds, 4),
+        'payload_bytes': len(payload.encode('utf-8')),
+        'points': _figure_points(fig),
+        'shapes': len(fig.layout.shapes),
+        'trace_types': sorted({trace.type for trace in fig.data})
+    }
+    if KALEIDO_AVAILABLE:
+        started = time.perf_counter()
+        fig.to_image(format='png', width=1200, height=500)
+        result['render_seconds'] = round(time.perf_counter() - started, 4)
+    return result
+
+def run_case(app, city_count, years):
+    """Measures the legacy and the current daily time-series figure, for all cities and for one, at one data size."""
+    df = app._add_day_of_week(generate_view_rows(city_count, years))
+    total_energy_df = df.groupby('date')['energy_mwh'].sum().reset_index()
+    city_df = df[df['city'] == 'City 0']
+
+    figures = {
+        'all_cities': (
+            lambda: legacy_time_series_figure(df, total_energy_df, 'temp_for_analysis', TEMP_LABEL, 'All Cities'),
+            lambda: app.time_series_figure(df, total_energy_df, 'daily', 'temp_for_analysis', TEMP_LABEL, 'All Cities')
+        ),
+        'one_city': (
+            lambda: legacy_time_series_figure(city_df, city_df, 'temp_for_analysis', TEMP_LABEL, 'City 0'),
+            lambda: app.time_series_figure(city_df, city_df, 'daily', 'temp_for_analysis', TEMP_LABEL, 'City 0')
+        )
+    }
+    results = []
+    for chart, (legacy_build, current_build) in figures.items():
+        for variant, build in (('legacy', legacy_build), ('current', current_build)):
+            results.append({'chart': chart, 'variant': variant, 'cities': city_count, 'years': years, 'rows': len(df), **measure_figure(build)})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the dashboard's daily time-series figure before and after LTTB downsampling, WebGL traces and single-shape weekend shading.")
+    parser.add_argument('--cities', type=int, nargs='+', default=[5, 50], help="City counts to measure (default: 5 50).")
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 3], help="Years of daily data to measure (default: 1 3). The legacy figure adds its weekend shapes one by one, which takes minutes beyond a few years.")
+    parser.add_argument('--output', help="Results file (JSON). Defaults to benchmarks/results/bench_charts_<timestamp>.json.")
+    args = parser.parse_args()
+
+    # The figure builders live in the dashboard, which warns about a missing script context outside `streamlit run`.
+    from dashboards import app
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+    logging.getLogger('streamlit.runtime.caching.cache_data_api').disabled = True
+    if not KALEIDO_AVAILABLE:
+        print("kaleido is not installed: render times are skipped, build/serialize times and payload sizes are measured.")
+
+    results = []
+    print(f"{'chart':<12} {'variant':<8} {'cities':>6} {'years':>5} {'points':>9} {'shapes':>6} {'build s':>8} {'json s':>8} {'payload MB':>10} {'render s':>8}")
+    for city_count in args.cities:
+        for years in args.years:
+            for result in run_case(app, city_count, years):
+                results.append(result)
+                render = f"{result['render_seconds']:>8.2f}" if 'render_seconds' in result else f"{'-':>8}"
+                print(f"{result['chart']:<12} {result['variant']:<8} {result['cities']:>6} {result['years']:>5} {result['points']:>9} {result['shapes']:>6} "
+                      f"{result['build_seconds']:>8.2f} {result['serialize_seconds']:>8.2f} {result['payload_bytes'] / 1e6:>10.2f} {render}")
+
+    output_path = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"bench_charts_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'plotly': plotly.__version__,
+            'results': results
+        }, f, indent=4)
+    print(f"\nSaved results to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+import io
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import contextlib
+from datetime import datetime
+from unittest import mock
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+project_root_for_imports = os.path.join(os.path.dirname(__file__), '..')
+if project_root_for_imports not in sys.path:
+    sys.path.insert(0, project_root_for_imports)
+
+from pia_project_energy_analysis.noaa_fetcher import fetch_noaa_data
+from pia_project_energy_analysis.eia_fetcher import fetch_eia_data
+from pia_project_energy_analysis.http_transport import configure_transport, get_transport_stats
+from pia_project_energy_analysis.rate_limiter import TokenBucket
+from stub_api_server import StubSettings, start_stub_server
+
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+STATES = ['Alabama', 'Arizona', 'California', 'Colorado', 'Florida', 'Georgia', 'Illinois', 'New York', 'Ohio', 'Texas', 'Washington']
+
+def _timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+def _record_count(result):
+    """Records returned by a fetch unit; the fetchers return None or an empty result when they give up."""
+    if result is None:
+        return 0
+    return len(result['results']) if isinstance(result, dict) else len(result)
+
+def _run_units(name, units, workers):
+    """Runs the fetch units on `workers` threads and summarises their outcome and latency."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        outcomes = list(executor.map(lambda unit: _timed(*unit), units))
+    seconds = time.perf_counter() - started
+    record_counts = [_record_count(result) for result, _ in outcomes]
+    unit_seconds = [unit_seconds for _, unit_seconds in outcomes]
+    return {
+        'api': name,
+        'units': len(units),
+        'failed': record_counts.count(0),
+        'records': sum(record_counts),
+        'seconds': round(seconds, 3),
+        'unit_p50_seconds': round(float(np.percentile(unit_seconds, 50)), 3) if unit_seconds else 0,
+        'unit_p95_seconds': round(float(np.percentile(unit_seconds, 95)), 3) if unit_seconds else 0
+    }
+
+def run_load_test(base_url, units, years, workers, client_rps=None):
+    """
+    Fetches `units` stations and balancing authorities over `years` years, and searches the
+    stations of a few states, through the real fetchers against the stub server at `base_url`.
+
+    Returns:
+        list: One summary per API (units, failures, records, wall time and unit latency).
+    """
+    start_date, end_date = f"{2024 - years}-01-01", "2023-12-31"
+    noaa_limiter = TokenBucket(client_rps, name='NOAA') if client_rps else None
+    eia_limiter = TokenBucket(client_rps, name='EIA') if client_rps else None
+    noaa_units = [(fetch_noaa_data, f"{base_url}/noaa/", 'load-test-token', f"GHCND:USWLOAD{index:05d}", start_date, end_date, 'TMAX,TMIN', None, noaa_limiter) for index in range(units)]
+    eia_units = [(fetch_eia_data, f"{base_url}/eia/daily-region-data/data/", 'load-test-key', f"L{index:03d}", start_date, end_date, None, eia_limiter) for index in range(units)]
+
+    # The station search runs outside `streamlit run`, where every st.* call warns about a missing script context.
+    from dashboards import app
+    logging.getLogger('streamlit.runtime.scriptrunner_utils.script_run_context').disabled = True
+    station_units = [(app.find_noaa_stations, state, 'load-test-token') for state in STATES]
+
+    summaries = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        summaries.append(_run_units('noaa/data', noaa_units, workers))
+        summaries.append(_run_units('eia/daily-region-data', eia_units, workers))
+        with mock.patch.object(app, '_get_noaa_stations_url', return_value=f"{base_url}/noaa/stations"):
+            summaries.append(_run_units('noaa/stations', station_units, workers))
+    return summaries
+
+def main():
+    parser = argparse.ArgumentParser(description="Load and fault tests the NOAA/EIA fetchers and the dashboard's station search against the stub API server.")
+    parser.add_argument('--units', type=int, default=50, help="Stations and balancing authorities to fetch (default: 50).")
+    parser.add_argument('--years', type=int, default=2, help="Years of daily data per unit (default: 2).")
+    parser.add_argument('--workers', type=int, default=16, help="Units fetched concurrently (default: 16).")
+    parser.add_argument('--max-connections', type=int, default=16, help="Pooled connections per host (default: 16).")
+    parser.add_argument('--client-rps', type=float, help="Client-side rate limit per API, as the pipeline's token buckets apply (default: none).")
+    parser.add_argument('--url', help="Base URL of an already running stub server; the fault options below then apply to that server's own flags.")
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--jitter-ms', type=float, default=20)
+    parser.add_argument('--rate-limit', type=float, default=0, help="Server-side requests per second per API before answering 429.")
+    parser.add_argument('--error-429-rate', type=float, default=0)
+    parser.add_argument('--error-5xx-rate', type=float, default=0)
+    parser.add_argument('--malformed-rate', type=float, default=0)
+    parser.add_argument('--output', help="Results file (JSON). Defaults to benchmarks/results/bench_fetch_load_<timestamp>.json.")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+    configure_transport({'max_connections_per_host': args.max_connections})
+    server = None
+    settings = StubSettings(args.latency_ms, args.jitter_ms, args.rate_limit, args.error_429_rate, args.error_5xx_rate, args.malformed_rate)
+    base_url = args.url.rstrip('/') if args.url else None
+    if base_url is None:
+        server, base_url = start_stub_server(settings=settings)
+
+    print(f"Load testing {args.units} units x {args.years} years with {args.workers} workers against {base_url}...")
+    try:
+        summaries = run_load_test(base_url, args.units, args.years, args.workers, args.client_rps)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    print(f"{'api':<22} {'units':>6} {'failed':>7} {'records':>10} {'seconds':>9} {'records/s':>11} {'unit p50':>9} {'unit p95':>9}")
+    for summary in summaries:
+        records_per_second = summary['records'] / summary['seconds'] if summary['seconds'] else 0
+        print(f"{summary['api']:<22} {summary['units']:>6} {summary['failed']:>7} {summary['records']:>10} {summary['seconds']:>9.2f} {records_per_second:>11.0f} {summary['unit_p50_seconds']:>8.2f}s {summary['unit_p95_seconds']:>8.2f}s")
+    transport = get_transport_stats()
+    for host, stats in transport.items():
+        print(f"Transport {host}: {stats['requests']} requests, {stats['retries']} retries, {stats['throttled']} throttled (429), {stats['errors']} errors, {stats['new_connections']} new connections.")
+    if server is not None:
+        print(f"Server responses: {json.dumps(settings.stats)}")
+
+    output_path = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"bench_fetch_load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'options': vars(args),
+            'results': summaries,
+            'transport': transport,
+            'server_responses': settings.stats if server is not None else None
+        }, f, indent=4)
+    print(f"\nSaved results to {output_path}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import argparse
+import resource
+import tempfile
+import numpy as np
+import pandas as pd
+
+project_root_for_imports = os.path.join(os.path.dirname(__file__), '..')
+if project_root_for_imports not in sys.path:
+    sys.path.insert(0, project_root_for_imports)
+
+from pia_project_energy_analysis.hourly_store import HOURLY_DTYPES, _partition_path, rollup_hourly_store
+
+def _peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is in KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def generate_hourly_store(root_dir, ba_count, years, seed=42):
+    """
+    Writes a synthetic hourly store of `ba_count` balancing authorities over `years` years,
+    one month partition at a time, and returns the date range it covers.
+    """
+    rng = np.random.default_rng(seed)
+    start_date = pd.Timestamp('2019-01-01')
+    end_date = start_date + pd.DateOffset(years=years) - pd.Timedelta(days=1)
+    months = pd.period_range(start=start_date, end=end_date, freq='M')
+    for ba_index in range(ba_count):
+        ba_code = f"BA{ba_index:02d}"
+        for period in months:
+            hours = pd.date_range(period.start_time, period.end_time.floor('h'), freq='h')
+            month_df = pd.DataFrame({
+                'timestamp': (hours - pd.Timestamp(0)) // pd.Timedelta(seconds=1),
+                'energy_mwh': rng.normal(20000, 4000, size=len(hours))
+            }).astype(HOURLY_DTYPES)
+            path = _partition_path(root_dir, ba_code, period.year, period.month)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            month_df.to_parquet(path, index=False)
+    return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
+
+def main():
+    parser = argparse.ArgumentParser(description="Rolls up a synthetic hourly EIA store under a fixed row budget and reports time and peak memory.")
+    parser.add_argument('--bas', type=int, default=60, help="Number of synthetic balancing authorities.")
+    parser.add_argument('--years', type=int, default=5, help="Years of hourly data per balancing authority.")
+    parser.add_argument('--max-rows-in-memory', type=int, default=20_000, help="Row budget of each rollup chunk.")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root_dir:
+        start = time.perf_counter()
+        start_date, end_date = generate_hourly_store(root_dir, args.bas, args.years)
+        print(f"Generated {args.bas} BAs x {args.years} years of hourly data in {time.perf_counter() - start:.1f}s (peak RSS {_peak_rss_mb():.0f} MB).")
+
+        baseline_rss = _peak_rss_mb()
+        hours = 0
+        start = time.perf_counter()
+        for ba_index in range(args.bas):
+            for frequency in ('D', 'W'):
+                rollup_df = rollup_hourly_store(root_dir, f"BA{ba_index:02d}", start_date, end_date, frequency, max_rows_in_memory=args.max_rows_in_memory)
+            hours += int(rollup_df['hours'].sum())
+        seconds = time.perf_counter() - start
+
+        print(f"Rolled up {hours} hours into daily and weekly totals in {seconds:.2f}s ({hours / seconds:,.0f} hours/s).")
+        print(f"Peak RSS: {_peak_rss_mb():.0f} MB (before rollups: {baseline_rss:.0f} MB, row budget {args.max_rows_in_memory:,}).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+from datetime import datetime
+from unittest import mock
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+project_root_for_imports = os.path.join(os.path.dirname(__file__), '..')
+if project_root_for_imports not in sys.path:
+    sys.path.insert(0, project_root_for_imports)
+
+from pia_project_energy_analysis import pipeline
+from pia_project_energy_analysis.data_processor import process_noaa_data, process_eia_data, merge_and_save_data, combine_processed_data
+
+CITY_COUNTS = [5, 50, 500]
+YEAR_COUNTS = [1, 10, 30]
+STAGES = ['fetch_noaa', 'fetch_eia', 'process_noaa', 'process_eia', 'merge', 'combine']
+NOAA_PAGE_SIZE = 1000
+EIA_PAGE_SIZE = 5000
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+def synthetic_cities(city_count):
+    """Returns `city_count` synthetic city entries, shaped like the `cities` section of config.yaml."""
+    return [
+        {'name': f"City {index}", 'noaa_station_id': f"GHCND:SYN{index:08d}", 'eia_ba_code': f"B{index:03d}", 'latitude': 40.0, 'longitude': -90.0}
+        for index in range(city_count)
+    ]
+
+def _paged(df, page_size):
+    columns = list(df.columns)
+    values = [df[column].tolist() for column in columns]
+    for offset in range(0, len(df), page_size):
+        yield [dict(zip(columns, row)) for row in zip(*(column[offset:offset + page_size] for column in values))]
+
+def synthetic_noaa_pages(station_id, start_date, end_date, seed=42, page_size=NOAA_PAGE_SIZE):
+    """
+    Yields pages of synthetic NOAA GHCND records for one station in date order, with the fields
+    the API returns. About 8% of the days have TMIN > TMAX, 1% miss their TMIN reading, and
+    0.1% of the readings are repeated, as seen in real responses.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start_date, end_date, freq='D')
+    day_count = len(dates)
+    tmax = (15 + 12 * np.sin(2 * np.pi * (dates.dayofyear.to_numpy() - 100) / 365.25) + rng.normal(0, 4, day_count)).round(1)
+    tmin = (tmax - rng.uniform(-1, 12, day_count)).round(1)
+    df = pd.DataFrame({
+        'date': np.repeat(dates.strftime('%Y-%m-%dT00:00:00'), 2),
+        'datatype': np.tile(['TMAX', 'TMIN'], day_count),
+        'station': station_id,
+        'attributes': ',,W,2400',
+        'value': np.column_stack([tmax, tmin]).ravel()
+    })
+    missing_tmin = (df['datatype'] == 'TMIN').to_numpy() & (rng.random(len(df)) < 0.01)
+    df = df[~missing_tmin]
+    repeats = np.where(rng.random(len(df)) < 0.001, 2, 1)
+    df = df.loc[df.index.repeat(repeats)]
+    yield from _paged(df, page_size)
+
+def synthetic_eia_pages(ba_code, start_date, end_date, seed=42, page_size=EIA_PAGE_SIZE):
+    """
+    Yields pages of synthetic EIA daily demand records for one balancing authority in date
+    order, with the fields the API returns. About 0.1% of the days report negative demand.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start_date, end_date, freq='D')
+    values = rng.normal(300000, 50000, len(dates)).round(0)
+    values[rng.random(len(dates)) < 0.001] *= -1
+    df = pd.DataFrame({
+        'period': dates.strftime('%Y-%m-%d'),
+        'respondent': ba_code,
+        'respondent-name': f"Synthetic balancing authority {ba_code}",
+        'type': 'D',
+        'type-name': 'Demand',
+        'timezone': 'Eastern',
+        'timezone-description': 'Eastern',
+        'value': values.astype('int64'),
+        'value-units': 'megawatthours'
+    })
+    yield from _paged(df, page_size)
+
+def _peak_rss_mb():
+    """Peak resident set size of this process so far (ru_maxrss is in KB on Linux, bytes on macOS)."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+def _timed_pages(pages, timer):
+    """Yields the pages of a generator, adding the time spent generating them to timer['seconds']."""
+    while True:
+        start = time.perf_counter()
+        page = next(pages, None)
+        timer['seconds'] += time.perf_counter() - start
+        if page is None:
+            return
+        yield page
+
+def _fetch_noaa(cities, raw_dir, start_date, end_date):
+    """Runs `fetch_and_save_noaa_data` for every city, and returns the seconds spent generating pages."""
+    timer = {'seconds': 0.0}
+
+    def fake_pages(base_url, token, station_id, start, end, **kwargs):
+        return _timed_pages(synthetic_noaa_pages(station_id, start, end, seed=int(station_id[-8:])), timer)
+
+    with mock.patch.object(pipeline, 'iter_noaa_pages', fake_pages):
+        for city in cities:
+            pipeline.fetch_and_save_noaa_data(city, 'synthetic://noaa', 'token', raw_dir, start_date, end_date)
+    return timer['seconds']
+
+def _fetch_eia(cities, raw_dir, start_date, end_date):
+    """Runs `fetch_and_save_eia_data` for every city's balancing authority, and returns the seconds spent generating pages."""
+    timer = {'seconds': 0.0}
+    seeds = {city['eia_ba_code']: int(city['noaa_station_id'][-8:]) for city in cities}
+
+    def fake_pages(base_url, api_key, ba_code, start, end, **kwargs):
+        return _timed_pages(synthetic_eia_pages(ba_code, start, end, seed=seeds[ba_code]), timer)
+
+    with mock.patch.object(pipeline, 'iter_eia_pages', fake_pages):
+        for city in cities:
+            pipeline.fetch_and_save_eia_data(city['eia_ba_code'], 'synthetic://eia', 'key', raw_dir, start_date, end_date, city_names=[city['name']])
+    return timer['seconds']
+
+def _stage_inputs(stage, cities, workdir, start_date, end_date):
+    """Returns the files a stage reads and the frames it is handed (loaded before timing starts)."""
+    raw_dir = os.path.join(workdir, 'raw')
+    noaa_files = [pipeline._noaa_raw_filename(raw_dir, city['name'], start_date, end_date) for city in cities]
+    eia_files = [pipeline._eia_raw_filename(raw_dir, city['eia_ba_code'], start_date, end_date) for city in cities]
+    if stage == 'merge':
+        return {
+            'weather': pd.read_pickle(os.path.join(workdir, 'process_noaa.pkl')),
+            'energy': pd.read_pickle(os.path.join(workdir, 'process_eia.pkl'))
+        }
+    return {'noaa_files': noaa_files, 'eia_files': eia_files}
+
+def _count_records(paths):
+    total = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            total += sum(1 for _ in f)
+    return total
+
+def run_stage(stage, city_count, workdir, start_date, end_date):
+    """
+    Runs one pipeline stage for a scenario on the data the previous stages left in `workdir`.
+    Meant to run in a fresh process, so the reported peak RSS belongs to this stage alone.
+
+    Returns:
+        dict: 'rows' (records or rows handled), 'seconds', 'generation_seconds' (the time spent
+            generating synthetic pages, which is left out of 'seconds'), 'baseline_rss_mb'
+            (after loading the inputs) and 'peak_rss_mb'.
+    """
+    cities = synthetic_cities(city_count)
+    raw_dir = os.path.join(workdir, 'raw')
+    processed_dir = os.path.join(workdir, 'processed')
+    output_dir = os.path.join(workdir, 'output')
+    for directory in (raw_dir, processed_dir, output_dir):
+        os.makedirs(directory, exist_ok=True)
+    inputs = _stage_inputs(stage, cities, workdir, start_date, end_date)
+    baseline_rss = _peak_rss_mb()
+
+    generation_seconds = 0.0
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        if stage == 'fetch_noaa':
+            generation_seconds = _fetch_noaa(cities, raw_dir, start_date, end_date)
+        elif stage == 'fetch_eia':
+            generation_seconds = _fetch_eia(cities, raw_dir, start_date, end_date)
+        elif stage == 'process_noaa':
+            results = [process_noaa_data(path)[0] for path in inputs['noaa_files']]
+        elif stage == 'process_eia':
+            results = [process_eia_data(path)[0] for path in inputs['eia_files']]
+        elif stage == 'merge':
+            for city, weather_df, energy_df in zip(cities, inputs['weather'], inputs['energy']):
+                merge_and_save_data(weather_df, energy_df, city['name'], processed_dir)
+        elif stage == 'combine':
+            master_df, _ = combine_processed_data(processed_dir, output_dir, cities)
+        seconds = time.perf_counter() - start - generation_seconds
+
+    peak_rss = _peak_rss_mb()
+    if stage == 'fetch_noaa':
+        rows = _count_records(inputs['noaa_files'])
+    elif stage == 'fetch_eia':
+        rows = _count_records(inputs['eia_files'])
+    elif stage in ('process_noaa', 'process_eia'):
+        rows = _count_records(inputs['noaa_files' if stage == 'process_noaa' else 'eia_files'])
+        # The merge stage is handed these frames, as in the pipeline.
+        pd.to_pickle(results, os.path.join(workdir, f"{stage}.pkl"))
+    elif stage == 'merge':
+        rows = sum(len(pd.read_csv(os.path.join(processed_dir, f))) for f in os.listdir(processed_dir))
+    else:
+        rows = len(master_df)
+    return {'rows': rows, 'seconds': seconds, 'generation_seconds': generation_seconds, 'baseline_rss_mb': baseline_rss, 'peak_rss_mb': peak_rss}
+
+def run_scenario(city_count, years, stages=STAGES):
+    """Runs every stage of a scenario in order, each in a fresh process, on synthetic data in a temporary directory."""
+    end_date = '2023-12-31'
+    start_date = f"{2024 - years}-01-01"
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for stage in stages:
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                result = executor.submit(run_stage, stage, city_count, workdir, start_date, end_date).result()
+            result.update({
+                'cities': city_count, 'years': years, 'stage': stage,
+                'rows_per_second': result['rows'] / result['seconds'] if result['seconds'] else None
+            })
+            results.append(result)
+            print(f"{city_count:>6} {years:>5} {stage:<13} {result['rows']:>11} {result['seconds']:>9.2f} {result['rows_per_second']:>12,.0f} {result['peak_rss_mb']:>9.0f}", flush=True)
+    return results
+
+def compare_results(previous_path, results):
+    """Prints the speed-up of each stage against a previous results file (above 1.0 is faster)."""
+    with open(previous_path, 'r') as f:
+        previous = {(r['cities'], r['years'], r['stage']): r for r in json.load(f)['results']}
+    print(f"\nCompared with {previous_path}:")
+    print(f"{'cities':>6} {'years':>5} {'stage':<13} {'speed-up':>9} {'peak RSS':>9}")
+    for result in results:
+        before = previous.get((result['cities'], result['years'], result['stage']))
+        if before is None or not result['seconds']:
+            continue
+        print(f"{result['cities']:>6} {result['years']:>5} {result['stage']:<13} {before['seconds'] / result['seconds']:>8.2f}x {result['peak_rss_mb'] - before['peak_rss_mb']:>+8.0f}M")
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs the pipeline stages on synthetic NOAA/EIA payloads at several scales and reports wall time, rows/s and peak RSS per stage.")
+    parser.add_argument('--cities', type=int, nargs='+', default=CITY_COUNTS, help="City counts to run (default: 5 50 500).")
+    parser.add_argument('--years', type=int, nargs='+', default=YEAR_COUNTS, help="Years of daily data per city to run (default: 1 10 30).")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help="Stages to run; later stages need the output of earlier ones.")
+    parser.add_argument('--output', help="Results file (JSON). Defaults to benchmarks/results/bench_pipeline_<timestamp>.json.")
+    parser.add_argument('--compare', metavar='RESULTS_JSON', help="A previous results file to compare against.")
+    args = parser.parse_args()
+
+    print("Fetch stages stream synthetic pages in place of the API. They time page handling and NDJSON writes; the network and page generation are left out.")
+    print(f"{'cities':>6} {'years':>5} {'stage':<13} {'rows':>11} {'seconds':>9} {'rows/s':>12} {'peak MB':>9}")
+    results = []
+    for city_count in args.cities:
+        for years in args.years:
+            results.extend(run_scenario(city_count, years, args.stages))
+
+    output_path = args.output or os.path.join(DEFAULT_RESULTS_DIR, f"bench_pipeline_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    with open(output_path, 'w') as f:
+        json.dump({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'environment': {
+                'python': platform.python_version(), 'pandas': pd.__version__, 'numpy': np.__version__,
+                'platform': platform.platform(), 'cpu_count': os.cpu_count()
+            },
+            'results': results
+        }, f, indent=4)
+    print(f"\nSaved results to {output_path}")
+
+    if args.compare:
+        compare_results(args.compare, results)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import os
+import sys
+import time
+import argparse
+import contextlib
+import numpy as np
+import pandas as pd
+
+project_root_for_imports = os.path.join(os.path.dirname(__file__), '..')
+if project_root_for_imports not in sys.path:
+    sys.path.insert(0, project_root_for_imports)
+
+from pia_project_energy_analysis.data_processor import _transform_noaa_records, _transform_eia_records
+
+def generate_noaa_records(row_count, city_count, seed=42):
+    """
+    Generates synthetic raw NOAA records (a TMAX and a TMIN reading per city and day) in the
+    shape the fetchers store them, with a few duplicate readings and TMIN > TMAX days mixed in.
+    """
+    rng = np.random.default_rng(seed)
+    days = max(1, row_count // (2 * city_count))
+    dates = pd.date_range('1990-01-01', periods=days, freq='D').strftime('%Y-%m-%dT00:00:00')
+    cities = np.repeat([f"City {i}" for i in range(city_count)], days * 2)
+    tmax = rng.normal(20, 8, size=(city_count, days)).round(1)
+    tmin = (tmax - rng.uniform(-1, 12, size=(city_count, days))).round(1)
+    df = pd.DataFrame({
+        'city': cities,
+        'date': np.tile(np.repeat(dates, 2), city_count),
+        'datatype': np.tile(['TMAX', 'TMIN'], city_count * days),
+        'station': 'GHCND:SYNTHETIC',
+        'value': np.column_stack([tmax.ravel(), tmin.ravel()]).ravel()
+    })
+    duplicates = df.sample(n=max(1, len(df) // 10000), random_state=seed)
+    return pd.concat([df, duplicates], ignore_index=True)
+
+def generate_eia_records(row_count, city_count, seed=42):
+    """Generates synthetic raw EIA records (one demand value per city and day), including a few negative days."""
+    rng = np.random.default_rng(seed)
+    days = max(1, row_count // city_count)
+    dates = pd.date_range('1990-01-01', periods=days, freq='D').strftime('%Y-%m-%d')
+    values = rng.normal(300000, 50000, size=city_count * days).round(0)
+    values[rng.choice(len(values), size=max(1, len(values) // 10000), replace=False)] *= -1
+    return pd.DataFrame({
+        'city': np.repeat([f"City {i}" for i in range(city_count)], days),
+        'period': np.tile(dates, city_count),
+        'respondent': 'SYN',
+        'type': 'D',
+        'value': values
+    })
+
+def legacy_noaa_transform(df):
+    """The previous row-wise NOAA transform, one city at a time, kept as the benchmark baseline."""
+    def convert(temp_in_c):
+        if pd.isna(temp_in_c):
+            return None
+        return round((temp_in_c * 9/5) + 32, 2)
+
+    frames, warnings = [], []
+    for city_name, city_df in df.groupby('city', sort=False):
+        city_df = city_df.copy()
+        city_df['date'] = pd.to_datetime(city_df['date']).dt.date
+        city_df = city_df.drop_duplicates(subset=['date', 'datatype'], keep='first')
+        weather_df = city_df.pivot(index='date', columns='datatype', values='value').reset_index()
+        weather_df['TMAX_F'] = weather_df['TMAX'].apply(convert)
+        weather_df['TMIN_F'] = weather_df['TMIN'].apply(convert)
+        valid_temps_df = weather_df.dropna(subset=['TMIN_F', 'TMAX_F'])
+        for _, row in valid_temps_df[valid_temps_df['TMIN_F'] > valid_temps_df['TMAX_F']].iterrows():
+            warnings.append({"file": city_name, "message": f"Date {row.get('date')}: TMIN ({row.get('TMIN_F')}°F) > TMAX ({row.get('TMAX_F')}°F)."})
+        frames.append(weather_df[['date', 'TMAX_F', 'TMIN_F']].assign(city=city_name))
+    return pd.concat(frames, ignore_index=True), warnings
+
+def legacy_eia_transform(df):
+    """The previous EIA transform with row-wise warnings, one city at a time, kept as the benchmark baseline."""
+    frames, warnings = [], []
+    for city_name, city_df in df.groupby('city', sort=False):
+        city_df = city_df.rename(columns={'value': 'energy_mwh'})
+        city_df['date'] = pd.to_datetime(city_df['period']).dt.date
+        city_df['energy_mwh'] = pd.to_numeric(city_df['energy_mwh'], errors='coerce')
+        daily_energy_df = city_df.groupby('date')['energy_mwh'].sum().reset_index()
+        daily_energy_df['energy_mwh'] = daily_energy_df['energy_mwh'].round(2)
+        for _, row in daily_energy_df[daily_energy_df['energy_mwh'] < 0].iterrows():
+            warnings.append({"file": city_name, "message": f"Date {row.get('date')}: Negative energy consumption detected ({row.get('energy_mwh')} MWh)."})
+        frames.append(daily_energy_df.assign(city=city_name))
+    return pd.concat(frames, ignore_index=True), warnings
+
+def _time(function, *args):
+    """Times a call with its console output (the data quality messages) discarded."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        result = function(*args)
+        elapsed = time.perf_counter() - start
+    return result, elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the row-wise and vectorized NOAA/EIA processing paths.")
+    parser.add_argument('--rows', type=int, default=1_000_000, help="Approximate number of raw records per source.")
+    parser.add_argument('--cities', type=int, default=50, help="Number of synthetic cities.")
+    parser.add_argument('--skip-legacy', action='store_true', help="Only time the vectorized path.")
+    args = parser.parse_args()
+
+    noaa_df = generate_noaa_records(args.rows, args.cities)
+    eia_df = generate_eia_records(args.rows, args.cities)
+    labels = {city_name: city_name for city_name in noaa_df['city'].unique()}
+
+    print(f"{'source':<6} {'path':<11} {'rows':>10} {'seconds':>9} {'ns/row':>8} {'warnings':>9}")
+    for source, raw_df, vectorized, legacy in [
+        ('NOAA', noaa_df, lambda df: _transform_noaa_records(df, ['city'], labels), legacy_noaa_transform),
+        ('EIA', eia_df, lambda df: _transform_eia_records(df, ['city'], labels), legacy_eia_transform),
+    ]:
+        paths = [('vectorized', vectorized)] + ([] if args.skip_legacy else [('row-wise', legacy)])
+        results = {}
+        for path_name, transform in paths:
+            (result_df, warnings), seconds = _time(transform, raw_df)
+            results[path_name] = result_df
+            print(f"{source:<6} {path_name:<11} {len(raw_df):>10} {seconds:>9.2f} {seconds / len(raw_df) * 1e9:>8.0f} {len(warnings):>9}")
+
+        if 'row-wise' in results:
+            value_columns = [column for column in results['vectorized'].columns if column not in ('city', 'date')]
+            key = ['city', 'date']
+            expected = results['row-wise'].sort_values(key).reset_index(drop=True)
+            actual = results['vectorized'].sort_values(key).reset_index(drop=True)
+            matches = np.allclose(expected[value_columns].astype(float), actual[value_columns].astype(float), equal_nan=True)
+            print(f"{source:<6} results match the row-wise path: {matches}")
+
+if __name__ == "__main__":
+    main()
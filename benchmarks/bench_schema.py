@@ -0,0 +1,34 @@
+import os
+import sys
+import argparse
+import pandas as pd
+
+project_root_for_imports = os.path.join(os.path.dirname(__file__), '..')
+if project_root_for_imports not in sys.path:
+    sys.path.insert(0, project_root_for_imports)
+
+from pia_project_energy_analysis.schema import MEASUREMENT_DTYPES, apply_master_schema, frame_memory_bytes, measurement_round_trip_mismatches
+
+DEFAULT_MASTER_CSV = os.path.join(project_root_for_imports, 'data', 'output', 'master_energy_weather_data.csv')
+
+def main():
+    parser = argparse.ArgumentParser(description="Converts a master CSV to the compact schema, reports its memory and checks that no measurement changes on the round trip.")
+    parser.add_argument('--master-csv', default=DEFAULT_MASTER_CSV, help="The master CSV to convert. Defaults to the sample output.")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.master_csv)
+    compact_df = apply_master_schema(df)
+    before_mb = frame_memory_bytes(df) / 1024 / 1024
+    after_mb = frame_memory_bytes(compact_df) / 1024 / 1024
+    print(f"{len(df)} rows: {before_mb:.2f} MB -> {after_mb:.2f} MB in the compact schema.")
+
+    mismatches = measurement_round_trip_mismatches(df)
+    print(f"{'column':<12} {'dtype':<8} {'max':>14} {'changed':>8}")
+    for column, changed in mismatches.items():
+        print(f"{column:<12} {MEASUREMENT_DTYPES[column]:<8} {pd.to_numeric(df[column], errors='coerce').abs().max():>14.2f} {changed:>8}")
+    if any(mismatches.values()):
+        sys.exit("Measurements changed on the round trip through the compact schema.")
+    print("All measurements survive the round trip through the compact schema.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,327 @@
+import json
+import gzip
+import time
+import zlib
+import random
+import argparse
+import threading
+import functools
+from datetime import datetime, date, timedelta
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+import numpy as np
+
+# A local stand-in for NOAA CDO v2 (/data, /stations) and EIA v2 (daily-region-data, region-data),
+# for load and fault testing the fetchers without spending API quota. Point config.yaml at it:
+#   noaa_base_url: http://127.0.0.1:8765/noaa/
+#   eia_base_url: http://127.0.0.1:8765/eia/daily-region-data/data/
+#   eia_hourly_base_url: http://127.0.0.1:8765/eia/region-data/data/
+# Responses are deterministic per station / balancing authority and day, so repeated or
+# concurrent runs fetch identical data.
+
+NOAA_MAX_LIMIT = 1000
+EIA_MAX_LENGTH = 5000
+STATIONS_PER_STATE = 40
+
+def _stable_seed(*parts):
+    return zlib.crc32('|'.join(str(part) for part in parts).encode('utf-8'))
+
+@functools.lru_cache(maxsize=16384)
+def _station_year(station_id, year):
+    """Daily TMAX/TMIN (°C, one decimal) of a station for one year, with a few TMIN > TMAX days."""
+    rng = np.random.default_rng(_stable_seed('noaa', station_id, year))
+    level = np.random.default_rng(_stable_seed('noaa', station_id)).uniform(8, 24)
+    day_of_year = np.arange(366)
+    tmax = (level + 12 * np.sin(2 * np.pi * (day_of_year - 100) / 365.25) + rng.normal(0, 4, 366)).round(1)
+    tmin = (tmax - rng.uniform(-1, 12, 366)).round(1)
+    return tmax.tolist(), tmin.tolist()
+
+@functools.lru_cache(maxsize=16384)
+def _ba_year(ba_code, year):
+    """Hourly demand (MWh) of a balancing authority for one year, with a daily cycle and a few negative hours."""
+    rng = np.random.default_rng(_stable_seed('eia', ba_code, year))
+    level = np.random.default_rng(_stable_seed('eia', ba_code)).uniform(5000, 40000)
+    hours = np.arange(366 * 24)
+    demand = level * (1 + 0.25 * np.sin(2 * np.pi * (hours % 24 - 9) / 24)) + rng.normal(0, 500, len(hours))
+    demand[rng.random(len(hours)) < 0.0005] *= -1
+    return demand.round(0).astype('int64').tolist()
+
+def _temperature(station_id, datatype, day):
+    tmax, tmin = _station_year(station_id, day.year)
+    return (tmax if datatype == 'TMAX' else tmin)[day.timetuple().tm_yday - 1]
+
+def _demand(ba_code, day, hour=None):
+    series = _ba_year(ba_code, day.year)
+    first_hour = (day.timetuple().tm_yday - 1) * 24
+    if hour is None:
+        return int(sum(series[first_hour:first_hour + 24]))
+    return series[first_hour + hour]
+
+def _parse_date(value):
+    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+class StubSettings:
+    """
+    Latency and fault injection for the stub server. Rates are probabilities per request.
+
+    Args:
+        latency_ms (float): Base latency added to every response.
+        jitter_ms (float): Extra uniformly distributed latency.
+        rate_limit (float): Requests per second allowed per API before 429s (0 for no limit).
+        error_429_rate (float): Share of requests answered with 429 and a Retry-After header.
+        error_5xx_rate (float): Share of requests answered with 500, 502 or 503.
+        malformed_rate (float): Share of requests answered with a truncated JSON body.
+        retry_after (int): The Retry-After value (seconds) sent with 429 and 503 responses.
+        seed (int): Seed of the fault injection.
+    """
+    def __init__(self, latency_ms=0, jitter_ms=0, rate_limit=0, error_429_rate=0, error_5xx_rate=0, malformed_rate=0, retry_after=1, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_limit = rate_limit
+        self.error_429_rate = error_429_rate
+        self.error_5xx_rate = error_5xx_rate
+        self.malformed_rate = malformed_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._windows = {}
+        self.stats = {}
+
+    def draw(self):
+        with self._lock:
+            return self._random.random()
+
+    def over_rate_limit(self, api):
+        """Counts a request against the API's one-second window; True if it exceeds the rate limit."""
+        if not self.rate_limit:
+            return False
+        with self._lock:
+            second = int(time.monotonic())
+            window_second, count = self._windows.get(api, (second, 0))
+            if window_second != second:
+                window_second, count = second, 0
+            self._windows[api] = (window_second, count + 1)
+            return count + 1 > self.rate_limit
+
+    def record(self, endpoint, status):
+        with self._lock:
+            counters = self.stats.setdefault(endpoint, {})
+            counters[str(status)] = counters.get(str(status), 0) + 1
+
+def noaa_data_response(params):
+    """Builds a NOAA CDO /data response: results sorted by date, datatype and station, paged by 1-based offset/limit."""
+    start_date, end_date = _parse_date(params['startdate'][0]), _parse_date(params['enddate'][0])
+    if (end_date - start_date).days >= 366:
+        return 400, {"status": "400", "message": "The date range must be less than 1 year."}
+    limit = int(params.get('limit', ['25'])[0])
+    if limit > NOAA_MAX_LIMIT:
+        return 400, {"status": "400", "message": f"The limit must be less than or equal to {NOAA_MAX_LIMIT}."}
+    offset = int(params.get('offset', ['1'])[0])
+    datatypes = sorted({datatype for value in params.get('datatypeid', ['TMAX,TMIN']) for datatype in value.split(',')} & {'TMAX', 'TMIN'})
+    stations = sorted({station for value in params.get('stationid', []) for station in value.split(',')})
+    day_count = (end_date - start_date).days + 1
+    total = day_count * len(datatypes) * len(stations)
+
+    results = []
+    per_day = len(datatypes) * len(stations)
+    for position in range(offset - 1, min(total, offset - 1 + limit)):
+        day_offset, rest = divmod(position, per_day)
+        datatype, station_id = datatypes[rest // len(stations)], stations[rest % len(stations)]
+        day = start_date + timedelta(days=day_offset)
+        results.append({'date': f"{day.isoformat()}T00:00:00", 'datatype': datatype, 'station': station_id, 'attributes': ',,W,2400', 'value': _temperature(station_id, datatype, day)})
+    if not results:
+        return 200, {}
+    return 200, {'metadata': {'resultset': {'offset': offset, 'count': total, 'limit': limit}}, 'results': results}
+
+def noaa_stations_response(params):
+    """Builds a NOAA CDO /stations response for a FIPS:<state> location: a mix of active, stale, major and minor stations."""
+    location = params.get('locationid', ['FIPS:00'])[0]
+    fips = location.split(':')[-1]
+    limit = min(int(params.get('limit', ['25'])[0]), NOAA_MAX_LIMIT)
+    offset = int(params.get('offset', ['1'])[0])
+    rng = random.Random(_stable_seed('stations', fips))
+    today = date.today()
+    stations = []
+    for index in range(STATIONS_PER_STATE):
+        major = index % 4 == 0
+        stale = index % 7 == 3
+        stations.append({
+            'elevation': round(rng.uniform(0, 2000), 1),
+            'mindate': '1990-01-01',
+            'maxdate': (today - timedelta(days=800 if stale else rng.randint(1, 10))).isoformat(),
+            'latitude': round(rng.uniform(25, 48), 4),
+            'name': f"STUB CITY {index} {'AIRPORT' if major else 'COOP'}, {fips} US",
+            'datacoverage': round(rng.uniform(0.8, 1.0), 4),
+            'id': f"GHCND:{'USW' if major else 'USC'}{fips}{index:06d}",
+            'elevationUnit': 'METERS',
+            'longitude': round(rng.uniform(-124, -70), 4)
+        })
+    page = stations[offset - 1:offset - 1 + limit]
+    if not page:
+        return 200, {}
+    return 200, {'metadata': {'resultset': {'offset': offset, 'count': len(stations), 'limit': limit}}, 'results': page}
+
+def eia_response(params, frequency):
+    """Builds an EIA v2 daily-region-data or region-data response for one or more respondents, paged by offset/length."""
+    length = int(params.get('length', [str(EIA_MAX_LENGTH)])[0])
+    if length > EIA_MAX_LENGTH:
+        return 400, {'error': f"length must be less than or equal to {EIA_MAX_LENGTH}.", 'code': 400}
+    offset = int(params.get('offset', ['0'])[0])
+    respondents = sorted(set(params.get('facets[respondent][]', [])))
+    types = params.get('facets[type][]', ['D'])
+    if 'D' not in types:
+        respondents = []
+    start, end = params['start'][0], params['end'][0]
+    hourly = frequency == 'hourly'
+    start_day, end_day = _parse_date(start), _parse_date(end)
+    start_hour = int(start[11:13]) if hourly and len(start) > 10 else 0
+    end_hour = int(end[11:13]) if hourly and len(end) > 10 else 23
+    period_count = ((end_day - start_day).days * 24 + end_hour - start_hour + 1) if hourly else ((end_day - start_day).days + 1)
+    total = max(0, period_count) * len(respondents)
+
+    data = []
+    for position in range(offset, min(total, offset + length)):
+        period_offset, respondent_index = divmod(position, len(respondents))
+        ba_code = respondents[respondent_index]
+        if hourly:
+            day_offset, hour = divmod(start_hour + period_offset, 24)
+            day = start_day + timedelta(days=day_offset)
+            period, value = f"{day.isoformat()}T{hour:02d}", _demand(ba_code, day, hour)
+        else:
+            day = start_day + timedelta(days=period_offset)
+            period, value = day.isoformat(), _demand(ba_code, day)
+        record = {'period': period, 'respondent': ba_code, 'respondent-name': f"Stub balancing authority {ba_code}", 'type': 'D', 'type-name': 'Demand', 'value': value, 'value-units': 'megawatthours'}
+        if not hourly:
+            record.update({'timezone': 'Eastern', 'timezone-description': 'Eastern'})
+        data.append(record)
+    return 200, {
+        'response': {'total': str(total), 'dateFormat': 'YYYY-MM-DD"T"HH24' if hourly else 'YYYY-MM-DD', 'frequency': 'local-hourly' if hourly else 'daily', 'data': data, 'description': 'Stub demand data'},
+        'request': {'command': f"/v2/electricity/rto/{'region-data' if hourly else 'daily-region-data'}/data/", 'params': {key: values[0] if len(values) == 1 else values for key, values in params.items() if key != 'api_key'}},
+        'apiVersion': '2.1.8'
+    }
+
+def _route(path):
+    """Maps a request path to (api, endpoint), or (None, None) for unknown paths."""
+    path = path.rstrip('/')
+    if path.endswith('/noaa/data'):
+        return 'noaa', 'noaa/data'
+    if path.endswith('/noaa/stations'):
+        return 'noaa', 'noaa/stations'
+    if path.endswith('/daily-region-data/data'):
+        return 'eia', 'eia/daily-region-data'
+    if path.endswith('/region-data/data'):
+        return 'eia', 'eia/region-data'
+    return None, None
+
+class StubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    settings = StubSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, endpoint, headers=None):
+        payload = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload, compresslevel=1)
+            headers = dict(headers or {}, **{'Content-Encoding': 'gzip'})
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+        self.settings.record(endpoint, status)
+
+    def do_GET(self):
+        settings = self.settings
+        parts = urlsplit(self.path)
+        params = parse_qs(parts.query)
+        api, endpoint = _route(parts.path)
+        if parts.path.rstrip('/').endswith('/stats'):
+            return self._send(200, settings.stats, 'stats')
+        if api is None:
+            return self._send(404, {'error': f"Unknown endpoint {parts.path}"}, 'unknown')
+
+        if settings.latency_ms or settings.jitter_ms:
+            time.sleep((settings.latency_ms + settings.draw() * settings.jitter_ms) / 1000)
+        if api == 'noaa' and not self.headers.get('token'):
+            return self._send(400, {'status': '400', 'message': 'Token parameter is required.'}, endpoint)
+        if api == 'eia' and not params.get('api_key'):
+            return self._send(403, {'error': {'code': 'API_KEY_MISSING', 'message': 'No api_key was supplied.'}}, endpoint)
+
+        if settings.over_rate_limit(api):
+            return self._send(429, {'status': '429', 'message': 'Rate limit exceeded.'}, endpoint, {'Retry-After': str(settings.retry_after)})
+        draw = settings.draw()
+        if draw < settings.error_429_rate:
+            return self._send(429, {'status': '429', 'message': 'Too many requests.'}, endpoint, {'Retry-After': str(settings.retry_after)})
+        draw -= settings.error_429_rate
+        if draw < settings.error_5xx_rate:
+            status = (500, 502, 503)[int(draw / settings.error_5xx_rate * 3) % 3]
+            return self._send(status, {'status': str(status), 'message': 'Injected server error.'}, endpoint, {'Retry-After': str(settings.retry_after)} if status == 503 else None)
+        draw -= settings.error_5xx_rate
+
+        try:
+            if endpoint == 'noaa/data':
+                status, body = noaa_data_response(params)
+            elif endpoint == 'noaa/stations':
+                status, body = noaa_stations_response(params)
+            else:
+                status, body = eia_response(params, 'hourly' if endpoint == 'eia/region-data' else params.get('frequency', ['daily'])[0])
+        except (KeyError, ValueError) as e:
+            return self._send(400, {'status': '400', 'message': f"Invalid request parameters: {e}"}, endpoint)
+
+        if status == 200 and draw < settings.malformed_rate:
+            payload = json.dumps(body).encode('utf-8')
+            return self._send(200, payload[:max(1, len(payload) // 2)], endpoint)
+        return self._send(status, body, endpoint)
+
+def start_stub_server(host='127.0.0.1', port=0, settings=None):
+    """
+    Starts the stub server on a background thread.
+
+    Args:
+        host (str, optional): The interface to listen on. Defaults to 127.0.0.1.
+        port (int, optional): The port; 0 picks a free one. Defaults to 0.
+        settings (StubSettings, optional): Latency and fault injection. Defaults to none.
+
+    Returns:
+        tuple: The server (call `shutdown()` to stop it) and its base URL, e.g. 'http://127.0.0.1:8765'.
+    """
+    handler = type('ConfiguredStubRequestHandler', (StubRequestHandler,), {'settings': settings or StubSettings()})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+def main():
+    parser = argparse.ArgumentParser(description="Serves stand-ins for the NOAA CDO and EIA v2 endpoints used by the pipeline, with injectable latency and faults.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0, help="Base latency of every response.")
+    parser.add_argument('--jitter-ms', type=float, default=0, help="Extra random latency of up to this many milliseconds.")
+    parser.add_argument('--rate-limit', type=float, default=0, help="Requests per second allowed per API before answering 429 (0 for no limit).")
+    parser.add_argument('--error-429-rate', type=float, default=0, help="Share of requests answered with 429.")
+    parser.add_argument('--error-5xx-rate', type=float, default=0, help="Share of requests answered with 500, 502 or 503.")
+    parser.add_argument('--malformed-rate', type=float, default=0, help="Share of requests answered with a truncated JSON body.")
+    parser.add_argument('--retry-after', type=int, default=1, help="Retry-After seconds sent with 429 and 503 responses.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of the fault injection.")
+    args = parser.parse_args()
+
+    settings = StubSettings(args.latency_ms, args.jitter_ms, args.rate_limit, args.error_429_rate, args.error_5xx_rate, args.malformed_rate, args.retry_after, args.seed)
+    server, base_url = start_stub_server(args.host, args.port, settings)
+    print(f"Stub NOAA/EIA server listening on {base_url}. Point config/config.yaml at it:")
+    print(f"  noaa_base_url: {base_url}/noaa/")
+    print(f"  eia_base_url: {base_url}/eia/daily-region-data/data/")
+    print(f"  eia_hourly_base_url: {base_url}/eia/region-data/data/")
+    print(f"Request counts per endpoint and status are served at {base_url}/stats. Press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(settings.stats, indent=4))
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import streamlit as st
+import numpy as np
 import pandas as pd
 import json
 import plotly.express as px
@@ -9,15 +10,20 @@ import yaml
 import subprocess
 import sys
 import time
-import statsmodels.api as sm
-from tenacity import retry, stop_after_attempt, wait_exponential
-import requests
 
 project_root_for_imports = os.path.join(os.path.dirname(__file__), '..')
 if project_root_for_imports not in sys.path:
     sys.path.insert(0, project_root_for_imports)
 
 from pia_project_energy_analysis.config_loader import load_configuration
+from pia_project_energy_analysis.http_transport import http_get, api_retry
+from pia_project_energy_analysis.master_store import PARQUET_AVAILABLE, load_master_manifest, read_master_dataset
+from pia_project_energy_analysis.schema import apply_master_schema, export_measurements, frame_memory_bytes, record_memory_usage
+from pia_project_energy_analysis.analytic_queries import get_store_summary, query_observations, query_summary_metrics, query_daily_energy_totals, query_latest_snapshot, query_heatmap_cell_sums, query_regression_sums
+from pia_project_energy_analysis.regression_index import SUM_NAMES, build_prefix_sums, prefix_sums_by_city, window_sums, row_sums, regression_from_sums
+from pia_project_energy_analysis.heatmap_cube import WEEKDAYS, HEATMAP_BIN_WIDTHS, DEFAULT_HEATMAP_BIN_WIDTH, build_heatmap_cube, heatmap_cube_index, window_cell_sums, row_cell_sums, heatmap_from_cell_sums
+from pia_project_energy_analysis.rollups import ROLLUPS_DIRNAME, ROLLUPS_MANIFEST_FILENAME, read_rollups, choose_rollup_level, select_rollup_rows
+from pia_project_energy_analysis.downsampling import lttb_indices
 
 CITY_TO_BA_MAPPING = {
     "new york": "NYIS", "los angeles": "CISO", "chicago": "PJM", "houston": "ERCO", "phoenix": "AZPS", 
@@ -76,12 +82,25 @@ class CityToBaMapper:
                 return STATE_TO_PRIMARY_BA[state_name_lower], "State Estimate"
         return 'N/A', "No Match"
 
-@retry(wait=wait_exponential(multiplier=1, min=2, max=10), stop=stop_after_attempt(3))
-def _make_station_request(params, headers):
-    url = "https://www.ncei.noaa.gov/cdo-web/api/v2/stations"
-    response = requests.get(url, params=params, headers=headers, timeout=20)
-    response.raise_for_status()
-    return response.json()
+def _load_config():
+    config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'config.yaml')
+    try:
+        with open(config_path, 'r') as f:
+            return yaml.safe_load(f) or {}
+    except (FileNotFoundError, yaml.YAMLError):
+        return {}
+
+def _get_data_path(key, default):
+    project_root = os.path.join(os.path.dirname(__file__), '..')
+    return os.path.join(project_root, (_load_config().get('data_paths') or {}).get(key, default))
+
+def _get_noaa_stations_url():
+    base_url = (_load_config().get('api_endpoints') or {}).get('noaa_base_url', "https://www.ncei.noaa.gov/cdo-web/api/v2/")
+    return f"{base_url.rstrip('/')}/stations"
+
+@api_retry
+def _make_station_request(url, params, headers):
+    return http_get(url, params=params, headers=headers, timeout=20)
 
 def find_noaa_stations(state_name, noaa_token):
     if not noaa_token:
@@ -95,7 +114,9 @@ def find_noaa_stations(state_name, noaa_token):
     params = {'datasetid': 'GHCND', 'locationid': f'FIPS:{fips_code}', 'limit': 1000}
     try:
         with st.spinner(f"Searching for weather stations in {state_name}..."):
-            data = _make_station_request(params, headers)
+            response = _make_station_request(_get_noaa_stations_url(), params, headers)
+            response.raise_for_status()
+            data = response.json()
         results = data.get('results', [])
         if results:
             df = pd.DataFrame(results)            
@@ -128,11 +149,151 @@ def find_noaa_stations(state_name, noaa_token):
         st.error(f"Failed to fetch stations from NOAA API: {e}")
         return None
 
-@st.cache_data
-def load_data():
+TEMP_METRIC_KEYS = {
+    'Max Temperature (TMAX)': 'TMAX',
+    'Min Temperature (TMIN)': 'TMIN',
+    'Average Temperature': 'AVG'
+}
+# The master data column holding each temperature metric; 'temp_avg' is derived once when the data is loaded.
+TEMP_METRIC_COLUMNS = {'TMAX': 'TMAX_F', 'TMIN': 'TMIN_F', 'AVG': 'temp_avg'}
+# Line charts are downsampled with LTTB to about LTTB_CHART_POINTS points, shared between their
+# series within the per-series bounds; charts with more points than the threshold use WebGL.
+LTTB_CHART_POINTS = 20000
+LTTB_MIN_POINTS_PER_TRACE = 250
+LTTB_MAX_POINTS_PER_TRACE = 1000
+WEBGL_POINT_THRESHOLD = 5000
+
+
+def _get_master_dataset_dir():
+    return _get_data_path('master_dataset_dir', 'data/output/master')
+
+def _get_analytic_db_path():
+    return _get_data_path('analytic_db', 'data/output/energy_weather.db')
+
+def _get_master_csv_path():
+    return os.path.join(os.path.dirname(__file__), '..', 'data', 'output', 'master_energy_weather_data.csv')
+
+def _get_rollups_dir():
+    return os.path.join(os.path.dirname(__file__), '..', 'data', 'output', ROLLUPS_DIRNAME)
+
+def _file_version(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}-{stat.st_size}"
+
+def get_master_csv_version():
+    """Returns a version stamp of the master CSV file (its modification time and size) for cache keys, or None if it is missing."""
+    return _file_version(_get_master_csv_path())
+
+def get_rollups_version():
+    """Returns a version stamp of the pipeline's rollups (their manifest, rewritten on every update) for cache keys, or None if they are missing."""
+    return _file_version(os.path.join(_get_rollups_dir(), ROLLUPS_MANIFEST_FILENAME))
+
+def load_master_summary():
+    """
+    Returns the partitioned master dataset's manifest summary (date range, cities and a version
+    stamp for caching), or None if only the master CSV file is available.
+    """
+    if not PARQUET_AVAILABLE:
+        return None
+    manifest = load_master_manifest(_get_master_dataset_dir())
+    if manifest is None:
+        return None
+    partitions = manifest.get('partitions', [])
+    return {
+        'min_date': min((p['min_date'] for p in partitions), default=None),
+        'max_date': max((p['max_date'] for p in partitions), default=None),
+        'cities': manifest.get('cities', []),
+        'version': manifest.get('updated_at')
+    }
+
+@st.cache_data(max_entries=32)
+def load_store_view(start_date, end_date, metric, city=None, data_version=None):
+    """
+    Loads everything the dashboard shows for one set of filters from the analytic store:
+    the filtered rows, the headline metrics, the map snapshot, the daily energy totals, the
+    usage heatmap's cell sums and the per-city regression sums. Filtering and aggregation run
+    in SQLite on indexed columns. `data_version` only serves as part of the cache key.
+    """
+    db_path = _get_analytic_db_path()
+    try:
+        view = {
+            'rows': _add_day_of_week(apply_master_schema(query_observations(db_path, start_date, end_date, metric, city))),
+            'metrics': query_summary_metrics(db_path, start_date, end_date, metric, city),
+            'map_data': query_latest_snapshot(db_path, start_date, end_date, metric),
+            'energy_totals': query_daily_energy_totals(db_path, start_date, end_date, metric)
+        }
+    except Exception as e:
+        st.error(f"An error occurred while querying the analytic store: {e}")
+        st.stop()
+    try:
+        view['regression_sums'] = query_regression_sums(db_path, start_date, end_date, metric, city)
+    except pd.errors.DatabaseError:
+        # A store written before the regression prefix sums existed gets them on the next pipeline run.
+        view['regression_sums'] = row_sums(view['rows'], 'temp_for_analysis')
+    try:
+        view['heatmap_cells'] = query_heatmap_cell_sums(db_path, start_date, end_date, metric, city)
+    except pd.errors.DatabaseError:
+        # Likewise for a store written before the heatmap cube existed.
+        view['heatmap_cells'] = row_cell_sums(view['rows'], 'temp_for_analysis')
+    return view
+
+def _add_city_coordinates(df, config_path):
+    try:
+        with open(config_path, 'r') as f:
+            config = yaml.safe_load(f)
+        
+        coordinates = {city['name']: (city.get('latitude'), city.get('longitude')) for city in config.get('cities', []) if 'name' in city}
+        # Each coordinate is looked up once per city category, then taken by category code; the
+        # trailing NaN is picked by the code -1 of rows without a city.
+        city_coordinates = np.array(
+            [[np.nan if value is None else value for value in coordinates.get(name, (None, None))] for name in df['city'].cat.categories] + [[np.nan, np.nan]],
+            dtype='float32'
+        )
+        row_coordinates = city_coordinates[df['city'].cat.codes.to_numpy()]
+        return df.assign(latitude=row_coordinates[:, 0], longitude=row_coordinates[:, 1])
+
+    except (FileNotFoundError, yaml.YAMLError) as e:
+        st.warning(f"Could not load city coordinates from config file: {e}")
+        return df
+
+def _add_day_of_week(df):
+    """Adds 'day_of_week' as a categorical of weekday names, ordered Monday to Sunday."""
+    codes = df['date'].dt.weekday.fillna(-1).astype('int8')
+    return df.assign(day_of_week=pd.Categorical.from_codes(codes, categories=WEEKDAYS, ordered=True))
+
+def _add_derived_columns(df):
+    """
+    Adds the columns the views are built from, once per load rather than on every rerun:
+    the average temperature ('temp_avg') and the day of the week.
+    """
+    return _add_day_of_week(df.assign(temp_avg=((df['TMAX_F'] + df['TMIN_F']) / 2).astype('float32')))
+
+@st.cache_data(max_entries=4)
+def load_data(start_date=None, end_date=None, data_version=None, partitioned=False):
+    """
+    Loads the master data in the compact master schema, with the city coordinates and the
+    derived columns of `_add_derived_columns`. With `partitioned`, only the partitions of the
+    partitioned master dataset overlapping the date range are read; otherwise the whole
+    master CSV file is loaded. `data_version` (the manifest's or the CSV file's version) only
+    serves as part of the cache key, so a refreshed data file is picked up on the next rerun.
+    """
     project_root = os.path.join(os.path.dirname(__file__), '..')
-    data_path = os.path.join(project_root, 'data', 'output', 'master_energy_weather_data.csv')
+    data_path = _get_master_csv_path()
     config_path = os.path.join(project_root, 'config', 'config.yaml')
+
+    if partitioned:
+        try:
+            df = read_master_dataset(_get_master_dataset_dir(), start_date=start_date, end_date=end_date)
+            memory_before = frame_memory_bytes(df)
+            df = apply_master_schema(df)
+            record_memory_usage('dashboard load (partitions)', memory_before, df)
+        except Exception as e:
+            st.error(f"An error occurred while loading the partitioned master dataset: {e}")
+            st.stop()
+        return _add_derived_columns(_add_city_coordinates(df, config_path))
     
     if not os.path.exists(data_path):
         st.error(f"Master data file not found at `{data_path}`.")
@@ -142,28 +303,119 @@ def load_data():
 
     try:
         df = pd.read_csv(data_path)
-        df['date'] = pd.to_datetime(df['date'])
+        memory_before = frame_memory_bytes(df)
+        df = apply_master_schema(df)
+        record_memory_usage('dashboard load (CSV)', memory_before, df)
     except Exception as e:
         st.error(f"An error occurred while loading or parsing the data file: {e}")
         st.stop()
 
-    try:
-        with open(config_path, 'r') as f:
-            config = yaml.safe_load(f)
-        
-        cities_info = {city['name']: {'latitude': city['latitude'], 'longitude': city['longitude']} for city in config.get('cities', [])}
-        
-        df['latitude'] = df['city'].map(lambda x: cities_info.get(x, {}).get('latitude'))
-        df['longitude'] = df['city'].map(lambda x: cities_info.get(x, {}).get('longitude'))
-        
-        return df
+    return _add_derived_columns(_add_city_coordinates(df, config_path))
 
-    except (FileNotFoundError, yaml.YAMLError) as e:
-        st.warning(f"Could not load city coordinates from config file: {e}")
-        return df
+@st.cache_data
+def load_master_csv_summary(data_version=None):
+    """Returns the master CSV file's date range, cities and version, in the shape of `load_master_summary`."""
+    master_df = load_data(data_version=data_version)
+    has_dates = not master_df.empty and 'date' in master_df.columns and not master_df['date'].isna().all()
+    return {
+        'min_date': str(master_df['date'].min().date()) if has_dates else None,
+        'max_date': str(master_df['date'].max().date()) if has_dates else None,
+        'cities': list(master_df['city'].dropna().unique()),
+        'version': data_version
+    }
+
+@st.cache_resource(max_entries=4)
+def load_regression_index(start_date=None, end_date=None, data_version=None, partitioned=False):
+    """
+    Builds the per-city regression prefix sums of the loaded master data once per data version
+    (see `load_data` for the arguments), so any selection's regression is a lookup per city.
+    The index is read-only, so it is shared rather than copied on every cache hit.
+    """
+    master_df = load_data(start_date, end_date, data_version, partitioned) if partitioned else load_data(data_version=data_version)
+    return prefix_sums_by_city(build_prefix_sums(master_df))
+
+@st.cache_resource(max_entries=4)
+def load_heatmap_cube(start_date=None, end_date=None, data_version=None, partitioned=False):
+    """
+    Builds the usage heatmap cube of the loaded master data once per data version (see
+    `load_data` for the arguments), so any selection's heatmap cells are a few lookups each.
+    Like the regression index, it is read-only and shared rather than copied.
+    """
+    master_df = load_data(start_date, end_date, data_version, partitioned) if partitioned else load_data(data_version=data_version)
+    return heatmap_cube_index(build_heatmap_cube(master_df))
+
+@st.cache_data(max_entries=32)
+def load_data_view(start_date, end_date, metric, city=None, data_version=None, partitioned=False):
+    """
+    Builds everything the dashboard shows for one set of filters from the master data, in the
+    shape of `load_store_view`: the filtered rows (with the metric as 'temp_for_analysis'), the
+    headline metrics, the map snapshot, the daily energy totals, the usage heatmap's cell sums
+    and the per-city regression sums. Views are cached, so a sidebar change only filters and
+    aggregates once.
+    """
+    master_df = load_data(start_date, end_date, data_version, partitioned) if partitioned else load_data(data_version=data_version)
+    temp_for_analysis = master_df[TEMP_METRIC_COLUMNS[metric]]
+    in_view = master_df['date'].between(pd.Timestamp(start_date), pd.Timestamp(end_date)) & temp_for_analysis.notna()
+    view_columns = [column for column in ['date', 'TMAX_F', 'TMIN_F', 'energy_mwh', 'city', 'ba_code', 'latitude', 'longitude', 'day_of_week'] if column in master_df.columns]
+    df_date_filtered = master_df.loc[in_view, view_columns].assign(temp_for_analysis=temp_for_analysis[in_view])
+    display_df = df_date_filtered if city is None else df_date_filtered[df_date_filtered['city'] == city]
+    return {
+        'rows': display_df,
+        'metrics': {
+            'cities': display_df['city'].nunique(),
+            'avg_max_temp': display_df['TMAX_F'].mean(),
+            'avg_min_temp': display_df['TMIN_F'].mean(),
+            'avg_energy': display_df['energy_mwh'].mean()
+        },
+        'map_data': latest_city_snapshot(df_date_filtered),
+        'energy_totals': display_df.groupby('date')['energy_mwh'].sum().reset_index(),
+        'heatmap_cells': window_cell_sums(load_heatmap_cube(start_date, end_date, data_version, partitioned) if partitioned else load_heatmap_cube(data_version=data_version), start_date, end_date, metric, city),
+        'regression_sums': window_sums(load_regression_index(start_date, end_date, data_version, partitioned) if partitioned else load_regression_index(data_version=data_version), start_date, end_date, metric, city)
+    }
+
+@st.cache_data(max_entries=2)
+def load_rollups(rollups_version=None):
+    """Loads the pipeline's daily, weekly and monthly rollups. `rollups_version` only serves as part of the cache key."""
+    return read_rollups(_get_rollups_dir())
+
+@st.cache_data(max_entries=32)
+def load_rollup_rows(level, scope, start_date, end_date, metric, key=None, rollups_version=None):
+    """
+    Returns the rollup rows of one level and scope over the date range as chart rows: 'date'
+    (the period start), 'city', the metric as 'temp_for_analysis' and 'energy_mwh'.
+    """
+    rows = select_rollup_rows(load_rollups(rollups_version), level, scope, start_date, end_date, key)
+    return pd.DataFrame({
+        'date': rows['period'],
+        'city': rows['key'],
+        'temp_for_analysis': rows[TEMP_METRIC_COLUMNS[metric]],
+        'energy_mwh': rows['energy_mwh']
+    })
+
+def time_series_data(view, start_date, end_date, metric, city=None):
+    """
+    Returns the time-series chart's level of detail and its temperature and energy rows. The
+    level is the finest at which the chart's series stay within the rollups' point budget, so
+    long ranges are charted as weekly or monthly means. Daily city rows are the view's own
+    rows; everything else comes from the pipeline's rollups. Without a rollups file (data
+    from an older run) the chart falls back to the view's daily rows and totals.
+    """
+    rollups_version = get_rollups_version()
+    if rollups_version is None:
+        return 'daily', view['rows'], view['rows'] if city else view['energy_totals']
+
+    level = choose_rollup_level(start_date, end_date, 2 if city else view['metrics']['cities'] + 1)
+    if city is not None:
+        if level == 'daily':
+            return level, view['rows'], view['rows']
+        rows = load_rollup_rows(level, 'city', start_date, end_date, metric, city, rollups_version)
+        return level, rows, rows
+
+    temperature_df = view['rows'] if level == 'daily' else load_rollup_rows(level, 'city', start_date, end_date, metric, None, rollups_version)
+    return level, temperature_df, load_rollup_rows(level, 'all', start_date, end_date, metric, None, rollups_version)
 
 def convert_df_to_csv(df):
-    return df.to_csv(index=False).encode('utf-8')
+    return export_measurements(df).to_csv(index=False).encode('utf-8')
 
 def apply_compact_style():
     st.markdown("""
@@ -263,15 +515,17 @@ def main():
     st.set_page_config(page_title="Energy & Weather Analysis", layout="wide")
     apply_compact_style()
     
-    master_df = load_data()
-
-    expected_cols = ['TMAX_F', 'TMIN_F', 'energy_mwh', 'date', 'city']
-    for col in expected_cols:
-        if col not in master_df.columns:
-            master_df[col] = pd.NA
-    
-    if 'date' in master_df.columns:
-        master_df['date'] = pd.to_datetime(master_df['date'])
+    # Data source, in order of preference: the analytic store, the partitioned master dataset, the master CSV file.
+    # Every source has a version stamp in the cache keys, so refreshed data is picked up without clearing the caches.
+    store_summary = get_store_summary(_get_analytic_db_path())
+    master_summary = store_summary if store_summary is not None else load_master_summary()
+    partitioned = store_summary is None and master_summary is not None
+    if master_summary is None:
+        master_summary = load_master_csv_summary(get_master_csv_version())
+    # The sidebar is built from the summary; only the selected data is read below.
+    min_date = pd.to_datetime(master_summary['min_date']).date() if master_summary['min_date'] else None
+    max_date = pd.to_datetime(master_summary['max_date']).date() if master_summary['max_date'] else None
+    city_names = master_summary['cities']
 
     with st.sidebar:
         download_button_placeholder = st.empty()
@@ -292,7 +546,6 @@ def main():
                 with st.spinner("Pipeline is running... see logs below."):
                     run_pipeline_from_dashboard(start_date=refresh_start_date, end_date=refresh_end_date)
                 st.success("Pipeline finished! Reloading dashboard with new data...")
-                st.cache_data.clear()
                 time.sleep(3)
                 st.rerun()
 
@@ -304,10 +557,7 @@ def main():
             ('Max Temperature (TMAX)', 'Min Temperature (TMIN)', 'Average Temperature'),
             key='temp_metric_selector'
         )
-        if not master_df.empty and 'date' in master_df.columns and not master_df['date'].isna().all():
-            min_date = master_df['date'].min().date()
-            max_date = master_df['date'].max().date()
-
+        if min_date is not None and max_date is not None:
             col1, col2 = st.columns(2)
             with col1:
                 start_date = st.date_input("Start Date", value=min_date, min_value=min_date, max_value=max_date, key='start_date')
@@ -322,33 +572,28 @@ def main():
             st.warning("No data loaded to select a date range.")
             st.stop()
 
-        city_list = ['All Cities'] + sorted(master_df['city'].unique())
+        city_list = ['All Cities'] + sorted(city_names)
         selected_city = st.selectbox(
             "Select a City",
             options=city_list,
             key="global_city_filter"
         )
 
-    start_datetime = pd.to_datetime(start_date)
-    end_datetime = pd.to_datetime(end_date)
-    df_date_filtered = master_df[(master_df['date'] >= start_datetime) & (master_df['date'] <= end_datetime)].copy()
-
     if temp_metric == 'Max Temperature (TMAX)':
-        df_date_filtered['temp_for_analysis'] = df_date_filtered['TMAX_F']
         temp_axis_label = "Max Temperature (°F)"
     elif temp_metric == 'Min Temperature (TMIN)':
-        df_date_filtered['temp_for_analysis'] = df_date_filtered['TMIN_F']
         temp_axis_label = "Min Temperature (°F)"
     else:
-        df_date_filtered['temp_for_analysis'] = (df_date_filtered['TMAX_F'] + df_date_filtered['TMIN_F']) / 2
         temp_axis_label = "Average Temperature (°F)"
-    
-    df_date_filtered.dropna(subset=['temp_for_analysis'], inplace=True)
 
-    if selected_city == 'All Cities':
-        display_df = df_date_filtered.copy()
+    city_filter = None if selected_city == 'All Cities' else selected_city
+    if store_summary is not None:
+        view = load_store_view(str(start_date), str(end_date), TEMP_METRIC_KEYS[temp_metric], city_filter, store_summary['version'])
     else:
-        display_df = df_date_filtered[df_date_filtered['city'] == selected_city].copy()
+        view = load_data_view(str(start_date), str(end_date), TEMP_METRIC_KEYS[temp_metric], city_filter, master_summary['version'], partitioned)
+    display_df = view['rows']
+    summary_metrics = view['metrics']
+    map_data = view['map_data']
 
     with download_button_placeholder.container():
         st.header("Export Data")
@@ -441,15 +686,15 @@ def main():
 
 
     if not display_df.empty:
-        num_cities = display_df['city'].nunique()
+        num_cities = summary_metrics['cities']
 
         duration_days = (end_date - start_date).days + 1
         duration_text = f"{duration_days} day" if duration_days == 1 else f"{duration_days} days"
 
-        avg_max_temp = display_df['TMAX_F'].mean()
-        avg_min_temp = display_df['TMIN_F'].mean()
+        avg_max_temp = summary_metrics['avg_max_temp']
+        avg_min_temp = summary_metrics['avg_min_temp']
 
-        avg_energy = display_df['energy_mwh'].mean()
+        avg_energy = summary_metrics['avg_energy']
 
         if selected_city == 'All Cities':
             location_label = "Locations Analyzed"
@@ -470,27 +715,26 @@ def main():
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["📍 Geographic Overview", "📈 Time Series Analysis", "🔗 Correlation Analysis", "🗓️ Usage Patterns", "⚠️ Data Quality Report"])
 
     with tab1:
-        display_geographic_overview(df_date_filtered, 'temp_for_analysis', temp_axis_label, selected_city)
+        display_geographic_overview(map_data, 'temp_for_analysis', temp_axis_label, selected_city)
     
     with tab2:
-        display_time_series(display_df, 'temp_for_analysis', temp_axis_label, selected_city)
+        time_series_level, temperature_df, energy_df = time_series_data(view, str(start_date), str(end_date), TEMP_METRIC_KEYS[temp_metric], city_filter)
+        display_time_series(temperature_df, energy_df, time_series_level, 'temp_for_analysis', temp_axis_label, selected_city)
 
     with tab3:
-        display_correlation_analysis(display_df, 'temp_for_analysis', temp_axis_label)
+        display_correlation_analysis(display_df, 'temp_for_analysis', temp_axis_label, view['regression_sums'])
     
     with tab4:
-        display_usage_patterns_heatmap(display_df, 'temp_for_analysis', temp_axis_label, selected_city)
+        display_usage_patterns_heatmap(display_df, view['heatmap_cells'], selected_city)
 
     with tab5:
         display_data_quality_report()
 
-def display_geographic_overview(df, temp_col, temp_label, selected_city):
-    st.header("Geographic Overview")
+def latest_city_snapshot(df):
+    """Returns each city's latest row, with the energy change against the day before the earliest of those dates."""
     if df.empty:
-        st.info("Select one or more cities to display the geographic overview.")
-        return
-        
-    latest_data_all_cities = df.sort_values('date').loc[df.groupby('city')['date'].idxmax()].copy()
+        return df
+    latest_data_all_cities = df.loc[df.groupby('city', observed=True)['date'].idxmax()]
 
     previous_day_date = latest_data_all_cities['date'].min() - pd.Timedelta(days=1)
     previous_day_data = df[df['date'] == previous_day_date][['city', 'energy_mwh']].rename(columns={'energy_mwh': 'energy_prev_day'})
@@ -499,32 +743,35 @@ def display_geographic_overview(df, temp_col, temp_label, selected_city):
         map_data = pd.merge(latest_data_all_cities, previous_day_data, on='city', how='left')
         map_data['energy_pct_change'] = ((map_data['energy_mwh'] - map_data['energy_prev_day']) / map_data['energy_prev_day']) * 100
     else:
-        map_data = latest_data_all_cities.copy()
-        map_data['energy_pct_change'] = pd.NA
+        map_data = latest_data_all_cities.assign(energy_pct_change=pd.NA)
+    return map_data
 
+def display_geographic_overview(map_data, temp_col, temp_label, selected_city):
+    st.header("Geographic Overview")
+    if map_data.empty:
+        st.info("Select one or more cities to display the geographic overview.")
+        return
 
     color_range_min = map_data['energy_mwh'].min()
     color_range_max = map_data['energy_mwh'].max()
 
     if selected_city != 'All Cities':
-        map_data = map_data[map_data['city'] == selected_city].copy()
+        map_data = map_data[map_data['city'] == selected_city]
 
     if 'latitude' not in map_data.columns or map_data['latitude'].isnull().all():
         st.warning("City coordinates are missing. Cannot display map. Please check `config.yaml`.")
         return
 
-    map_data.dropna(subset=['latitude', 'longitude', temp_col], inplace=True)
+    map_data = map_data.dropna(subset=['latitude', 'longitude', temp_col])
 
     if map_data.empty:
         st.warning("No data with coordinates and temperature available to display for the selection.")
         return
 
-    map_data['size_for_map'] = map_data['energy_mwh'].fillna(1000)
-    map_data['hover_energy_text'] = map_data['energy_mwh'].apply(
-        lambda x: f"{x:,.0f} MWh" if pd.notna(x) else "Energy data not available"
-    )
-    map_data['hover_pct_change_text'] = map_data['energy_pct_change'].apply(
-        lambda x: f"{x:+.1f}% vs yesterday" if pd.notna(x) else "No prior day data"
+    map_data = map_data.assign(
+        size_for_map=map_data['energy_mwh'].fillna(1000),
+        hover_energy_text=map_data['energy_mwh'].apply(lambda x: f"{x:,.0f} MWh" if pd.notna(x) else "Energy data not available"),
+        hover_pct_change_text=map_data['energy_pct_change'].apply(lambda x: f"{x:+.1f}% vs yesterday" if pd.notna(x) else "No prior day data")
     )
 
     fig = px.scatter_map(
@@ -548,52 +795,65 @@ def display_geographic_overview(df, temp_col, temp_label, selected_city):
 
     st.plotly_chart(fig, use_container_width=True)
 
-def display_time_series(df, temp_col, temp_label, selected_city):
-    st.header("Time Series Analysis")
-    if df.empty:
-        st.info("Select one or more cities to see the time series analysis.")
-        return
-
+def _downsample_series(df, y_col, points):
+    """Returns the rows LTTB keeps to draw a series with at most `points` points; shorter series are returned unchanged."""
+    if len(df) <= points:
+        return df
+    df = df.dropna(subset=[y_col]).sort_values('date')
+    return df.iloc[lttb_indices(df['date'].to_numpy('datetime64[s]').astype('int64'), df[y_col].to_numpy('float64'), points)]
+
+def _weekend_shading_path(dates):
+    """
+    Returns an SVG path with one rectangle per run of consecutive weekend days, from noon the
+    day before to noon the day after, or None if there are none. Plotly wants dates in a
+    shape path as epoch milliseconds; y runs over the whole plot area (paper coordinates).
+    """
+    days = np.unique(dates.dropna().to_numpy('datetime64[D]'))
+    if len(days) == 0:
+        return None
+    run_starts = np.concatenate([[True], np.diff(days) > np.timedelta64(1, 'D')])
+    run_ends = np.concatenate([run_starts[1:], [True]])
+    half_day_ms = 12 * 3600 * 1000
+    starts = days[run_starts].astype('datetime64[ms]').astype('int64') - half_day_ms
+    ends = days[run_ends].astype('datetime64[ms]').astype('int64') + half_day_ms
+    return ' '.join(f"M{x0},0 L{x0},1 L{x1},1 L{x1},0 Z" for x0, x1 in zip(starts, ends))
+
+def time_series_figure(df, energy_df, level, temp_col, temp_label, selected_city):
+    """
+    Builds the time-series figure: the temperature of each city and the (total) energy
+    demand. Long series are downsampled with LTTB (see `LTTB_CHART_POINTS`), figures with
+    more than `WEBGL_POINT_THRESHOLD` points are drawn with WebGL, and the weekends of
+    daily charts are shaded by a single path shape.
+    """
     fig = make_subplots(specs=[[{"secondary_y": True}]])
 
     if selected_city == 'All Cities':
         title = "Temperature and Energy Demand Comparison"
-        for city_name in df['city'].unique():
-            city_df = df[df['city'] == city_name]
-            fig.add_trace(
-                go.Scatter(x=city_df['date'], y=city_df[temp_col], name=f"{city_name} ({temp_label.split(' ')[0]})", mode='lines'),
-                secondary_y=False,
-            )
-        
-        total_energy_df = df.groupby('date')['energy_mwh'].sum().reset_index()
-        fig.add_trace(
-            go.Scatter(x=total_energy_df['date'], y=total_energy_df['energy_mwh'], name='Total Energy (MWh)', line=dict(color='rgba(135, 206, 250, 0.6)', dash='dot', width=3)),
-            secondary_y=True,
-        )
+        series = [
+            (f"{city_name} ({temp_label.split(' ')[0]})", df[df['city'] == city_name], temp_col, dict(mode='lines'), False)
+            for city_name in df['city'].unique()
+        ]
+        series.append(('Total Energy (MWh)', energy_df, 'energy_mwh', dict(line=dict(color='rgba(135, 206, 250, 0.6)', dash='dot', width=3)), True))
     else:
         title = f"Temperature and Energy Demand for {selected_city}"
-        plot_df = df.copy()
-        fig.add_trace(
-            go.Scatter(
-                x=plot_df['date'], y=plot_df[temp_col], name=temp_label,
-                mode='lines', line=dict(color='rgba(255, 165, 0, 0.8)')
-            ),
-            secondary_y=False
-        )
-        fig.add_trace(
-            go.Scatter(x=plot_df['date'], y=plot_df['energy_mwh'], name='Energy (MWh)', line=dict(color='skyblue', dash='dot')),
-            secondary_y=True
-        )
+        series = [
+            (temp_label, df, temp_col, dict(mode='lines', line=dict(color='rgba(255, 165, 0, 0.8)')), False),
+            ('Energy (MWh)', energy_df, 'energy_mwh', dict(line=dict(color='skyblue', dash='dot')), True)
+        ]
 
-    weekends_df = df[df['date'].dt.weekday >= 5]
-    for d in weekends_df['date'].unique():
-        fig.add_vrect(
-            x0=pd.to_datetime(d) - pd.Timedelta(hours=12),
-            x1=pd.to_datetime(d) + pd.Timedelta(hours=12),
-            fillcolor="rgba(211, 211, 211, 0.25)",
-            layer="below",
-            line_width=0,
-        )
+    points_per_trace = min(LTTB_MAX_POINTS_PER_TRACE, max(LTTB_MIN_POINTS_PER_TRACE, LTTB_CHART_POINTS // len(series)))
+    series = [(name, _downsample_series(series_df, y_col, points_per_trace), y_col, style, secondary_y) for name, series_df, y_col, style, secondary_y in series]
+    scatter = go.Scattergl if sum(len(series_df) for _, series_df, _, _, _ in series) > WEBGL_POINT_THRESHOLD else go.Scatter
+    for name, series_df, y_col, style, secondary_y in series:
+        fig.add_trace(scatter(x=series_df['date'], y=series_df[y_col], name=name, **style), secondary_y=secondary_y)
+
+    # Weekends are only shaded at daily detail; weekly and monthly points span them.
+    weekend_path = _weekend_shading_path(df.loc[df['day_of_week'].cat.codes >= 5, 'date']) if level == 'daily' else None
+    if weekend_path is not None:
+        fig.add_shape(type='path', path=weekend_path, xref='x', yref='paper', fillcolor="rgba(211, 211, 211, 0.25)", layer="below", line_width=0)
+
+    if level != 'daily':
+        title = f"{title} ({level} averages)"
 
     fig.update_layout(
         title_text=title,
@@ -602,34 +862,39 @@ def display_time_series(df, temp_col, temp_label, selected_city):
     )
     fig.update_yaxes(title_text=temp_label, secondary_y=False)
     fig.update_yaxes(title_text="Energy Demand (MWh)", secondary_y=True)
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
-def display_correlation_analysis(df, temp_col, temp_label):
+def display_time_series(df, energy_df, level, temp_col, temp_label, selected_city):
+    st.header("Time Series Analysis")
+    if df.empty:
+        st.info("Select one or more cities to see the time series analysis.")
+        return
+
+    st.plotly_chart(time_series_figure(df, energy_df, level, temp_col, temp_label, selected_city), use_container_width=True)
+
+def display_correlation_analysis(df, temp_col, temp_label, regression_sums):
     st.header("Correlation Analysis")
     if df.empty:
         st.info("Select one or more cities to see the correlation analysis.")
         return
-    
-    plot_df = df.dropna(subset=[temp_col, 'energy_mwh']).copy()
-    if plot_df.empty:
+
+    # The fits come from the view's per-city sufficient statistics (see regression_index.py), not from the rows.
+    city_fits = regression_from_sums(regression_sums).assign(city=regression_sums['city'])
+    overall_fit = regression_from_sums(regression_sums[SUM_NAMES].sum().to_frame().T).iloc[0]
+    if overall_fit['n'] == 0:
         st.warning("No overlapping temperature and energy data available for correlation analysis.")
         return
+    r_squared, correlation = overall_fit['r_squared'], overall_fit['r']
+    intercept, slope = overall_fit['intercept'], overall_fit['slope']
 
-    X = sm.add_constant(plot_df[temp_col])
-    y = plot_df['energy_mwh']
-    model = sm.OLS(y, X).fit()
-    r_squared = model.rsquared
-    correlation = plot_df[temp_col].corr(plot_df['energy_mwh'])
-    intercept, slope = model.params
-
-    x_range = pd.Series([plot_df[temp_col].min(), plot_df[temp_col].max()])
+    x_range = pd.Series([df[temp_col].min(), df[temp_col].max()], dtype='float64')
     y_range = intercept + slope * x_range
     
     col1, col2 = st.columns([3, 1])
 
     with col1:
         fig = px.scatter(
-            plot_df,
+            df,
             x=temp_col,
             y="energy_mwh",
             color="city",
@@ -655,42 +920,37 @@ def display_correlation_analysis(df, temp_col, temp_label):
         **Correlation (r):** Measures the strength and direction of the linear relationship.
         """)
 
-def display_usage_patterns_heatmap(df, temp_col, temp_label, selected_city):
+    if len(city_fits) > 1:
+        st.subheader("Per-City Regressions")
+        st.dataframe(
+            city_fits.round({'slope': 2, 'intercept': 0, 'r_squared': 3, 'r': 3})[['city', 'n', 'slope', 'intercept', 'r_squared', 'r']].rename(columns={
+                'city': 'City', 'n': 'Days', 'slope': 'Slope (MWh per °F)', 'intercept': 'Intercept (MWh)', 'r_squared': 'R-squared'
+            }),
+            hide_index=True,
+            use_container_width=True
+        )
+
+def display_usage_patterns_heatmap(df, heatmap_cells, selected_city):
+    """Shows the usage heatmap at the temperature bin width picked above it, merging the view's finest cells into bins of that width."""
     st.header("Usage Patterns Heatmap")
     if df.empty:
         st.info("Select one or more cities to see the usage patterns heatmap.")
         return
 
+    bin_width = st.radio(
+        "Temperature Bin Width",
+        HEATMAP_BIN_WIDTHS,
+        index=HEATMAP_BIN_WIDTHS.index(DEFAULT_HEATMAP_BIN_WIDTH),
+        format_func=lambda width: f"{width}°F",
+        horizontal=True,
+        key='heatmap_bin_width'
+    )
+    heatmap_data = heatmap_from_cell_sums(heatmap_cells, bin_width)
+
     if selected_city == 'All Cities':
         title = "Average Daily Energy Demand for All Cities (Aggregated)"
     else:
         title = f"Average Daily Energy Demand for {selected_city}"
-    plot_df = df.copy()
-
-    plot_df['day_of_week'] = plot_df['date'].dt.day_name()
-    
-    bins = [-float('inf'), 50, 60, 70, 80, 90, float('inf')]
-    labels = [
-        "<50°F",
-        "50-60°F",
-        "60-70°F",
-        "70-80°F",
-        "80-90°F",
-        ">90°F"
-    ]
-    plot_df['temp_bin'] = pd.cut(plot_df[temp_col], bins=bins, labels=labels, right=False)
-
-    heatmap_data = plot_df.pivot_table(
-        values='energy_mwh',
-        index='temp_bin',
-        columns='day_of_week',
-        aggfunc='mean',
-        observed=False
-    ).round(0)
-
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    heatmap_data = heatmap_data.reindex(columns=days_order)
-    heatmap_data = heatmap_data.reindex(index=labels)
 
     fig = px.imshow(
         heatmap_data,
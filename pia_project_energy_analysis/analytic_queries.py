@@ -0,0 +1,215 @@
+import os
+import sqlite3
+import pandas as pd
+from .regression_index import SUM_NAMES, prefix_sum_columns
+from .heatmap_cube import HEATMAP_BIN_WIDTHS, WEEKDAYS, temperature_bins
+
+# SQL expression of each temperature metric offered by the dashboard, over daily_observations aliased as 'o'.
+TEMPERATURE_METRICS = {
+    'TMAX': 'o.TMAX_F',
+    'TMIN': 'o.TMIN_F',
+    'AVG': '(o.TMAX_F + o.TMIN_F) / 2.0',
+}
+
+def _connect(db_path):
+    """Opens the analytic store read-only."""
+    return sqlite3.connect(f"file:{os.path.abspath(db_path)}?mode=ro", uri=True)
+
+def _query(db_path, sql, params=()):
+    connection = _connect(db_path)
+    try:
+        return pd.read_sql_query(sql, connection, params=params)
+    finally:
+        connection.close()
+
+def _filters(start_date, end_date, metric, city=None):
+    """Returns the WHERE clause and parameters shared by the dashboard queries."""
+    clause = f"o.date BETWEEN ? AND ? AND {_metric_sql(metric)} IS NOT NULL"
+    params = [str(start_date)[:10], str(end_date)[:10]]
+    if city is not None:
+        clause += " AND o.city = ?"
+        params.append(city)
+    return clause, params
+
+def _metric_sql(metric):
+    if metric not in TEMPERATURE_METRICS:
+        raise ValueError(f"Unknown temperature metric '{metric}'. Expected one of {list(TEMPERATURE_METRICS)}.")
+    return TEMPERATURE_METRICS[metric]
+
+def get_store_summary(db_path):
+    """
+    Returns the analytic store's date range, its configured cities and a version stamp
+    (for cache keys), or None if the store does not exist.
+    """
+    if not os.path.exists(db_path):
+        return None
+    connection = _connect(db_path)
+    try:
+        min_date, max_date = connection.execute("SELECT MIN(date), MAX(date) FROM daily_observations").fetchone()
+        city_names = [row[0] for row in connection.execute("SELECT name FROM cities ORDER BY name")]
+        version = connection.execute("SELECT value FROM store_metadata WHERE key = 'updated_at'").fetchone()
+    except sqlite3.Error:
+        return None
+    finally:
+        connection.close()
+    return {'min_date': min_date, 'max_date': max_date, 'cities': city_names, 'version': version[0] if version else None}
+
+def query_observations(db_path, start_date, end_date, metric, city=None):
+    """
+    Returns the daily rows in a date range that have a value for the temperature metric,
+    for one city or all cities, with the metric as 'temp_for_analysis' and the city coordinates.
+
+    Args:
+        db_path (str): The path of the analytic store.
+        start_date (str): The first date to include (YYYY-MM-DD).
+        end_date (str): The last date to include (YYYY-MM-DD).
+        metric (str): 'TMAX', 'TMIN' or 'AVG'.
+        city (str, optional): Restricts the rows to one city. Defaults to all cities.
+
+    Returns:
+        pd.DataFrame: The rows sorted by city and date, with 'date' as datetime64.
+    """
+    where, params = _filters(start_date, end_date, metric, city)
+    df = _query(db_path, f"""
+        SELECT o.date, o.TMAX_F, o.TMIN_F, o.energy_mwh, o.city, {_metric_sql(metric)} AS temp_for_analysis,
+               c.latitude, c.longitude
+        FROM daily_observations o LEFT JOIN cities c ON c.name = o.city
+        WHERE {where}
+        ORDER BY o.city, o.date""", params)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def query_master_rows(db_path, start_date=None, end_date=None):
+    """
+    Returns the stored master rows ('date', 'TMAX_F', 'TMIN_F', 'energy_mwh', 'city', 'ba_code')
+    of every city, optionally limited to a date range, sorted by city and date.
+    """
+    where, params = "1 = 1", []
+    if start_date is not None:
+        where += " AND o.date >= ?"
+        params.append(str(start_date)[:10])
+    if end_date is not None:
+        where += " AND o.date <= ?"
+        params.append(str(end_date)[:10])
+    df = _query(db_path, f"""
+        SELECT o.date, o.TMAX_F, o.TMIN_F, o.energy_mwh, o.city, o.ba_code
+        FROM daily_observations o
+        WHERE {where}
+        ORDER BY o.city, o.date""", params)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def query_summary_metrics(db_path, start_date, end_date, metric, city=None):
+    """
+    Returns the dashboard's headline figures for the filtered rows: the number of cities
+    and the average TMAX, TMIN and daily energy.
+
+    Returns:
+        dict: 'cities', 'avg_max_temp', 'avg_min_temp' and 'avg_energy' (None where no values exist).
+    """
+    where, params = _filters(start_date, end_date, metric, city)
+    connection = _connect(db_path)
+    try:
+        row = connection.execute(f"""
+            SELECT COUNT(DISTINCT o.city), AVG(o.TMAX_F), AVG(o.TMIN_F), AVG(o.energy_mwh)
+            FROM daily_observations o WHERE {where}""", params).fetchone()
+    finally:
+        connection.close()
+    return dict(zip(['cities', 'avg_max_temp', 'avg_min_temp', 'avg_energy'], row))
+
+def query_daily_energy_totals(db_path, start_date, end_date, metric):
+    """Returns the total energy demand of all cities per day, over the rows that have a value for the metric."""
+    where, params = _filters(start_date, end_date, metric)
+    df = _query(db_path, f"""
+        SELECT o.date, TOTAL(o.energy_mwh) AS energy_mwh
+        FROM daily_observations o WHERE {where}
+        GROUP BY o.date ORDER BY o.date""", params)
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+def query_latest_snapshot(db_path, start_date, end_date, metric):
+    """
+    Returns each city's latest row in the date range, with the energy demand of the day before
+    the earliest of those latest dates ('energy_prev_day') and the change against it in percent
+    ('energy_pct_change'), as shown on the dashboard's map.
+    """
+    where, params = _filters(start_date, end_date, metric)
+    df = _query(db_path, f"""
+        WITH filtered AS (
+            SELECT o.city, o.date, o.TMAX_F, o.TMIN_F, o.energy_mwh, {_metric_sql(metric)} AS temp_for_analysis
+            FROM daily_observations o WHERE {where}
+        ),
+        latest AS (
+            SELECT f.* FROM filtered f
+            JOIN (SELECT city, MAX(date) AS date FROM filtered GROUP BY city) m ON m.city = f.city AND m.date = f.date
+        ),
+        previous AS (
+            SELECT city, energy_mwh AS energy_prev_day FROM filtered
+            WHERE date = date((SELECT MIN(date) FROM latest), '-1 day')
+        )
+        SELECT l.*, p.energy_prev_day, c.latitude, c.longitude
+        FROM latest l
+        LEFT JOIN previous p ON p.city = l.city
+        LEFT JOIN cities c ON c.name = l.city
+        ORDER BY l.city""", params)
+    df['date'] = pd.to_datetime(df['date'])
+    df['energy_pct_change'] = (df['energy_mwh'] - df['energy_prev_day']) / df['energy_prev_day'] * 100
+    return df
+
+def query_heatmap_cell_sums(db_path, start_date, end_date, metric, city=None):
+    """
+    Returns the usage heatmap's cell counts and energy sums over a date range, in the shape of
+    `heatmap_cube.window_cell_sums`: each city's (finest temperature bin, weekday) cell's running
+    totals in the heatmap cube on the last day up to `end_date` minus those on the last day
+    before `start_date`. Each cell costs two primary key lookups, whatever the number of days.
+    """
+    _metric_sql(metric)
+    bin_values = ', '.join(f"({temp_bin})" for temp_bin in range(len(temperature_bins(HEATMAP_BIN_WIDTHS[0]))))
+    weekday_values = ', '.join(f"({weekday})" for weekday in range(len(WEEKDAYS)))
+    params = {'metric': metric, 'start_date': str(start_date)[:10], 'end_date': str(end_date)[:10], 'city': city}
+    cell_lookup = "h.city = cells.city AND h.metric = :metric AND h.temp_bin = cells.temp_bin AND h.weekday = cells.weekday"
+    return _query(db_path, f"""
+        WITH bins(temp_bin) AS (VALUES {bin_values}),
+        weekdays(weekday) AS (VALUES {weekday_values}),
+        cells AS (
+            SELECT c.name AS city, b.temp_bin, w.weekday FROM cities c, bins b, weekdays w
+            WHERE :city IS NULL OR c.name = :city
+        )
+        SELECT cells.temp_bin, cells.weekday,
+               e.energy_count - COALESCE(s.energy_count, 0) AS energy_count,
+               e.energy_sum - COALESCE(s.energy_sum, 0) AS energy_sum
+        FROM cells
+        JOIN heatmap_cube e ON e.city = cells.city AND e.metric = :metric
+            AND e.temp_bin = cells.temp_bin AND e.weekday = cells.weekday
+            AND e.date = (SELECT MAX(h.date) FROM heatmap_cube h WHERE {cell_lookup} AND h.date <= :end_date)
+        LEFT JOIN heatmap_cube s ON s.city = cells.city AND s.metric = :metric
+            AND s.temp_bin = cells.temp_bin AND s.weekday = cells.weekday
+            AND s.date = (SELECT MAX(h.date) FROM heatmap_cube h WHERE {cell_lookup} AND h.date < :start_date)""", params)
+
+def query_regression_sums(db_path, start_date, end_date, metric, city=None):
+    """
+    Returns each city's regression sums (see `regression_index.SUM_NAMES`) over a date range:
+    its prefix sums on the last day up to `end_date` minus those on the last day before
+    `start_date`. Each city costs two primary key lookups, whatever the number of days.
+
+    Returns:
+        pd.DataFrame: 'city' and the sums, one row per city with days in the range.
+    """
+    window_sums = ', '.join(
+        f"e.{column} - COALESCE(b.{column}, 0) AS {name}" for name, column in zip(SUM_NAMES, prefix_sum_columns(metric))
+    )
+    params = [str(end_date)[:10], str(start_date)[:10]]
+    city_filter = ""
+    if city is not None:
+        city_filter = "WHERE c.name = ?"
+        params.append(city)
+    df = _query(db_path, f"""
+        SELECT c.name AS city, {window_sums}
+        FROM cities c
+        JOIN regression_prefix_sums e ON e.city = c.name
+            AND e.date = (SELECT MAX(date) FROM regression_prefix_sums WHERE city = c.name AND date <= ?)
+        LEFT JOIN regression_prefix_sums b ON b.city = c.name
+            AND b.date = (SELECT MAX(date) FROM regression_prefix_sums WHERE city = c.name AND date < ?)
+        {city_filter}
+        ORDER BY c.name""", params)
+    return df[df['n'] > 0].reset_index(drop=True)
@@ -0,0 +1,235 @@
+import os
+import logging
+import sqlite3
+from datetime import datetime
+import pandas as pd
+from .schema import export_measurements
+from .regression_index import PREFIX_SUM_COLUMNS, build_prefix_sums
+from .heatmap_cube import CUBE_CELL_COLUMNS, CUBE_COLUMNS, build_heatmap_cube
+
+# Daily rows are clustered on (city, date) by the primary key, and a secondary index on
+# (ba_code, date) serves balancing-authority queries, so date-range reads stay index range scans.
+SCHEMA_STATEMENTS = [
+    """CREATE TABLE IF NOT EXISTS daily_observations (
+        city TEXT NOT NULL,
+        ba_code TEXT,
+        date TEXT NOT NULL,
+        TMAX_F REAL,
+        TMIN_F REAL,
+        energy_mwh REAL,
+        PRIMARY KEY (city, date)
+    ) WITHOUT ROWID""",
+    "CREATE INDEX IF NOT EXISTS idx_daily_observations_ba_date ON daily_observations (ba_code, date)",
+    """CREATE TABLE IF NOT EXISTS cities (
+        name TEXT PRIMARY KEY,
+        ba_code TEXT,
+        latitude REAL,
+        longitude REAL
+    )""",
+    "CREATE TABLE IF NOT EXISTS store_metadata (key TEXT PRIMARY KEY, value TEXT)",
+    # Running regression sums per city and date (see regression_index.py); any date range's
+    # sums are the difference of two rows found through the primary key.
+    f"""CREATE TABLE IF NOT EXISTS regression_prefix_sums (
+        city TEXT NOT NULL,
+        date TEXT NOT NULL,
+        {', '.join(f'{column} REAL' for column in PREFIX_SUM_COLUMNS)},
+        PRIMARY KEY (city, date)
+    ) WITHOUT ROWID""",
+    # Running usage heatmap counts and sums per cell (see heatmap_cube.py), with a row only on
+    # the days that change the cell; any date range's totals are the difference of two rows.
+    """CREATE TABLE IF NOT EXISTS heatmap_cube (
+        city TEXT NOT NULL,
+        metric TEXT NOT NULL,
+        temp_bin INTEGER NOT NULL,
+        weekday INTEGER NOT NULL,
+        date TEXT NOT NULL,
+        energy_count INTEGER NOT NULL,
+        energy_sum REAL NOT NULL,
+        PRIMARY KEY (city, metric, temp_bin, weekday, date)
+    ) WITHOUT ROWID""",
+]
+OBSERVATION_COLUMNS = ['city', 'ba_code', 'date', 'TMAX_F', 'TMIN_F', 'energy_mwh']
+
+def _observation_rows(df, cities):
+    """Converts master rows to (city, ba_code, date, TMAX_F, TMIN_F, energy_mwh) tuples, skipping undated placeholder rows."""
+    ba_codes = {city['name']: city.get('eia_ba_code') for city in cities if 'name' in city}
+    df = export_measurements(df.dropna(subset=['date']))
+    df = df[df['city'].isin(ba_codes.keys())]
+    rows = pd.DataFrame({
+        'city': df['city'].astype(str),
+        'ba_code': df['city'].astype(str).map(ba_codes),
+        'date': pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d'),
+    })
+    for column in ['TMAX_F', 'TMIN_F', 'energy_mwh']:
+        rows[column] = pd.to_numeric(df[column], errors='coerce') if column in df.columns else float('nan')
+    rows = rows.astype(object).where(rows.notna(), None)
+    return list(rows[OBSERVATION_COLUMNS].itertuples(index=False, name=None))
+
+def _write_cities_and_metadata(connection, cities):
+    connection.execute("DELETE FROM cities")
+    connection.executemany(
+        "INSERT INTO cities (name, ba_code, latitude, longitude) VALUES (?, ?, ?, ?)",
+        [(city['name'], city.get('eia_ba_code'), city.get('latitude'), city.get('longitude')) for city in cities if 'name' in city]
+    )
+    connection.execute(
+        "INSERT OR REPLACE INTO store_metadata (key, value) VALUES ('updated_at', ?)",
+        (datetime.now().isoformat(timespec='seconds'),)
+    )
+
+def _refresh_regression_prefix_sums(connection, first_dates=None):
+    """
+    Recomputes the regression prefix sums from daily_observations: for every city, or with
+    `first_dates` ({city: 'YYYY-MM-DD'}) only from those dates on, continuing from the sums
+    of the day before. A city without sums before that date (a new city) is recomputed from
+    its first day.
+    """
+    observation_sql = "SELECT city, date, TMAX_F, TMIN_F, energy_mwh FROM daily_observations"
+    if first_dates is None:
+        connection.execute("DELETE FROM regression_prefix_sums")
+        prefix_frames = [build_prefix_sums(pd.read_sql_query(observation_sql, connection, parse_dates=['date']))]
+    else:
+        prefix_frames = []
+        for city, first_date in first_dates.items():
+            base = connection.execute(
+                f"SELECT {', '.join(PREFIX_SUM_COLUMNS)} FROM regression_prefix_sums WHERE city = ? AND date < ? ORDER BY date DESC LIMIT 1",
+                (city, first_date)
+            ).fetchone()
+            if base is None:
+                first_date = ''
+            connection.execute("DELETE FROM regression_prefix_sums WHERE city = ? AND date >= ?", (city, first_date))
+            observations = pd.read_sql_query(f"{observation_sql} WHERE city = ? AND date >= ?", connection, params=(city, first_date), parse_dates=['date'])
+            prefix_frames.append(build_prefix_sums(observations, base))
+
+    for prefix_df in prefix_frames:
+        prefix_df = prefix_df.assign(date=prefix_df['date'].dt.strftime('%Y-%m-%d'))
+        connection.executemany(
+            f"INSERT INTO regression_prefix_sums (city, date, {', '.join(PREFIX_SUM_COLUMNS)}) VALUES ({', '.join('?' * (len(PREFIX_SUM_COLUMNS) + 2))})",
+            prefix_df[['city', 'date'] + PREFIX_SUM_COLUMNS].itertuples(index=False, name=None)
+        )
+
+def _refresh_heatmap_cube(connection, first_dates=None):
+    """
+    Recomputes the usage heatmap cube from daily_observations, like `_refresh_regression_prefix_sums`:
+    for every city, or with `first_dates` only from those dates on, continuing from each
+    cell's totals before that date.
+    """
+    observation_sql = "SELECT city, date, TMAX_F, TMIN_F, energy_mwh FROM daily_observations"
+    if first_dates is None:
+        connection.execute("DELETE FROM heatmap_cube")
+        cubes = [build_heatmap_cube(pd.read_sql_query(observation_sql, connection, parse_dates=['date']))]
+    else:
+        cubes = []
+        for city, first_date in first_dates.items():
+            # SQLite takes the bare columns from the row holding each cell's latest date.
+            base = pd.read_sql_query(
+                f"SELECT {', '.join(CUBE_CELL_COLUMNS)}, MAX(date) AS date, energy_count, energy_sum FROM heatmap_cube "
+                "WHERE city = ? AND date < ? GROUP BY metric, temp_bin, weekday",
+                connection, params=(city, first_date)
+            )
+            if base.empty:
+                first_date = ''
+            connection.execute("DELETE FROM heatmap_cube WHERE city = ? AND date >= ?", (city, first_date))
+            observations = pd.read_sql_query(f"{observation_sql} WHERE city = ? AND date >= ?", connection, params=(city, first_date), parse_dates=['date'])
+            cubes.append(build_heatmap_cube(observations, base))
+
+    for cube in cubes:
+        cube = cube.assign(date=cube['date'].dt.strftime('%Y-%m-%d'))
+        connection.executemany(
+            f"INSERT INTO heatmap_cube ({', '.join(CUBE_COLUMNS)}) VALUES ({', '.join('?' * len(CUBE_COLUMNS))})",
+            cube[CUBE_COLUMNS].astype(object).itertuples(index=False, name=None)
+        )
+
+def _existing_tables(connection):
+    return {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+def write_analytic_store(master_df, db_path, cities):
+    """
+    Builds the SQLite analytic store from the master data, replacing any previous database.
+    The new database is written next to the old one and moved into place, so the dashboard
+    never reads a half-written store.
+
+    Args:
+        master_df (pd.DataFrame): The combined master data, as written to the master CSV file.
+        db_path (str): The path of the SQLite database file.
+        cities (list): The configured cities (name, eia_ba_code, latitude, longitude).
+    """
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    temp_path = f"{db_path}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+    rows = _observation_rows(master_df, cities)
+    connection = sqlite3.connect(temp_path)
+    try:
+        with connection:
+            for statement in SCHEMA_STATEMENTS:
+                connection.execute(statement)
+            connection.executemany(f"INSERT OR REPLACE INTO daily_observations ({', '.join(OBSERVATION_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)", rows)
+            _write_cities_and_metadata(connection, cities)
+            _refresh_regression_prefix_sums(connection)
+            _refresh_heatmap_cube(connection)
+        connection.execute("ANALYZE")
+    finally:
+        connection.close()
+    os.replace(temp_path, db_path)
+    logging.info(f"Wrote the analytic store ({len(rows)} rows) to {db_path}")
+
+def upsert_analytic_store(new_df, db_path, cities):
+    """
+    Merges new rows into the analytic store in a single transaction, keyed by (city, date).
+    Values from the new rows win, while columns the new rows leave empty keep their existing
+    values. Rows of cities that are no longer configured are deleted. The regression prefix
+    sums and the usage heatmap cube are recomputed from each city's earliest new date on, or
+    in full when the store predates them.
+
+    Args:
+        new_df (pd.DataFrame): The rows processed in this run.
+        db_path (str): The path of the SQLite database file.
+        cities (list): The configured cities (name, eia_ba_code, latitude, longitude).
+
+    Raises:
+        FileNotFoundError: If the store has not been built yet (see `write_analytic_store`).
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f"No analytic store found at {db_path}")
+
+    rows = _observation_rows(new_df, cities)
+    city_names = [city['name'] for city in cities if 'name' in city]
+    connection = sqlite3.connect(db_path)
+    try:
+        with connection:
+            derived_tables = _existing_tables(connection) & {'regression_prefix_sums', 'heatmap_cube'}
+            for statement in SCHEMA_STATEMENTS:
+                connection.execute(statement)
+            # Only cities whose configuration changed are touched, through the (city, date) keys,
+            # so an unchanged configuration costs nothing however long the history is.
+            stored_ba_codes = dict(connection.execute("SELECT name, ba_code FROM cities").fetchall())
+            removed_cities = sorted(set(stored_ba_codes) - set(city_names))
+            if removed_cities:
+                for table in ['daily_observations', 'regression_prefix_sums', 'heatmap_cube']:
+                    connection.execute(f"DELETE FROM {table} WHERE city IN ({', '.join('?' * len(removed_cities))})", removed_cities)
+            changed_cities = [city['name'] for city in cities if 'name' in city and city['name'] in stored_ba_codes and stored_ba_codes[city['name']] != city.get('eia_ba_code')]
+            connection.executemany(
+                f"""INSERT INTO daily_observations ({', '.join(OBSERVATION_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (city, date) DO UPDATE SET
+                    ba_code = excluded.ba_code,
+                    TMAX_F = COALESCE(excluded.TMAX_F, TMAX_F),
+                    TMIN_F = COALESCE(excluded.TMIN_F, TMIN_F),
+                    energy_mwh = COALESCE(excluded.energy_mwh, energy_mwh)""",
+                rows
+            )
+            _write_cities_and_metadata(connection, cities)
+            # Keeps the history of a city whose balancing authority was changed in the config consistent.
+            if changed_cities:
+                connection.execute(
+                    f"UPDATE daily_observations SET ba_code = (SELECT ba_code FROM cities WHERE name = city) WHERE city IN ({', '.join('?' * len(changed_cities))})",
+                    changed_cities
+                )
+            first_dates = {}
+            for city, _, date, *_ in rows:
+                first_dates[city] = min(date, first_dates.get(city, date))
+            _refresh_regression_prefix_sums(connection, first_dates if 'regression_prefix_sums' in derived_tables else None)
+            _refresh_heatmap_cube(connection, first_dates if 'heatmap_cube' in derived_tables else None)
+    finally:
+        connection.close()
+    logging.info(f"Upserted {len(rows)} rows into the analytic store at {db_path}")
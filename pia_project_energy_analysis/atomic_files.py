@@ -0,0 +1,32 @@
+import os
+import json
+
+def write_atomically(path, write):
+    """
+    Writes a file through `write(temp_path)` and moves it into place, so readers (and resumed
+    runs) never see a partial file. If `write` fails, the temporary file is removed and any
+    previous version of the file is left untouched.
+
+    Args:
+        path (str): The final path of the file.
+        write (callable): Writes the complete file to the temporary path it is given.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    try:
+        write(temp_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    os.replace(temp_path, path)
+
+def write_json_atomically(path, data, **json_kwargs):
+    """Atomically writes `data` as a JSON file. Keyword arguments are passed to `json.dump`."""
+    def write(temp_path):
+        with open(temp_path, 'w') as f:
+            json.dump(data, f, **json_kwargs)
+
+    write_atomically(path, write)
@@ -1,143 +1,385 @@
 import pandas as pd
+import numpy as np
 import json
 import os
+import logging
+from .schema import apply_master_schema, export_measurements, frame_memory_bytes, record_memory_usage
+from .hourly_store import DEFAULT_MAX_ROWS_IN_MEMORY, hourly_frame_from_records, rollup_hourly_frame, rollup_hourly_store
+from .atomic_files import write_atomically
 
-def _convert_temp_to_fahrenheit(temp_in_c):
-    """Converts temperature from Celsius to Fahrenheit."""
-    if pd.isna(temp_in_c):
-        return None
-    fahrenheit = (temp_in_c * 9/5) + 32
-    return round(fahrenheit, 2)
+RAW_CHUNK_SIZE = 100000
+NOAA_RAW_COLUMNS = ['date', 'datatype', 'station', 'value']
+EIA_RAW_COLUMNS = ['period', 'respondent', 'type', 'value']
+MASTER_CSV_FILENAME = 'master_energy_weather_data.csv'
 
-def process_noaa_data(raw_file_path):
+def _load_raw_records(raw_file_path, columns):
     """
-    Processes raw NOAA JSON data into a clean DataFrame.
+    Loads raw API records into a DataFrame holding only the given columns.
+
+    NDJSON files (one record per line, as streamed by the fetchers) are read in chunks
+    of RAW_CHUNK_SIZE records and projected to `columns` as they are read, so the full
+    payload is never held at once. The projected records of the whole file are still
+    returned as one frame, so memory grows with the date range, by the projected columns
+    only. Files holding a single JSON array are also supported.
 
     Args:
-        raw_file_path (str): The path to the raw NOAA JSON file.
+        raw_file_path (str): The path to the raw .ndjson or .json file.
+        columns (list): The record fields to keep. Missing fields are filled with NaN.
 
     Returns:
-        tuple: A tuple containing (pd.DataFrame, list of warnings), or (None, []) on failure.
+        pd.DataFrame: The projected records.
     """
-    warnings = []
-    try:
+    if not raw_file_path.endswith('.ndjson'):
         with open(raw_file_path, 'r') as f:
             data = json.load(f)
-        
-        if not data:
-            print(f"  - No data found in NOAA file {os.path.basename(raw_file_path)}. Returning empty dataframe.")
-            return pd.DataFrame(columns=['date', 'TMAX_F', 'TMIN_F']), []
-        
-        df = pd.DataFrame(data)
-        df['date'] = pd.to_datetime(df['date']).dt.date
-        
-        if df.duplicated(subset=['date', 'datatype']).any():
-            duplicates = df[df.duplicated(subset=['date', 'datatype'], keep=False)].sort_values(by=['date', 'datatype'])
-            issue = f"Duplicate weather data points found. This can cause processing errors. Taking first entry."
+        return pd.DataFrame(data).reindex(columns=columns) if data else pd.DataFrame(columns=columns)
+
+    if os.path.getsize(raw_file_path) == 0:
+        return pd.DataFrame(columns=columns)
+    chunks = []
+    with pd.read_json(raw_file_path, lines=True, chunksize=RAW_CHUNK_SIZE, dtype=False, convert_dates=False) as reader:
+        for chunk in reader:
+            chunks.append(chunk.reindex(columns=columns))
+    return pd.concat(chunks, ignore_index=True)
+
+def _celsius_to_fahrenheit(values):
+    """Converts Celsius temperatures to Fahrenheit, rounded to two decimals. Missing values stay NaN."""
+    celsius = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    return np.round(celsius * 9 / 5 + 32, 2)
+
+def _warning_labels(df, key_columns, source_labels):
+    """Returns the source label of every row: one label for a single series, or one per city for keyed frames."""
+    if not key_columns:
+        return np.full(len(df), source_labels, dtype=object)
+    codes, keys = pd.factorize(df[key_columns[0]])
+    return np.array([source_labels.get(key) for key in keys], dtype=object)[codes]
+
+def _log_quality_issues(labels, issues):
+    """Logs data quality issues as one message per source label, so the lines of one source stay together."""
+    issues_by_label = {}
+    for source_label, issue in zip(labels, issues):
+        issues_by_label.setdefault(source_label, []).append(issue)
+    for source_label, label_issues in issues_by_label.items():
+        logging.warning(f"DATA QUALITY WARNING for {source_label}:\n" + '\n'.join(f"    - {issue}" for issue in label_issues))
+
+def _transform_noaa_records(df, key_columns, source_labels):
+    """
+    Turns raw NOAA records into one row per day with TMAX_F and TMIN_F columns, using only
+    column-wise operations. Duplicate (date, datatype) readings keep the first entry and are
+    reported; days where TMIN exceeds TMAX are reported as well.
+
+    Args:
+        df (pd.DataFrame): Raw records with 'date', 'datatype' and 'value' columns, plus the key columns.
+        key_columns (list): Columns identifying each series, e.g. ['city'], or [] for a single series.
+        source_labels (str or dict): The label used in warnings, or a mapping of key value to label.
+
+    Returns:
+        tuple: The weather dataframe (key columns, 'date', 'TMAX_F', 'TMIN_F') and the list of warnings.
+    """
+    warnings = []
+    index_columns = key_columns + ['date']
+    df = df.assign(date=pd.to_datetime(df['date'], format='ISO8601').dt.normalize())
+
+    duplicated = df.duplicated(subset=index_columns + ['datatype'], keep=False)
+    if duplicated.any():
+        duplicates = df[duplicated].sort_values(by=index_columns + ['datatype'])
+        duplicates = duplicates.assign(date=duplicates['date'].dt.strftime('%Y-%m-%d'), source_label=_warning_labels(duplicates, key_columns, source_labels))
+        issue = "Duplicate weather data points found. This can cause processing errors. Taking first entry."
+        for source_label, label_duplicates in duplicates.groupby('source_label', sort=False):
             warnings.append({
-                "file": os.path.basename(raw_file_path),
+                "file": source_label,
                 "check": "Duplicate Raw Data",
                 "level": "WARNING",
                 "message": issue,
-                "details": duplicates.to_dict('records')
+                "details": label_duplicates.drop(columns='source_label').to_dict('records')
             })
-            print(f"  [!] DATA QUALITY WARNING for {os.path.basename(raw_file_path)}: {issue}")
-            df.drop_duplicates(subset=['date', 'datatype'], keep='first', inplace=True)
-
-        weather_df = df.pivot(index='date', columns='datatype', values='value').reset_index()
-        
-        if 'TMAX' not in weather_df.columns:
-            weather_df['TMAX'] = pd.NA
-        if 'TMIN' not in weather_df.columns:
-            weather_df['TMIN'] = pd.NA
-
-        weather_df['TMAX_F'] = weather_df['TMAX'].apply(_convert_temp_to_fahrenheit)
-        weather_df['TMIN_F'] = weather_df['TMIN'].apply(_convert_temp_to_fahrenheit)
-        
-        valid_temps_df = weather_df.dropna(subset=['TMIN_F', 'TMAX_F'])
-        invalid_temp_rows = valid_temps_df[valid_temps_df['TMIN_F'] > valid_temps_df['TMAX_F']]
-        if not invalid_temp_rows.empty:
-            warning_msg = f"DATA QUALITY WARNING for {os.path.basename(raw_file_path)}:"
-            print(f"  [!] {warning_msg}")
-            for _, row in invalid_temp_rows.iterrows():
-                issue = f"Date {row.get('date')}: TMIN ({row.get('TMIN_F')}°F) > TMAX ({row.get('TMAX_F')}°F)."
-                print(f"      - {issue}")
-                warnings.append({
-                    "file": os.path.basename(raw_file_path),
-                    "check": "Temperature Logic",
-                    "level": "WARNING",
-                    "message": issue,
-                    "details": { "date": str(row.get('date')), "tmin_f": row.get('TMIN_F'), "tmax_f": row.get('TMAX_F') }
-                })
-
-        return weather_df[['date', 'TMAX_F', 'TMIN_F']], warnings
-    except ValueError as e:
-        error_message = f"ValueError during processing of NOAA file {os.path.basename(raw_file_path)}: {e}"
-        print(f"  [!] {error_message}")
+            logging.warning(f"DATA QUALITY WARNING for {source_label}: {issue}")
+        df = df.drop_duplicates(subset=index_columns + ['datatype'], keep='first')
+
+    readings = df.set_index(index_columns + ['datatype'])['value'].unstack('datatype').reindex(columns=['TMAX', 'TMIN'])
+    weather_df = pd.DataFrame({
+        'TMAX_F': _celsius_to_fahrenheit(readings['TMAX']),
+        'TMIN_F': _celsius_to_fahrenheit(readings['TMIN'])
+    }, index=readings.index).reset_index()
+    weather_df['date'] = weather_df['date'].dt.date
+
+    invalid_temp_rows = weather_df[weather_df['TMIN_F'] > weather_df['TMAX_F']]
+    if not invalid_temp_rows.empty:
+        labels = _warning_labels(invalid_temp_rows, key_columns, source_labels)
+        dates = invalid_temp_rows['date'].astype(str).tolist()
+        tmin_values = invalid_temp_rows['TMIN_F'].tolist()
+        tmax_values = invalid_temp_rows['TMAX_F'].tolist()
+        issues = [f"Date {date}: TMIN ({tmin}°F) > TMAX ({tmax}°F)." for date, tmin, tmax in zip(dates, tmin_values, tmax_values)]
+        warnings.extend(
+            {
+                "file": source_label,
+                "check": "Temperature Logic",
+                "level": "WARNING",
+                "message": issue,
+                "details": { "date": date, "tmin_f": tmin, "tmax_f": tmax }
+            }
+            for source_label, issue, date, tmin, tmax in zip(labels, issues, dates, tmin_values, tmax_values)
+        )
+        _log_quality_issues(labels, issues)
+
+    return weather_df[index_columns + ['TMAX_F', 'TMIN_F']], warnings
+
+def _transform_eia_records(df, key_columns, source_labels):
+    """
+    Sums raw EIA records into daily energy totals (MWh, rounded to two decimals) using only
+    column-wise operations, and reports days with negative totals.
+
+    Args:
+        df (pd.DataFrame): Raw records with 'period' and 'value' columns, plus the key columns.
+        key_columns (list): Columns identifying each series, e.g. ['city'], or [] for a single series.
+        source_labels (str or dict): The label used in warnings, or a mapping of key value to label.
+
+    Returns:
+        tuple: The energy dataframe (key columns, 'date', 'energy_mwh') and the list of warnings.
+    """
+    dates = pd.to_datetime(df['period'], format='ISO8601').dt.normalize().rename('date')
+    energy = pd.to_numeric(df['value'], errors='coerce').rename('energy_mwh')
+    daily_energy_df = energy.groupby([df[column] for column in key_columns] + [dates]).sum().reset_index()
+    daily_energy_df['energy_mwh'] = daily_energy_df['energy_mwh'].round(2)
+    daily_energy_df['date'] = daily_energy_df['date'].dt.date
+    return daily_energy_df, _negative_energy_warnings(daily_energy_df, key_columns, source_labels)
+
+def _negative_energy_warnings(daily_energy_df, key_columns, source_labels):
+    """Builds (and prints) a warning for every day with a negative energy total."""
+    warnings = []
+    negative_energy_rows = daily_energy_df[daily_energy_df['energy_mwh'] < 0]
+    if not negative_energy_rows.empty:
+        labels = _warning_labels(negative_energy_rows, key_columns, source_labels)
+        dates = negative_energy_rows['date'].astype(str).tolist()
+        energy_values = negative_energy_rows['energy_mwh'].tolist()
+        issues = [f"Date {date}: Negative energy consumption detected ({energy_mwh} MWh)." for date, energy_mwh in zip(dates, energy_values)]
+        warnings.extend(
+            {
+                "file": source_label,
+                "check": "Negative Energy",
+                "level": "WARNING",
+                "message": issue,
+                "details": { "date": date, "energy_mwh": energy_mwh }
+            }
+            for source_label, issue, date, energy_mwh in zip(labels, issues, dates, energy_values)
+        )
+        _log_quality_issues(labels, issues)
+    return warnings
+
+def _daily_energy_from_hourly(daily_rollup_df, source_label):
+    """
+    Shapes a daily rollup of hourly demand like the daily EIA output and checks it for negative
+    totals. Days with fewer hourly values than they have hours (e.g. the edge days of a fetch,
+    or hours not yet published) are left out and reported, so they are never taken as complete.
+    """
+    warnings = []
+    incomplete = daily_rollup_df['hours'] < daily_rollup_df['expected_hours']
+    if incomplete.any():
+        incomplete_days = daily_rollup_df[incomplete]
+        issue = f"{len(incomplete_days)} day(s) have fewer hourly values than hours and were left out of the daily totals."
         warnings.append({
-            "file": os.path.basename(raw_file_path),
+            "file": source_label,
+            "check": "Incomplete Hourly Data",
+            "level": "WARNING",
+            "message": issue,
+            "details": [
+                {"date": date, "hours": int(hours), "expected_hours": int(expected_hours)}
+                for date, hours, expected_hours in zip(incomplete_days['date'].dt.strftime('%Y-%m-%d'), incomplete_days['hours'], incomplete_days['expected_hours'])
+            ]
+        })
+        logging.warning(f"DATA QUALITY WARNING for {source_label}: {issue}")
+        daily_rollup_df = daily_rollup_df[~incomplete]
+
+    daily_energy_df = pd.DataFrame({
+        'date': daily_rollup_df['date'].dt.date,
+        'energy_mwh': daily_rollup_df['energy_mwh'].round(2)
+    })
+    return daily_energy_df, warnings + _negative_energy_warnings(daily_energy_df, [], source_label)
+
+def _load_keyed_raw_records(raw_file_paths_by_city, columns, source_name):
+    """Loads the raw files of several cities into one frame with a leading 'city' column."""
+    frames = []
+    source_labels = {}
+    for city_name, raw_file_path in raw_file_paths_by_city.items():
+        try:
+            df = _load_raw_records(raw_file_path, columns)
+        except (FileNotFoundError, ValueError) as e:
+            logging.error(f"Error processing {source_name} file {raw_file_path}: {e}")
+            continue
+        source_labels[city_name] = os.path.basename(raw_file_path)
+        if not df.empty:
+            frames.append(df.assign(city=city_name))
+    if not frames:
+        return pd.DataFrame(columns=['city'] + columns), source_labels
+    return pd.concat(frames, ignore_index=True), source_labels
+
+def process_noaa_data(raw_file_path):
+    """
+    Processes raw NOAA data (NDJSON or JSON) into a clean DataFrame.
+
+    Args:
+        raw_file_path (str): The path to the raw NOAA data file.
+
+    Returns:
+        tuple: A tuple containing (pd.DataFrame, list of warnings), or (None, []) on failure.
+    """
+    try:
+        df = _load_raw_records(raw_file_path, NOAA_RAW_COLUMNS)
+    except (FileNotFoundError, ValueError) as e:
+        logging.error(f"Error processing NOAA file {raw_file_path}: {e}")
+        return None, []
+    return process_noaa_frame(df, os.path.basename(raw_file_path))
+
+def process_noaa_frame(df, source_label):
+    """
+    Processes raw NOAA records that are already loaded, e.g. from the columnar raw store.
+
+    Args:
+        df (pd.DataFrame): Raw records with at least 'date', 'datatype' and 'value' columns.
+        source_label (str): Identifies the data in messages and warnings (e.g. a file name).
+
+    Returns:
+        tuple: A tuple containing (pd.DataFrame, list of warnings), or (None, []) on failure.
+    """
+    try:
+        if df.empty:
+            logging.info(f"No data found in NOAA data {source_label}. Returning empty dataframe.")
+            return pd.DataFrame(columns=['date', 'TMAX_F', 'TMIN_F']), []
+        return _transform_noaa_records(df, [], source_label)
+    except ValueError as e:
+        error_message = f"ValueError during processing of NOAA data {source_label}: {e}"
+        logging.warning(error_message)
+        return None, [{
+            "file": source_label,
             "check": "Data Pivoting",
             "level": "ERROR",
             "message": f"Could not pivot data, likely due to duplicate TMAX/TMIN values for a single day. Error: {e}",
             "details": {}
-        })
-        return None, warnings 
-    except (FileNotFoundError, json.JSONDecodeError, KeyError) as e:
-        print(f"Error processing NOAA file {raw_file_path}: {e}")
+        }]
+    except KeyError as e:
+        logging.error(f"Error processing NOAA data {source_label}: {e}")
         return None, []
     except Exception as e:
-        print(f"An unexpected error occurred while processing {raw_file_path}: {e}")
+        logging.error(f"An unexpected error occurred while processing {source_label}: {e}")
         return None, []
 
-def process_eia_data(raw_file_path):
+def process_noaa_files(raw_file_paths_by_city):
     """
-    Processes raw EIA JSON data into a clean DataFrame.
+    Processes the raw NOAA files of several cities in one pass, as a single concatenated
+    frame keyed by city, instead of one city at a time.
 
     Args:
-        raw_file_path (str): The path to the raw EIA JSON file.
+        raw_file_paths_by_city (dict): A mapping of city name to its raw NOAA data file.
+
+    Returns:
+        tuple: A tuple containing (pd.DataFrame with a 'city' column, list of warnings), or (None, []) on failure.
+    """
+    df, source_labels = _load_keyed_raw_records(raw_file_paths_by_city, NOAA_RAW_COLUMNS, 'NOAA')
+    try:
+        if df.empty:
+            logging.info("No data found in the NOAA files. Returning empty dataframe.")
+            return pd.DataFrame(columns=['city', 'date', 'TMAX_F', 'TMIN_F']), []
+        return _transform_noaa_records(df, ['city'], source_labels)
+    except (KeyError, ValueError) as e:
+        logging.error(f"Error processing NOAA files: {e}")
+        return None, []
+
+def process_eia_data(raw_file_path, frequency='daily', timezone=None):
+    """
+    Processes raw EIA data (NDJSON or JSON) into a clean DataFrame.
+
+    Args:
+        raw_file_path (str): The path to the raw EIA data file.
+        frequency (str, optional): 'daily', or 'hourly' for `region-data` records, which are
+            summed into daily totals. Defaults to 'daily'.
+        timezone (str, optional): For hourly records, the IANA time zone whose calendar days
+            are used. Defaults to UTC.
 
     Returns:
         tuple: A tuple containing (pd.DataFrame, list of warnings), or (None, []) on failure.
     """
-    warnings = []
     try:
-        with open(raw_file_path, 'r') as f:
-            data = json.load(f)
-        
-        if not data:
-            print(f"  - No data found in EIA file {os.path.basename(raw_file_path)}. Returning empty dataframe.")
-            return pd.DataFrame(columns=['date', 'energy_mwh']), []
+        df = _load_raw_records(raw_file_path, EIA_RAW_COLUMNS)
+    except (FileNotFoundError, ValueError) as e:
+        logging.error(f"Error processing EIA file {raw_file_path}: {e}")
+        return None, []
+    return process_eia_frame(df, os.path.basename(raw_file_path), frequency=frequency, timezone=timezone)
+
+def process_eia_frame(df, source_label, frequency='daily', timezone=None):
+    """
+    Processes raw EIA records that are already loaded, e.g. from the columnar raw store.
 
-        df = pd.DataFrame(data)
-        df['date'] = pd.to_datetime(df['period']).dt.date
-        df.rename(columns={'value': 'energy_mwh'}, inplace=True)
-        
-        df['energy_mwh'] = pd.to_numeric(df['energy_mwh'], errors='coerce')
-        
-        daily_energy_df = df.groupby('date')['energy_mwh'].sum().reset_index()
-        daily_energy_df['energy_mwh'] = daily_energy_df['energy_mwh'].round(2)
-
-        negative_energy_rows = daily_energy_df[daily_energy_df['energy_mwh'] < 0]
-        if not negative_energy_rows.empty:
-            warning_msg = f"DATA QUALITY WARNING for {os.path.basename(raw_file_path)}:"
-            print(f"  [!] {warning_msg}")
-            for _, row in negative_energy_rows.iterrows():
-                issue = f"Date {row.get('date')}: Negative energy consumption detected ({row.get('energy_mwh')} MWh)."
-                print(f"      - {issue}")
-                warnings.append({
-                    "file": os.path.basename(raw_file_path),
-                    "check": "Negative Energy",
-                    "level": "WARNING",
-                    "message": issue,
-                    "details": { "date": str(row.get('date')), "energy_mwh": row.get('energy_mwh') }
-                })
-
-        return daily_energy_df, warnings
-    except (FileNotFoundError, json.JSONDecodeError, KeyError, ValueError) as e:
-        print(f"Error processing EIA file {raw_file_path}: {e}")
+    Args:
+        df (pd.DataFrame): Raw records with at least 'period' and 'value' columns.
+        source_label (str): Identifies the data in messages and warnings (e.g. a file name).
+        frequency (str, optional): 'daily' or 'hourly'. Defaults to 'daily'.
+        timezone (str, optional): For hourly records, the IANA time zone whose calendar days
+            are used. Defaults to UTC.
+
+    Returns:
+        tuple: A tuple containing (pd.DataFrame, list of warnings), or (None, []) on failure.
+    """
+    try:
+        if df.empty:
+            logging.info(f"No data found in EIA data {source_label}. Returning empty dataframe.")
+            return pd.DataFrame(columns=['date', 'energy_mwh']), []
+        if frequency == 'hourly':
+            return _daily_energy_from_hourly(rollup_hourly_frame(hourly_frame_from_records(df), 'D', timezone), source_label)
+        return _transform_eia_records(df, [], source_label)
+    except (KeyError, ValueError) as e:
+        logging.error(f"Error processing EIA data {source_label}: {e}")
         return None, []
     except Exception as e:
-        print(f"An unexpected error occurred while processing {raw_file_path}: {e}")
+        logging.error(f"An unexpected error occurred while processing {source_label}: {e}")
+        return None, []
+
+def process_eia_hourly(hourly_data_dir, ba_code, start_date, end_date, timezone=None, max_rows_in_memory=DEFAULT_MAX_ROWS_IN_MEMORY):
+    """
+    Derives daily energy totals for a balancing authority from the hourly store. The hours are
+    read and summed in chunks of at most `max_rows_in_memory` rows, so memory use stays
+    fixed however many years are processed.
+
+    Args:
+        hourly_data_dir (str): The root directory of the hourly store.
+        ba_code (str): The balancing authority code.
+        start_date (str): The first day to include (YYYY-MM-DD).
+        end_date (str): The last day to include (YYYY-MM-DD).
+        timezone (str, optional): The IANA time zone whose calendar days are used. Defaults to UTC.
+        max_rows_in_memory (int, optional): The largest number of hourly rows read at once.
+
+    Returns:
+        tuple: A tuple containing (pd.DataFrame, list of warnings), or (None, []) on failure.
+    """
+    source_label = f"eia_hourly/{ba_code.lower()} {start_date} to {end_date}"
+    try:
+        daily_rollup_df = rollup_hourly_store(hourly_data_dir, ba_code, start_date, end_date, 'D', timezone, max_rows_in_memory)
+        if daily_rollup_df.empty:
+            logging.info(f"No hourly data stored for {source_label}. Returning empty dataframe.")
+            return pd.DataFrame(columns=['date', 'energy_mwh']), []
+        return _daily_energy_from_hourly(daily_rollup_df, source_label)
+    except Exception as e:
+        logging.error(f"An unexpected error occurred while processing {source_label}: {e}")
+        return None, []
+
+def process_eia_files(raw_file_paths_by_city):
+    """
+    Processes the raw EIA files of several cities in one pass, as a single concatenated
+    frame keyed by city. Cities sharing a balancing authority may map to the same file.
+
+    Args:
+        raw_file_paths_by_city (dict): A mapping of city name to its raw EIA data file.
+
+    Returns:
+        tuple: A tuple containing (pd.DataFrame with a 'city' column, list of warnings), or (None, []) on failure.
+    """
+    df, source_labels = _load_keyed_raw_records(raw_file_paths_by_city, EIA_RAW_COLUMNS, 'EIA')
+    try:
+        if df.empty:
+            logging.info("No data found in the EIA files. Returning empty dataframe.")
+            return pd.DataFrame(columns=['city', 'date', 'energy_mwh']), []
+        return _transform_eia_records(df, ['city'], source_labels)
+    except (KeyError, ValueError) as e:
+        logging.error(f"Error processing EIA files: {e}")
         return None, []
 
 def merge_and_save_data(weather_df, energy_df, city_name, processed_dir):
@@ -151,6 +393,9 @@ def merge_and_save_data(weather_df, energy_df, city_name, processed_dir):
         energy_df (pd.DataFrame or None): The processed energy data.
         city_name (str): The name of the city.
         processed_dir (str): The directory to save the processed file.
+
+    Returns:
+        int: The number of rows saved.
     """
     output_path = os.path.join(processed_dir, f"{city_name.lower().replace(' ', '_')}_processed_data.csv")
 
@@ -162,41 +407,97 @@ def merge_and_save_data(weather_df, energy_df, city_name, processed_dir):
     if has_weather_data and has_energy_data:
         merged_df = pd.merge(weather_df, energy_df, on='date', how='outer')
         final_df = merged_df
-        print(f"Successfully merged weather and energy data for {city_name}.")
+        logging.info(f"Successfully merged weather and energy data for {city_name}.")
     elif has_weather_data:
-        final_df = weather_df.copy()
-        print(f"Successfully saved processed weather-only data for {city_name} to {output_path}")
+        final_df = weather_df
+        logging.info(f"Successfully saved processed weather-only data for {city_name} to {output_path}")
     elif has_energy_data:
-        final_df = energy_df.copy()
-        print(f"Successfully saved processed energy-only data for {city_name} to {output_path}")
+        final_df = energy_df
+        logging.info(f"Successfully saved processed energy-only data for {city_name} to {output_path}")
 
     if final_df is None:
         final_df = pd.DataFrame()
 
     expected_cols = ['date', 'TMAX_F', 'TMIN_F', 'energy_mwh']
-    for col in expected_cols:
-        if col not in final_df.columns:
-            final_df[col] = pd.NA
-
-    final_df['city'] = city_name
-    final_df.to_csv(output_path, index=False)
+    # assign() builds a new frame, so the caller's weather/energy frames are not modified.
+    final_df = final_df.assign(**{col: pd.NA for col in expected_cols if col not in final_df.columns}, city=city_name)
+    write_atomically(output_path, lambda path: final_df.to_csv(path, index=False))
     if final_df.empty:
-        print(f"No data processed for {city_name}. Saved an empty placeholder file.")
+        logging.info(f"No data processed for {city_name}. Saved an empty placeholder file.")
+    return len(final_df)
+
+def _upsert_into_existing_master(new_df, master_file_path, configured_city_names):
+    """
+    Merges newly processed rows into the existing master data, keyed by (city, date).
+    Values from the new rows win, while columns the new rows leave empty (e.g. energy
+    when only weather was re-fetched) keep their existing values. Placeholder rows and
+    cities no longer in the configuration are dropped; placeholders are re-added later
+    for configured cities that still have no data.
+
+    Only the existing rows inside each changed city's new date range take part in the
+    merge; all other rows are carried over untouched, in their existing order.
+
+    Returns:
+        pd.DataFrame: The merged master dataframe.
+    """
+    try:
+        existing_df = pd.read_csv(master_file_path)
+    except pd.errors.EmptyDataError:
+        return new_df
+    print(f"Upserting {len(new_df)} new rows into {len(existing_df)} existing master rows.")
 
-def combine_processed_data(processed_dir, output_dir, configured_cities):
+    column_order = list(dict.fromkeys(list(existing_df.columns) + list(new_df.columns)))
+    if 'date' not in new_df.columns:
+        new_df = new_df.assign(date=pd.NA)
+    existing_df = existing_df[existing_df['city'].isin(configured_city_names)].dropna(subset=['date'])
+    new_df = new_df.dropna(subset=['date']).assign(date=lambda d: pd.to_datetime(d['date']).dt.strftime('%Y-%m-%d'))
+    if new_df.empty:
+        return existing_df[column_order]
+
+    changed_ranges = new_df.groupby('city')['date'].agg(['min', 'max'])
+    range_start = existing_df['city'].map(changed_ranges['min'])
+    range_end = existing_df['city'].map(changed_ranges['max'])
+    in_changed_range = range_start.notna() & (existing_df['date'] >= range_start.fillna('')) & (existing_df['date'] <= range_end.fillna(''))
+    untouched_df = existing_df[~in_changed_range]
+    print(f"  - Merging into {int(in_changed_range.sum())} existing rows of {len(changed_ranges)} changed cities; {len(untouched_df)} rows are unchanged.")
+
+    new_df = new_df.drop_duplicates(subset=['city', 'date'], keep='last')
+    if in_changed_range.any():
+        indexed_frames = [df.set_index(['city', 'date']) for df in (new_df, existing_df[in_changed_range].drop_duplicates(subset=['city', 'date'], keep='last'))]
+        merged_df = indexed_frames[0].combine_first(indexed_frames[1]).reset_index()
+    else:
+        merged_df = new_df
+    return pd.concat([untouched_df, merged_df], ignore_index=True)[column_order]
+
+def combine_processed_data(processed_dir, output_dir, configured_cities, upsert=False, write_csv=True):
     """
-    Combines all processed data files from the current run into a single, new
-    master data file, ensuring all configured cities are represented. This
-    process overwrites any existing master file.
+    Combines all processed data files from the current run into a single master
+    data file, ensuring all configured cities are represented. By default this
+    process overwrites any existing master file. In upsert mode, the rows of the
+    existing master file are kept, and any (city, date) rows present in this
+    run's processed files replace their previous values.
+
+    Without `write_csv` (when the partitioned dataset or the analytic store holds the
+    master data), no master file is written, and an upsert does not read the existing
+    master data at all: the new rows are merged into those stores instead.
 
     Args:
         processed_dir (str): The directory containing the processed city CSV files.
         output_dir (str): The directory to save the final master file.
         configured_cities (list): The list of city dictionaries from the config file.
+        upsert (bool, optional): Merge into the existing master file instead of
+            rebuilding it. Defaults to False.
+        write_csv (bool, optional): Write the master CSV file. Defaults to True.
+
+    Returns:
+        tuple: The master data as saved (None for an upsert without the master file, as
+               the full master data is not loaded), and the rows read from this run's
+               processed files, so the changes can also be applied to other formats.
     """
     print("\n--- Combining All Processed Data into a New Master File ---")
     configured_city_names = {city['name'] for city in configured_cities}
-    
+    ba_codes_by_city = {city['name']: city.get('eia_ba_code') for city in configured_cities}
+    master_file_path = os.path.join(output_dir, MASTER_CSV_FILENAME)
     processed_files = [os.path.join(processed_dir, f) for f in os.listdir(processed_dir) if f.endswith('_processed_data.csv')]
     
     if not processed_files:
@@ -218,6 +519,20 @@ def combine_processed_data(processed_dir, output_dir, configured_cities):
             master_df = pd.DataFrame([{'city': city['name']} for city in configured_cities])
         else:
             master_df = pd.concat(df_list, ignore_index=True)
+            del df_list
+            memory_before = frame_memory_bytes(master_df)
+            master_df = apply_master_schema(master_df, ba_codes_by_city)
+            record_memory_usage('processed city files', memory_before, master_df)
+
+    new_df = master_df
+    if upsert and not write_csv:
+        print(f"Upserting {len(new_df)} new rows into the master data stores.")
+        return None, new_df
+    if upsert and os.path.exists(master_file_path):
+        master_df = _upsert_into_existing_master(master_df, master_file_path, configured_city_names)
+        memory_before = frame_memory_bytes(master_df)
+        master_df = apply_master_schema(master_df, ba_codes_by_city)
+        record_memory_usage('master data after upsert', memory_before, master_df)
 
     cities_in_master = set(master_df['city'].unique()) if 'city' in master_df.columns else set()
     
@@ -228,15 +543,23 @@ def combine_processed_data(processed_dir, output_dir, configured_cities):
         missing_cities_df = pd.DataFrame([{'city': name} for name in missing_cities])
         master_df = pd.concat([master_df, missing_cities_df], ignore_index=True)
 
-    expected_cols = ['date', 'TMAX_F', 'TMIN_F', 'energy_mwh']
-    for col in expected_cols:
-        if col not in master_df.columns:
-            master_df[col] = pd.NA
-
-    if not master_df.empty:
-        master_df.sort_values(by=['city', 'date'], inplace=True, na_position='first')
-        master_file_path = os.path.join(output_dir, 'master_energy_weather_data.csv')
-        master_df.to_csv(master_file_path, index=False)
-        print(f"Successfully created new master data file at {master_file_path}")
-    else:
+    master_df = apply_master_schema(master_df, ba_codes_by_city)
+
+    if master_df.empty:
         print("Master dataframe is empty. Nothing to save.")
+    elif write_csv:
+        master_df = write_master_csv(master_df, master_file_path)
+    return master_df, new_df
+
+def write_master_csv(master_df, master_file_path):
+    """
+    Sorts master rows by city and date (placeholder rows first) and atomically writes them as
+    the master CSV file, with the measurements rounded to their two decimals.
+
+    Returns:
+        pd.DataFrame: The sorted master rows.
+    """
+    master_df = master_df.sort_values(by=['city', 'date'], na_position='first', kind='stable')
+    write_atomically(master_file_path, lambda path: export_measurements(master_df).to_csv(path, index=False))
+    print(f"Successfully created new master data file at {master_file_path}")
+    return master_df
@@ -0,0 +1,46 @@
+import numpy as np
+
+def lttb_indices(x, y, threshold):
+    """
+    Selects `threshold` points of a series with Largest-Triangle-Three-Buckets downsampling,
+    which keeps the peaks and troughs a line chart of the full series would show. The first
+    and last points are always kept; the points in between are split into `threshold - 2`
+    buckets, and from each the point forming the largest triangle with the point picked in
+    the previous bucket and the average of the next bucket is kept.
+
+    The bucket averages and triangle areas are computed with NumPy; only the walk over the
+    buckets is a loop, since each bucket's choice depends on the previous one.
+
+    Args:
+        x (array-like): The x values, ascending (dates as integers, e.g. epoch seconds).
+        y (array-like): The y values, without missing values.
+        threshold (int): The number of points to keep.
+
+    Returns:
+        np.ndarray: The ascending indices of the points to keep; all indices if the series
+                    has no more than `threshold` points.
+    """
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Bucket i holds the points [edges[i], edges[i + 1]); the last edge is the final point.
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(np.int64) + 1
+    counts = np.diff(edges)
+    average_x = np.append(np.add.reduceat(x[:n - 1], edges[:-1]) / counts, x[-1])
+    average_y = np.append(np.add.reduceat(y[:n - 1], edges[:-1]) / counts, y[-1])
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    anchor = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs(
+            (x[anchor] - average_x[bucket + 1]) * (y[start:end] - y[anchor])
+            - (x[anchor] - x[start:end]) * (average_y[bucket + 1] - y[anchor])
+        )
+        anchor = start + int(np.argmax(areas))
+        selected[bucket + 1] = anchor
+    return selected
@@ -1,25 +1,59 @@
-import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, retry_if_result
-
-def _is_server_error(response):
-    """Return True if the response status code is a 5xx server error, indicating a retriable issue."""
-    return response.status_code >= 500
-
-@retry(
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    stop=stop_after_attempt(3),
-    retry=(retry_if_exception_type(requests.exceptions.RequestException) | retry_if_result(_is_server_error)),
-    reraise=True  
-)
-def _make_eia_api_request(url, headers, params, log_identifier):
-    """Makes a single, robust request to the EIA API, decorated to handle retries."""
-    response = requests.get(url, headers=headers, params=params, timeout=15)
+from .http_cache import cached_request
+from .http_transport import http_get, api_retry, prefetch_in_order, response_size, FetchError
+from .run_metrics import span
+
+@api_retry
+def _make_eia_api_request(url, headers, params, log_identifier, rate_limiter=None):
+    """
+    Makes a single, robust request to the EIA API over the pooled HTTP transport.
+    Network errors, 5xx and 429 responses are retried, honouring any Retry-After header.
+    If a rate limiter is given, every attempt (including retries) waits for a token first.
+    """
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    response = http_get(url, params=params, headers=headers, timeout=15)
     return response
 
-def fetch_eia_data(base_url, api_key, ba_code, start_date, end_date, city_name=None):
+def _fetch_eia_page(base_url, headers, params, log_identifier, rate_limiter=None, cache=None):
+    """Fetches one page of EIA data. Returns the page's records and the total record count reported by the API (or None)."""
+    with span('page', source='eia', city=log_identifier, offset=params['offset']) as span_tags:
+        try:
+            response = cached_request(cache, base_url, params, lambda: _make_eia_api_request(base_url, headers, params, log_identifier, rate_limiter=rate_limiter))
+        except Exception as e:
+            print(f"An unrecoverable error occurred for {log_identifier} after multiple attempts: {e}")
+            raise FetchError(f"EIA request for {log_identifier} failed: {e}") from e
+
+        span_tags.update(status=response.status_code, bytes=response_size(response), cached=getattr(response, 'from_cache', False))
+        if response.status_code != 200:
+            print(f"Client error fetching EIA data for {log_identifier}. Status: {response.status_code}, Response: {response.text}")
+            raise FetchError(f"EIA request for {log_identifier} failed with status {response.status_code}.")
+
+        try:
+            response_body = response.json().get('response', {})
+            data = response_body.get('data', [])
+            total = response_body.get('total')
+            total = int(total) if total is not None else None
+        except (ValueError, TypeError, AttributeError) as e:
+            print(f"Malformed EIA response for {log_identifier}: {e}")
+            if cache is not None and getattr(response, 'from_cache', False):
+                # An entry cached before bodies were checked must not fail every later run.
+                cache.delete(base_url, params)
+            raise FetchError(f"EIA response for {log_identifier} could not be parsed: {e}") from e
+        span_tags['rows'] = len(data)
+    return data, total
+
+def iter_eia_pages(base_url, api_key, ba_code, start_date, end_date, city_name=None, rate_limiter=None, cache=None, prefetch_workers=1, frequency='daily'):
     """
-    Fetches all hourly electricity demand data from the EIA API for a given region,
-    handling pagination automatically.
+    Fetches electricity demand data from the EIA API for a given region page by page,
+    handling pagination automatically. Each page is yielded as soon as it arrives,
+    so callers never hold more than one page.
+
+    With `prefetch_workers` above 1, the total record count from the first page is used to
+    request up to that many of the remaining offsets concurrently; pages are still yielded
+    in offset order and every request goes through the shared rate limiter.
+
+    With `frequency='hourly'`, `base_url` must point at the hourly `region-data` endpoint.
+    Only the demand series (type D) is requested, covering every UTC hour of the date range.
 
     Args:
         base_url (str): The base URL for the EIA API endpoint.
@@ -28,23 +62,30 @@ def fetch_eia_data(base_url, api_key, ba_code, start_date, end_date, city_name=N
         start_date (str): The start date in YYYY-MM-DD format.
         end_date (str): The end date in YYYY-MM-DD format.
         city_name (str, optional): The name of the city for better logging. Defaults to None.
+        rate_limiter (TokenBucket, optional): Shared EIA rate limiter. Defaults to None.
+        cache (ResponseCache, optional): Response cache consulted before each page request. Defaults to None.
+        prefetch_workers (int, optional): Number of pages to fetch concurrently. Defaults to 1 (sequential).
+        frequency (str, optional): 'daily' or 'hourly'. Defaults to 'daily'.
 
-    Returns:
-        list: A list of all data records from the API, or an empty list if the request fails.
+    Yields:
+        list: The data records of one page.
+
+    Raises:
+        FetchError: If a page cannot be fetched after multiple attempts.
     """
     log_identifier = city_name if city_name else ba_code
     headers = {
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
 
-    all_data = []
-    offset = 0
+    if frequency not in ('daily', 'hourly'):
+        raise ValueError(f"Unknown EIA frequency '{frequency}'. Use 'daily' or 'hourly'.")
     api_length_per_request = 5000
 
-    while True:
+    def page_params(offset):
         params = {
             'api_key': api_key,
-            'frequency': 'daily',
+            'frequency': frequency,
             'data[0]': 'value',
             'facets[respondent][]': ba_code,
             'start': start_date,
@@ -54,25 +95,51 @@ def fetch_eia_data(base_url, api_key, ba_code, start_date, end_date, city_name=N
             'offset': offset,
             'length': api_length_per_request
         }
+        if frequency == 'hourly':
+            # Hourly periods are UTC hours ('YYYY-MM-DDTHH'); the range covers whole days.
+            params['start'] = f"{start_date}T00"
+            params['end'] = f"{end_date}T23"
+            params['facets[type][]'] = 'D'
+        return params
 
-        try:
-            response = _make_eia_api_request(base_url, headers, params, log_identifier)
-
-            if response.status_code != 200:
-                print(f"Client error fetching EIA data for {log_identifier}. Status: {response.status_code}, Response: {response.text}")
-                return []
+    data, total = _fetch_eia_page(base_url, headers, page_params(0), log_identifier, rate_limiter=rate_limiter, cache=cache)
+    if data:
+        yield data
+    if not data or len(data) < api_length_per_request:
+        return
+    offset = len(data)
 
-            response_data = response.json()
-            data = response_data.get('response', {}).get('data', [])
-            all_data.extend(data)
-
-        except Exception as e:
-            print(f"An unrecoverable error occurred for {log_identifier} after multiple attempts: {e}")
-            return []
+    if prefetch_workers > 1 and total is not None:
+        # The total is known, so the remaining offsets can be requested ahead of time.
+        tasks = (
+            lambda page_offset=page_offset: _fetch_eia_page(base_url, headers, page_params(page_offset), log_identifier, rate_limiter=rate_limiter, cache=cache)[0]
+            for page_offset in range(offset, total, api_length_per_request)
+        )
+        for data in prefetch_in_order(tasks, prefetch_workers):
+            if data:
+                yield data
+        return
 
+    while True:
+        data, _ = _fetch_eia_page(base_url, headers, page_params(offset), log_identifier, rate_limiter=rate_limiter, cache=cache)
+        if data:
+            yield data
         if not data or len(data) < api_length_per_request:
             break
-
         offset += len(data)
 
+def fetch_eia_data(base_url, api_key, ba_code, start_date, end_date, city_name=None, rate_limiter=None, cache=None, prefetch_workers=1, frequency='daily'):
+    """
+    Fetches all electricity demand data from the EIA API for a given region into memory.
+    Takes the same arguments as `iter_eia_pages`; prefer that generator for large date ranges.
+
+    Returns:
+        list: A list of all data records from the API, or an empty list if the request fails.
+    """
+    all_data = []
+    try:
+        for page in iter_eia_pages(base_url, api_key, ba_code, start_date, end_date, city_name=city_name, rate_limiter=rate_limiter, cache=cache, prefetch_workers=prefetch_workers, frequency=frequency):
+            all_data.extend(page)
+    except FetchError:
+        return []
     return all_data
@@ -0,0 +1,175 @@
+import numpy as np
+import pandas as pd
+from .schema import export_measurements
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+# Widths (°F) of the usage heatmap's temperature bins the dashboard offers. The cube holds the
+# first, finest one; each wider bin is a run of adjacent finest bins, so its counts and sums are
+# theirs added up. Every width must be a multiple of the first and divide HEATMAP_BIN_RANGE.
+HEATMAP_BIN_WIDTHS = [5, 10, 20]
+DEFAULT_HEATMAP_BIN_WIDTH = 10
+# Bins of a width tile this range; colder and warmer days fall in two open-ended bins.
+HEATMAP_BIN_RANGE = (50, 90)
+# A cube cell is one city's finest temperature bin and weekday for one temperature metric.
+CUBE_CELL_COLUMNS = ['city', 'metric', 'temp_bin', 'weekday']
+CUBE_COLUMNS = CUBE_CELL_COLUMNS + ['date', 'energy_count', 'energy_sum']
+# Cells and days are packed into one sorted int64 key: the cell in the high 32 bits, the day in the low.
+_DAY_OFFSET = 1 << 31
+
+def temperature_bins(bin_width=DEFAULT_HEATMAP_BIN_WIDTH):
+    """
+    Returns the heatmap's temperature bins of one width as (upper bound, label) pairs, coldest
+    first. Upper bounds are exclusive; the warmest bin has None.
+
+    Raises:
+        ValueError: If `bin_width` is not one of `HEATMAP_BIN_WIDTHS`.
+    """
+    if bin_width not in HEATMAP_BIN_WIDTHS:
+        raise ValueError(f"Unknown heatmap bin width {bin_width}. Expected one of {HEATMAP_BIN_WIDTHS}.")
+    low, high = HEATMAP_BIN_RANGE
+    edges = list(range(low, high + 1, bin_width))
+    return [(low, f"<{low}°F")] + [(upper, f"{lower}-{upper}°F") for lower, upper in zip(edges, edges[1:])] + [(None, f">{high}°F")]
+
+TEMPERATURE_BINS = temperature_bins()
+
+def temperature_bin_codes(temperatures, bin_width=HEATMAP_BIN_WIDTHS[0]):
+    """Returns the position of each temperature's bin in `temperature_bins(bin_width)`, or -1 where the temperature is missing."""
+    bin_count = len(temperature_bins(bin_width))
+    x = np.asarray(temperatures, dtype='float64')
+    with np.errstate(invalid='ignore'):
+        codes = np.clip(np.floor((x - HEATMAP_BIN_RANGE[0]) / bin_width) + 1, 0, bin_count - 1)
+    return np.where(np.isnan(x), -1, codes).astype('int64')
+
+def coarsen_bin_codes(codes, bin_width):
+    """Maps bin positions of the finest width to those of `bin_width`; the open-ended bins stay first and last."""
+    temperature_bins(bin_width)
+    codes = np.asarray(codes, dtype='int64')
+    return np.where(codes > 0, (codes - 1) // (bin_width // HEATMAP_BIN_WIDTHS[0]) + 1, codes)
+
+def build_heatmap_cube(df, base=None):
+    """
+    Builds the cumulative usage cube: for every temperature metric, each day with a temperature
+    and an energy value adds one to the count and its energy to the sum of its city's (finest
+    temperature bin, weekday) cell. A day changes only its own cell, so the cube is
+    stored sparsely, one row per day and cell with the cell's running totals up to that day.
+
+    Args:
+        df (pd.DataFrame): Daily rows with 'city', 'date', 'TMAX_F', 'TMIN_F' and 'energy_mwh'.
+        base (pd.DataFrame, optional): Running totals ('energy_count', 'energy_sum') per cell of
+            `CUBE_CELL_COLUMNS` that the totals continue from, when `df` holds one city's rows
+            from some date on.
+
+    Returns:
+        pd.DataFrame: The columns of `CUBE_COLUMNS`, sorted by cell and date.
+    """
+    df = export_measurements(df.dropna(subset=['date']))
+    cities = df['city'].astype(str).to_numpy()
+    dates = df['date'].to_numpy('datetime64[ns]')
+    weekdays = df['date'].dt.weekday.to_numpy('int64')
+    temperatures = {'TMAX': df['TMAX_F'].to_numpy('float64'), 'TMIN': df['TMIN_F'].to_numpy('float64')}
+    temperatures['AVG'] = (temperatures['TMAX'] + temperatures['TMIN']) / 2
+    energy = df['energy_mwh'].to_numpy('float64')
+
+    frames = []
+    for metric, x in temperatures.items():
+        paired = ~np.isnan(x) & ~np.isnan(energy)
+        frames.append(pd.DataFrame({
+            'city': cities[paired],
+            'metric': metric,
+            'temp_bin': temperature_bin_codes(x[paired]),
+            'weekday': weekdays[paired],
+            'date': dates[paired],
+            'energy_count': 1,
+            'energy_sum': energy[paired]
+        }))
+    cube = pd.concat(frames, ignore_index=True).sort_values(CUBE_CELL_COLUMNS + ['date'], kind='stable', ignore_index=True)
+
+    cells = cube.groupby(CUBE_CELL_COLUMNS, sort=False)
+    cube['energy_count'] = cells['energy_count'].cumsum()
+    cube['energy_sum'] = cells['energy_sum'].cumsum()
+    if base is not None and not base.empty:
+        base_totals = cube[CUBE_CELL_COLUMNS].merge(base[CUBE_CELL_COLUMNS + ['energy_count', 'energy_sum']], on=CUBE_CELL_COLUMNS, how='left')
+        cube['energy_count'] += base_totals['energy_count'].fillna(0).astype('int64').to_numpy()
+        cube['energy_sum'] += base_totals['energy_sum'].fillna(0).to_numpy()
+    return cube[CUBE_COLUMNS]
+
+def _day_keys(dates):
+    return np.asarray(dates, dtype='datetime64[D]').astype('int64') + _DAY_OFFSET
+
+def heatmap_cube_index(cube):
+    """
+    Splits a cube (see `build_heatmap_cube`) by metric into what `window_cell_sums` searches:
+    the cells, the packed (cell, day) keys in ascending order and the running totals.
+    """
+    index = {}
+    for metric, part in cube.groupby('metric', sort=False):
+        cell_keys = part[['city', 'temp_bin', 'weekday']]
+        new_cell = cell_keys.ne(cell_keys.shift()).any(axis=1).to_numpy()
+        cell_ids = np.cumsum(new_cell) - 1
+        index[metric] = (
+            cell_keys[new_cell].reset_index(drop=True),
+            (cell_ids << 32) + _day_keys(part['date']),
+            part[['energy_count', 'energy_sum']].to_numpy('float64')
+        )
+    return index
+
+def window_cell_sums(cube_index, start_date, end_date, metric, city=None):
+    """
+    Returns each cell's count and energy sum over a date range: its running totals on the last
+    day up to `end_date` minus those on the last day before `start_date`. Each cell costs a few
+    binary searches, whatever the number of days in the range.
+
+    Args:
+        cube_index (dict): The index of `heatmap_cube_index`.
+        start_date (str): The first date to include (YYYY-MM-DD).
+        end_date (str): The last date to include (YYYY-MM-DD).
+        metric (str): 'TMAX', 'TMIN' or 'AVG'.
+        city (str, optional): Restricts the sums to one city. Defaults to all cities.
+
+    Returns:
+        pd.DataFrame: 'temp_bin' (of the finest width), 'weekday', 'energy_count' and
+                      'energy_sum', one row per cell.
+    """
+    columns = ['temp_bin', 'weekday', 'energy_count', 'energy_sum']
+    if metric not in cube_index:
+        return pd.DataFrame(columns=columns)
+    cells, keys, running = cube_index[metric]
+    ids = np.flatnonzero(cells['city'].to_numpy() == city) if city is not None else np.arange(len(cells))
+    first = np.searchsorted(keys, ids << 32)
+    last = np.searchsorted(keys, (ids << 32) + _day_keys(pd.Timestamp(end_date).to_datetime64()), side='right') - 1
+    before = np.searchsorted(keys, (ids << 32) + _day_keys(pd.Timestamp(start_date).to_datetime64()), side='left') - 1
+    totals = np.where((last >= first)[:, None], running[last], 0) - np.where((before >= first)[:, None], running[before], 0)
+    return pd.DataFrame({
+        'temp_bin': cells['temp_bin'].to_numpy()[ids],
+        'weekday': cells['weekday'].to_numpy()[ids],
+        'energy_count': totals[:, 0],
+        'energy_sum': totals[:, 1]
+    }, columns=columns)
+
+def row_cell_sums(df, temp_col):
+    """Returns the cell counts and energy sums straight from daily rows with 'date', `temp_col` and 'energy_mwh', in the shape of `window_cell_sums`."""
+    x = df[temp_col].to_numpy('float64')
+    y = df['energy_mwh'].to_numpy('float64')
+    paired = ~np.isnan(x) & ~np.isnan(y)
+    return pd.DataFrame({
+        'temp_bin': temperature_bin_codes(x[paired]),
+        'weekday': df['date'].dt.weekday.to_numpy()[paired],
+        'energy_count': 1,
+        'energy_sum': y[paired]
+    })
+
+def heatmap_from_cell_sums(cell_sums, bin_width):
+    """
+    Returns the average daily energy demand per temperature bin of `bin_width` (rows) and day
+    of the week (columns), rounded to whole MWh, from the finest cells' counts and sums of any
+    number of cities. Cells without days are NaN.
+    """
+    cell_sums = cell_sums.assign(temp_bin=coarsen_bin_codes(cell_sums['temp_bin'], bin_width))
+    totals = cell_sums.groupby(['temp_bin', 'weekday'])[['energy_count', 'energy_sum']].sum()
+    totals = totals[totals['energy_count'] > 0]
+    means = (totals['energy_sum'] / totals['energy_count']).unstack('weekday')
+    labels = [label for _, label in temperature_bins(bin_width)]
+    heatmap = means.reindex(index=range(len(labels)), columns=range(len(WEEKDAYS))).astype('float64')
+    heatmap.index = pd.Index(labels, name='temp_bin')
+    heatmap.columns = pd.Index(WEEKDAYS, name='day_of_week')
+    return heatmap.round(0)
@@ -0,0 +1,221 @@
+import os
+import logging
+import numpy as np
+import pandas as pd
+from .http_transport import FetchError
+from .raw_store import PARQUET_AVAILABLE, _upsert_partition
+
+# Hourly demand is stored as two compact columns: the UTC start of the hour in epoch seconds
+# and the demand in MWh. That is 12 bytes per hour, against hundreds for the raw JSON records.
+HOURLY_DTYPES = {'timestamp': 'int64', 'energy_mwh': 'float32'}
+SECONDS_PER_HOUR = 3600
+SECONDS_PER_DAY = 86400
+DEFAULT_MAX_ROWS_IN_MEMORY = 2_000_000
+ROLLUP_FREQUENCIES = ('D', 'W')
+
+def _partition_path(root_dir, ba_code, year, month):
+    return os.path.join(root_dir, f"ba={str(ba_code).lower()}", f"year={year:04d}", f"month={month:02d}", "part.parquet")
+
+def hourly_frame_from_records(df):
+    """
+    Converts raw hourly EIA `region-data` records into the compact hourly schema.
+    Only demand records (type D) are kept; unparseable periods are dropped.
+
+    Args:
+        df (pd.DataFrame): Raw records with 'period' ('YYYY-MM-DDTHH', UTC) and 'value' columns,
+            and optionally 'type'.
+
+    Returns:
+        pd.DataFrame: 'timestamp' (int64 epoch seconds) and 'energy_mwh' (float32), sorted by timestamp.
+    """
+    if 'type' in df.columns:
+        df = df[df['type'].isna() | (df['type'] == 'D')]
+    hours = pd.to_datetime(df['period'], format='%Y-%m-%dT%H', utc=True, errors='coerce')
+    valid = hours.notna().to_numpy()
+    timestamps = (hours[valid] - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1)
+    hourly_df = pd.DataFrame({
+        'timestamp': timestamps.to_numpy(dtype='int64'),
+        'energy_mwh': pd.to_numeric(df['value'], errors='coerce').to_numpy(dtype='float32', na_value=np.nan)[valid]
+    })
+    return hourly_df.sort_values('timestamp', kind='stable', ignore_index=True)
+
+def write_hourly_pages(pages, ba_code, root_dir):
+    """
+    Streams pages of raw hourly EIA records into the hourly store, partitioned as
+    ba=<code>/year=YYYY/month=MM/part.parquet (UTC months). Only the current page and
+    the month being filled are held in memory. Re-fetched hours replace stored ones.
+
+    Args:
+        pages (iterable): Pages (lists of record dicts) from `iter_eia_pages(..., frequency='hourly')`.
+        ba_code (str): The balancing authority code.
+        root_dir (str): The root directory of the hourly store.
+
+    Returns:
+        int: The number of hours stored, or None if the fetch failed part-way.
+    """
+    buffered_months = {}
+    hour_count = 0
+
+    def flush(keys):
+        for year, month in keys:
+            month_df = pd.concat(buffered_months.pop((year, month)), ignore_index=True)
+            _upsert_partition(_partition_path(root_dir, ba_code, year, month), month_df, ['timestamp'], drop_new_duplicates=True)
+
+    try:
+        for page in pages:
+            page_df = hourly_frame_from_records(pd.DataFrame(page).reindex(columns=['period', 'type', 'value']))
+            hours = pd.to_datetime(page_df['timestamp'], unit='s')
+            for (year, month), month_df in page_df.groupby([hours.dt.year, hours.dt.month]):
+                buffered_months.setdefault((int(year), int(month)), []).append(month_df)
+            hour_count += len(page_df)
+
+            if buffered_months:
+                latest_month = max(buffered_months)
+                flush([key for key in sorted(buffered_months) if key < latest_month])
+    except FetchError:
+        flush(sorted(buffered_months))
+        return None
+    flush(sorted(buffered_months))
+    return hour_count
+
+def _day_numbers(timestamps, timezone=None):
+    """Returns the day number (days since 1970-01-01) of each epoch timestamp, in UTC or in a given time zone."""
+    if timezone is not None:
+        local_times = pd.to_datetime(timestamps, unit='s', utc=True).tz_convert(timezone).tz_localize(None)
+        timestamps = (local_times - pd.Timestamp(0)) // pd.Timedelta(seconds=1)
+        timestamps = np.asarray(timestamps, dtype='int64')
+    return timestamps // SECONDS_PER_DAY
+
+def _local_epoch_seconds(local_seconds, timezone=None):
+    """Returns the epoch timestamps of wall-clock times (seconds since 1970-01-01 00:00) in UTC or in a given time zone."""
+    local_seconds = np.asarray(local_seconds, dtype='int64')
+    if timezone is None:
+        return local_seconds
+    utc_times = pd.to_datetime(local_seconds, unit='s').tz_localize(timezone, ambiguous=True, nonexistent='shift_forward')
+    return np.asarray((utc_times - pd.Timestamp(0, tz='UTC')) // pd.Timedelta(seconds=1), dtype='int64')
+
+def _day_bounds(start_date, end_date, timezone=None):
+    """Returns the epoch timestamps of the first hour of `start_date` and of the day after `end_date`, in UTC or in a given time zone."""
+    first_day = pd.Timestamp(start_date).value // 10**9
+    end_day = pd.Timestamp(end_date).value // 10**9 + SECONDS_PER_DAY
+    first_timestamp, end_timestamp = _local_epoch_seconds([first_day, end_day], timezone)
+    return int(first_timestamp), int(end_timestamp)
+
+def utc_day_range(start_date, end_date, timezone=None):
+    """
+    Returns the first and last UTC days (YYYY-MM-DD) whose hours cover the calendar days from
+    `start_date` to `end_date` in a given time zone. Hourly EIA periods are UTC hours, so
+    this is the range to fetch for local days.
+    """
+    first_timestamp, end_timestamp = _day_bounds(start_date, end_date, timezone)
+    return (
+        pd.Timestamp(first_timestamp, unit='s').strftime('%Y-%m-%d'),
+        pd.Timestamp(end_timestamp - 1, unit='s').strftime('%Y-%m-%d')
+    )
+
+def _expected_hours(period_days, period_length, timezone=None):
+    """Returns the number of hours in each period of `period_length` days starting on `period_days`; local days have 23 or 25 around DST changes."""
+    starts = np.asarray(period_days, dtype='int64') * SECONDS_PER_DAY
+    bounds = _local_epoch_seconds(np.concatenate([starts, starts + period_length * SECONDS_PER_DAY]), timezone)
+    return (bounds[len(starts):] - bounds[:len(starts)]) // SECONDS_PER_HOUR
+
+def rollup_hourly_frame(hourly_df, frequency='D', timezone=None):
+    """
+    Sums hourly demand into daily or weekly (Monday-based) totals with array operations only.
+
+    Args:
+        hourly_df (pd.DataFrame): Compact hourly rows ('timestamp', 'energy_mwh').
+        frequency (str, optional): 'D' for days or 'W' for weeks. Defaults to 'D'.
+        timezone (str, optional): The IANA time zone whose calendar days are used. Defaults to UTC.
+
+    Returns:
+        pd.DataFrame: 'date' (the first day of each period, datetime64), 'energy_mwh' (float64),
+            'hours' (the number of hours with a value) and 'expected_hours' (the number of hours
+            in the period, e.g. 24 for a day, 23 or 25 on a local day with a DST change).
+    """
+    if frequency not in ROLLUP_FREQUENCIES:
+        raise ValueError(f"Unknown rollup frequency '{frequency}'. Use one of {ROLLUP_FREQUENCIES}.")
+    energy = hourly_df['energy_mwh'].to_numpy(dtype='float64')
+    valid = ~np.isnan(energy)
+    days = _day_numbers(hourly_df['timestamp'].to_numpy(dtype='int64')[valid], timezone)
+    period_length = 7 if frequency == 'W' else 1
+    if frequency == 'W':
+        days = days - (days + 3) % 7  # 1970-01-01 was a Thursday; weeks start on Monday.
+
+    period_days, inverse = np.unique(days, return_inverse=True)
+    return pd.DataFrame({
+        'date': pd.to_datetime(period_days, unit='D'),
+        'energy_mwh': np.bincount(inverse, weights=energy[valid], minlength=len(period_days)),
+        'hours': np.bincount(inverse, minlength=len(period_days)).astype('int64'),
+        'expected_hours': _expected_hours(period_days, period_length, timezone)
+    })
+
+def iter_hourly_chunks(root_dir, ba_code, start_date, end_date, timezone=None, max_rows_in_memory=DEFAULT_MAX_ROWS_IN_MEMORY):
+    """
+    Reads a balancing authority's stored hours for a date range (calendar days in UTC, or in
+    `timezone` if given, so the UTC hours read are those of the local days) in chunks of at most
+    `max_rows_in_memory` rows. Month partitions are grouped into chunks using the row counts
+    in their Parquet metadata, so no partition is read twice and no chunk exceeds the budget
+    (unless a single month is larger than it).
+
+    Yields:
+        pd.DataFrame: Compact hourly rows in timestamp order.
+    """
+    import pyarrow.parquet as pq
+
+    first_timestamp, end_timestamp = _day_bounds(start_date, end_date, timezone)
+    paths = [
+        path for path in (
+            _partition_path(root_dir, ba_code, period.year, period.month)
+            for period in pd.period_range(*utc_day_range(start_date, end_date, timezone), freq='M')
+        )
+        if os.path.exists(path)
+    ]
+
+    def read_chunk(chunk_paths):
+        chunk_df = pd.concat([pd.read_parquet(path) for path in chunk_paths], ignore_index=True)
+        in_range = (chunk_df['timestamp'] >= first_timestamp) & (chunk_df['timestamp'] < end_timestamp)
+        return chunk_df[in_range].astype(HOURLY_DTYPES).reset_index(drop=True)
+
+    chunk_paths, chunk_rows = [], 0
+    for path in paths:
+        rows = pq.read_metadata(path).num_rows
+        if chunk_paths and chunk_rows + rows > max_rows_in_memory:
+            yield read_chunk(chunk_paths)
+            chunk_paths, chunk_rows = [], 0
+        chunk_paths.append(path)
+        chunk_rows += rows
+    if chunk_paths:
+        yield read_chunk(chunk_paths)
+
+def rollup_hourly_store(root_dir, ba_code, start_date, end_date, frequency='D', timezone=None, max_rows_in_memory=DEFAULT_MAX_ROWS_IN_MEMORY):
+    """
+    Computes daily or weekly demand totals for a balancing authority from the hourly store,
+    one chunk at a time, so memory use is bounded by `max_rows_in_memory` hourly rows however
+    long the range is. Partial totals of periods spanning two chunks are added together.
+
+    Args:
+        root_dir (str): The root directory of the hourly store.
+        ba_code (str): The balancing authority code.
+        start_date (str): The first day to include (YYYY-MM-DD).
+        end_date (str): The last day to include (YYYY-MM-DD).
+        frequency (str, optional): 'D' for days or 'W' for weeks. Defaults to 'D'.
+        timezone (str, optional): The IANA time zone whose calendar days are used. Defaults to UTC.
+        max_rows_in_memory (int, optional): The largest number of hourly rows read at once.
+
+    Returns:
+        pd.DataFrame: 'date', 'energy_mwh', 'hours' and 'expected_hours', as returned by `rollup_hourly_frame`.
+    """
+    if not PARQUET_AVAILABLE:
+        raise ImportError("The hourly store requires pyarrow.")
+    partial_rollups = [
+        rollup_hourly_frame(chunk_df, frequency, timezone)
+        for chunk_df in iter_hourly_chunks(root_dir, ba_code, start_date, end_date, timezone, max_rows_in_memory)
+    ]
+    if not partial_rollups:
+        return pd.DataFrame({'date': pd.Series(dtype='datetime64[s]'), 'energy_mwh': pd.Series(dtype='float64'), 'hours': pd.Series(dtype='int64'), 'expected_hours': pd.Series(dtype='int64')})
+    rollup_df = pd.concat(partial_rollups, ignore_index=True)
+    if len(partial_rollups) > 1:
+        rollup_df = rollup_df.groupby('date', as_index=False, sort=True).agg({'energy_mwh': 'sum', 'hours': 'sum', 'expected_hours': 'first'})
+    logging.info(f"Rolled up {int(rollup_df['hours'].sum())} stored hours for {ba_code} into {len(rollup_df)} {'daily' if frequency == 'D' else 'weekly'} totals.")
+    return rollup_df
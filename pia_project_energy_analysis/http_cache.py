@@ -0,0 +1,250 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit, urlunsplit
+
+# Credentials are never part of the cache key, so rotating a token does not invalidate the cache.
+SECRET_PARAMS = {'token', 'api_key'}
+# Request parameters that hold the last date covered by a request, per API.
+END_DATE_PARAMS = ('enddate', 'end')
+
+class OfflineCacheMiss(Exception):
+    """Raised in offline mode when a request is not found in the response cache."""
+
+class CachedResponse:
+    """A minimal stand-in for `requests.Response` built from a cache entry."""
+    from_cache = True
+
+    def __init__(self, url, status_code, text):
+        self.url = url
+        self.status_code = status_code
+        self.text = text
+        self.headers = {}
+
+    def json(self):
+        return json.loads(self.text)
+
+class ResponseCache:
+    """
+    A content-addressed, on-disk cache of successful API responses.
+
+    Entries are keyed on the normalized URL and query parameters (excluding credentials).
+    Requests whose end date is older than `closed_after_days` cover closed historical days
+    and never expire; more recent requests expire after `ttl_hours`. When the cache grows
+    beyond `max_size_mb`, the least recently used entries are evicted first.
+
+    Args:
+        cache_dir (str): The directory in which cache entries are stored.
+        max_size_mb (float, optional): Size limit of the cache on disk. Defaults to 1024.
+        ttl_hours (float, optional): Lifetime of entries covering recent days. Defaults to 24.
+        closed_after_days (int, optional): Age in days after which data is considered final. Defaults to 7.
+        offline (bool, optional): If True, never go to the network and raise OfflineCacheMiss
+            for requests that are not cached. Defaults to False.
+    """
+    def __init__(self, cache_dir, max_size_mb=1024, ttl_hours=24, closed_after_days=7, offline=False):
+        self.cache_dir = cache_dir
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_hours * 3600
+        self.closed_after_days = closed_after_days
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_size = sum(size for _, size, _ in self._list_entries())
+
+    @property
+    def size_bytes(self):
+        """The total size of the cache entries on disk."""
+        with self._lock:
+            return self._total_size
+
+    @staticmethod
+    def make_key(url, params):
+        """Returns the cache key for a request: a SHA-256 of its normalized URL and parameters."""
+        parts = urlsplit(url)
+        normalized_url = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), '', ''))
+        normalized_params = []
+        for key, value in (params or {}).items():
+            if key in SECRET_PARAMS:
+                continue
+            values = value if isinstance(value, (list, tuple)) else [value]
+            normalized_params.extend((str(key), str(v)) for v in values)
+        payload = json.dumps([normalized_url, sorted(normalized_params)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _list_entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith('.json'):
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def _expires_at(self, params):
+        """Returns the expiry timestamp for a request, or None if it only covers closed historical days."""
+        for param_name in END_DATE_PARAMS:
+            end_date = (params or {}).get(param_name)
+            if not end_date:
+                continue
+            try:
+                end_date_dt = datetime.strptime(str(end_date)[:10], '%Y-%m-%d')
+            except ValueError:
+                break
+            if end_date_dt < datetime.now() - timedelta(days=self.closed_after_days):
+                return None
+            break
+        return time.time() + self.ttl_seconds
+
+    def get(self, url, params):
+        """Returns the cached response for a request, or None if it is missing or expired."""
+        path = self._entry_path(self.make_key(url, params))
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if entry.get('expires_at') is not None and entry['expires_at'] < time.time():
+            with self._lock:
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path)  # Marks the entry as recently used for LRU eviction.
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return CachedResponse(entry['url'], entry['status_code'], entry['body'])
+
+    def set(self, url, params, response):
+        """Stores a successful response, then evicts old entries if the cache is over its size limit."""
+        key = self.make_key(url, params)
+        path = self._entry_path(key)
+        entry = {
+            'url': url,
+            'params': {k: v for k, v in (params or {}).items() if k not in SECRET_PARAMS},
+            'status_code': response.status_code,
+            'stored_at': time.time(),
+            'expires_at': self._expires_at(params),
+            'body': response.text
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(entry, f)
+        previous_size = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._total_size += os.path.getsize(path) - previous_size
+            if self._total_size > self.max_size_bytes:
+                self._evict()
+
+    def delete(self, url, params):
+        """Removes the entry of a request, e.g. one whose body turned out to be unusable."""
+        path = self._entry_path(self.make_key(url, params))
+        try:
+            size = os.path.getsize(path)
+            os.unlink(path)
+        except OSError:
+            return
+        with self._lock:
+            self._total_size -= size
+
+    def _evict(self):
+        """Deletes least recently used entries until the cache is back under 90% of its size limit."""
+        target_size = self.max_size_bytes * 0.9
+        entries = sorted(self._list_entries(), key=lambda entry: entry[2])
+        self._total_size = sum(size for _, size, _ in entries)
+        evicted = 0
+        for path, size, _ in entries:
+            if self._total_size <= target_size:
+                break
+            try:
+                os.unlink(path)
+                self._total_size -= size
+                evicted += 1
+            except OSError:
+                continue
+        logging.info(f"Response cache over its size limit: evicted {evicted} least recently used entries.")
+
+def cached_request(cache, url, params, make_request):
+    """
+    Serves a request from the response cache when possible, otherwise performs it with
+    `make_request` and caches the response if it was successful. Both APIs answer in JSON, so
+    a response whose body does not parse (e.g. a truncated page) is returned uncached; caching
+    it would replay the failure on every later run.
+
+    Args:
+        cache (ResponseCache or None): The response cache. If None, `make_request` is always called.
+        url (str): The request URL, used for the cache key.
+        params (dict): The request parameters, used for the cache key.
+        make_request (callable): Performs the actual request and returns the response.
+
+    Returns:
+        requests.Response or CachedResponse: The response.
+
+    Raises:
+        OfflineCacheMiss: If the cache is in offline mode and has no entry for the request.
+    """
+    if cache is None:
+        return make_request()
+
+    cached_response = cache.get(url, params)
+    if cached_response is not None:
+        return cached_response
+    if cache.offline:
+        raise OfflineCacheMiss(f"Offline mode: no cached response for {url}")
+
+    response = make_request()
+    if response.status_code == 200:
+        try:
+            response.json()
+        except ValueError:
+            logging.warning(f"Not caching the response from {url}: its body is not valid JSON.")
+            return response
+        cache.set(url, params, response)
+    return response
+
+def build_response_cache(cache_settings, cache_dir, offline=False):
+    """
+    Builds the response cache from the `http_cache` config section.
+
+    Args:
+        cache_settings (dict): The `http_cache` section of config.yaml.
+        cache_dir (str): The absolute path of the cache directory.
+        offline (bool, optional): Forces offline replay mode. Defaults to False.
+
+    Returns:
+        ResponseCache: The cache, or None if caching is disabled.
+    """
+    cache_settings = cache_settings or {}
+    offline = offline or cache_settings.get('offline', False)
+    if not cache_settings.get('enabled', True) and not offline:
+        logging.info("HTTP response cache is disabled.")
+        return None
+
+    cache = ResponseCache(
+        cache_dir,
+        max_size_mb=cache_settings.get('max_size_mb', 1024),
+        ttl_hours=cache_settings.get('ttl_hours', 24),
+        closed_after_days=cache_settings.get('closed_after_days', 7),
+        offline=offline
+    )
+    mode = "offline replay" if offline else "read-through"
+    logging.info(f"HTTP response cache enabled at {cache_dir} ({mode} mode, {cache.size_bytes / 1024 / 1024:.1f} MB in use).")
+    return cache
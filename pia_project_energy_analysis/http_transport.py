@@ -0,0 +1,230 @@
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, retry_if_result
+from .run_metrics import span, record_span
+
+DEFAULT_MAX_CONNECTIONS_PER_HOST = 8
+MAX_RETRY_AFTER_SECONDS = 120
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive'
+}
+
+class FetchError(Exception):
+    """Raised by the paginated fetchers when a page cannot be retrieved after all retries."""
+
+_lock = threading.Lock()
+_sessions = {}
+_host_semaphores = {}
+_host_stats = {}
+_settings = {'max_connections_per_host': DEFAULT_MAX_CONNECTIONS_PER_HOST, 'host_limits': {}}
+
+def configure_transport(transport_settings=None):
+    """
+    Applies the `http_transport` config section. Must be called before the first request
+    to a host for its limits to take effect.
+
+    Args:
+        transport_settings (dict, optional): May contain 'max_connections_per_host' (the default
+            cap on concurrent requests and pooled connections per host) and 'host_limits', a
+            mapping of host name to a cap that overrides the default for that host.
+    """
+    transport_settings = transport_settings or {}
+    with _lock:
+        _settings['max_connections_per_host'] = transport_settings.get('max_connections_per_host', DEFAULT_MAX_CONNECTIONS_PER_HOST)
+        _settings['host_limits'] = transport_settings.get('host_limits') or {}
+
+def _host_of(url):
+    return urlsplit(url).netloc.lower()
+
+def _get_host_resources(host):
+    """Returns the pooled session, concurrency semaphore and counters for a host, creating them on first use."""
+    with _lock:
+        if host not in _sessions:
+            max_connections = _settings['host_limits'].get(host, _settings['max_connections_per_host'])
+            session = requests.Session()
+            session.headers.update(DEFAULT_HEADERS)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _sessions[host] = session
+            _host_semaphores[host] = threading.BoundedSemaphore(max_connections)
+            _host_stats[host] = {'requests': 0, 'retries': 0, 'throttled': 0, 'errors': 0}
+            logging.info(f"Opened pooled HTTP session for {host} (max {max_connections} concurrent connections).")
+        return _sessions[host], _host_semaphores[host], _host_stats[host]
+
+def http_get(url, params=None, headers=None, timeout=20):
+    """
+    Performs a GET request over the pooled, keep-alive session for the URL's host.
+    At most `max_connections_per_host` requests run concurrently per host; extra callers wait.
+
+    Args:
+        url (str): The request URL.
+        params (dict, optional): Query parameters.
+        headers (dict, optional): Extra headers, merged over the session defaults.
+        timeout (float, optional): Request timeout in seconds. Defaults to 20.
+
+    Returns:
+        requests.Response: The response. Status codes are not checked here.
+    """
+    host = _host_of(url)
+    session, semaphore, stats = _get_host_resources(host)
+    with semaphore:
+        try:
+            with span('http_request', host=host) as span_tags:
+                response = session.get(url, params=params, headers=headers, timeout=timeout)
+                span_tags.update(status=response.status_code, bytes=response_size(response))
+        except requests.exceptions.RequestException:
+            with _lock:
+                stats['requests'] += 1
+                stats['errors'] += 1
+            raise
+    with _lock:
+        stats['requests'] += 1
+        if response.status_code == 429:
+            stats['throttled'] += 1
+    return response
+
+def response_size(response):
+    """The size of a response body in bytes (characters for responses served from the cache)."""
+    content = getattr(response, 'content', None)
+    return len(content) if content is not None else len(response.text)
+
+def get_transport_stats():
+    """
+    Returns per-host transport counters: requests sent, new TCP/TLS connections opened,
+    connections reused via keep-alive, retries, 429 responses and network errors.
+
+    Returns:
+        dict: A mapping of host name to a dictionary of counters.
+    """
+    with _lock:
+        report = {}
+        for host, session in _sessions.items():
+            new_connections = 0
+            pooled_requests = 0
+            for adapter in set(session.adapters.values()):
+                pools = adapter.poolmanager.pools
+                for pool_key in list(pools.keys()):
+                    pool = pools.get(pool_key)
+                    if pool is not None:
+                        new_connections += pool.num_connections
+                        pooled_requests += pool.num_requests
+            stats = dict(_host_stats[host])
+            stats['new_connections'] = new_connections
+            stats['reused_connections'] = max(0, pooled_requests - new_connections)
+            report[host] = stats
+        return report
+
+def log_transport_stats():
+    """Logs a one-line summary of the transport counters for every host contacted."""
+    for host, stats in get_transport_stats().items():
+        logging.info(
+            f"HTTP transport for {host}: {stats['requests']} requests, {stats['new_connections']} new connections, "
+            f"{stats['reused_connections']} reused, {stats['retries']} retries, {stats['throttled']} throttled (429), {stats['errors']} errors."
+        )
+
+def prefetch_in_order(tasks, max_workers):
+    """
+    Runs callables concurrently while yielding their results in the original order.
+    At most `max_workers` tasks are in flight (or finished but not yet consumed) at a time,
+    so memory stays bounded however many tasks there are. If a task raises, the exception
+    is re-raised when its result is reached and the remaining tasks are cancelled.
+
+    Args:
+        tasks (iterable): Zero-argument callables.
+        max_workers (int): The number of tasks to run ahead concurrently.
+
+    Yields:
+        The return value of each task, in order.
+    """
+    tasks = iter(tasks)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        try:
+            for task in tasks:
+                in_flight.append(executor.submit(task))
+                if len(in_flight) >= max_workers:
+                    break
+            while in_flight:
+                result = in_flight.popleft().result()
+                next_task = next(tasks, None)
+                if next_task is not None:
+                    in_flight.append(executor.submit(next_task))
+                yield result
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+def _is_retriable_response(response):
+    """Return True for 5xx server errors and 429 Too Many Requests, which are worth retrying."""
+    return response.status_code >= 500 or response.status_code == 429
+
+def _retry_after_seconds(response):
+    """Parses a Retry-After header (delta-seconds or HTTP-date). Returns None if absent or invalid."""
+    value = response.headers.get('Retry-After') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class wait_retry_after:
+    """
+    A tenacity wait strategy that honours the server's Retry-After header on 429/503
+    responses, and otherwise falls back to exponential backoff. Throttled responses without
+    a Retry-After header back off from a longer base delay than other errors.
+    """
+    def __init__(self, fallback=None, throttled_fallback=None, max_wait=MAX_RETRY_AFTER_SECONDS):
+        self.fallback = fallback or wait_exponential(multiplier=1, min=2, max=10)
+        self.throttled_fallback = throttled_fallback or wait_exponential(multiplier=2, min=5, max=60)
+        self.max_wait = max_wait
+
+    def __call__(self, retry_state):
+        outcome = retry_state.outcome
+        if outcome is not None and not outcome.failed:
+            response = outcome.result()
+            if response.status_code in (429, 503):
+                retry_after = _retry_after_seconds(response)
+                if retry_after is not None:
+                    return min(retry_after, self.max_wait)
+                if response.status_code == 429:
+                    return self.throttled_fallback(retry_state)
+        return self.fallback(retry_state)
+
+def _record_retry(retry_state):
+    """tenacity before_sleep hook: counts the retry against the host of the failed request, and records its wait as a span."""
+    host = None
+    reason = {}
+    if retry_state.outcome is not None and not retry_state.outcome.failed:
+        host = _host_of(retry_state.outcome.result().url)
+        reason['status'] = retry_state.outcome.result().status_code
+    elif retry_state.args and isinstance(retry_state.args[0], str):
+        host = _host_of(retry_state.args[0])
+    if retry_state.outcome is not None and retry_state.outcome.failed:
+        reason['error'] = type(retry_state.outcome.exception()).__name__
+    if host in _host_stats:
+        with _lock:
+            _host_stats[host]['retries'] += 1
+    record_span('retry', retry_state.next_action.sleep, started_at=time.time(), host=host or 'unknown', attempt=retry_state.attempt_number, **reason)
+    logging.info(f"Retrying request to {host or 'unknown host'} in {retry_state.next_action.sleep:.1f}s (attempt {retry_state.attempt_number} failed).")
+
+api_retry = retry(
+    wait=wait_retry_after(),
+    stop=stop_after_attempt(5),
+    retry=(retry_if_exception_type(requests.exceptions.RequestException) | retry_if_result(_is_retriable_response)),
+    before_sleep=_record_retry,
+    reraise=True
+)
@@ -0,0 +1,212 @@
+import os
+import json
+import logging
+from datetime import datetime
+import pandas as pd
+from .raw_store import PARQUET_AVAILABLE
+from .schema import MEASUREMENT_DTYPES, DATE_DTYPE
+from .atomic_files import write_atomically, write_json_atomically
+
+MANIFEST_FILENAME = 'manifest.json'
+MASTER_COLUMNS = ['date', 'TMAX_F', 'TMIN_F', 'energy_mwh', 'city']
+
+def _partition_relpath(city_name, year):
+    return os.path.join(f"city={city_name.lower().replace(' ', '_')}", f"year={year:04d}", "part.parquet")
+
+def _remove_partition_file(master_dir, path):
+    """Deletes a partition file and any partition directories it leaves empty."""
+    if os.path.exists(path):
+        os.remove(path)
+    directory = os.path.dirname(path)
+    while os.path.abspath(directory) != os.path.abspath(master_dir) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+def load_master_manifest(master_dir):
+    """
+    Loads the manifest of the partitioned master dataset.
+
+    Args:
+        master_dir (str): The root directory of the partitioned master dataset.
+
+    Returns:
+        dict: The manifest, or None if the dataset has not been written yet or cannot be read.
+    """
+    path = os.path.join(master_dir, MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logging.warning(f"Could not read the master dataset manifest at {path}: {e}")
+        return None
+
+def _prepare_master_rows(df):
+    """Projects master rows to the dataset schema: dated rows only, datetime64 dates, float32 temperatures and float64 energy."""
+    df = df.reindex(columns=MASTER_COLUMNS).dropna(subset=['date'])
+    return df.assign(
+        date=pd.to_datetime(df['date']).astype(DATE_DTYPE),
+        city=df['city'].astype('object'),
+        **{column: pd.to_numeric(df[column], errors='coerce').astype(dtype) for column, dtype in MEASUREMENT_DTYPES.items()}
+    )
+
+def _write_partition(master_dir, city_name, year, partition_df):
+    """Atomically writes one city/year partition and returns its manifest entry."""
+    relpath = _partition_relpath(city_name, year)
+    partition_df = partition_df.sort_values('date')
+    write_atomically(os.path.join(master_dir, relpath), lambda path: partition_df.to_parquet(path, index=False))
+    return {
+        "city": city_name,
+        "year": year,
+        "path": relpath,
+        "rows": len(partition_df),
+        "min_date": partition_df['date'].min().strftime('%Y-%m-%d'),
+        "max_date": partition_df['date'].max().strftime('%Y-%m-%d')
+    }
+
+def _write_manifest(master_dir, city_names, partitions):
+    manifest = {
+        "format_version": 1,
+        "updated_at": datetime.now().isoformat(timespec='seconds'),
+        "columns": MASTER_COLUMNS,
+        "cities": sorted(city_names),
+        "partitions": sorted(partitions, key=lambda partition: (partition['city'], partition['year']))
+    }
+    write_json_atomically(os.path.join(master_dir, MANIFEST_FILENAME), manifest, indent=4)
+    return manifest
+
+def write_master_dataset(master_df, master_dir):
+    """
+    Writes the master data as a Parquet dataset partitioned by city and year, replacing any
+    previous contents, together with a manifest.json that lists every partition with its
+    row count and date range. Readers use the manifest to open only the partitions they need.
+
+    Placeholder rows (configured cities without any data) are not stored in a partition,
+    but the cities are still listed in the manifest.
+
+    Args:
+        master_df (pd.DataFrame): The combined master data, as written to the master CSV file.
+        master_dir (str): The root directory of the partitioned master dataset.
+
+    Returns:
+        dict: The manifest that was written.
+    """
+    df = _prepare_master_rows(master_df)
+    partitions = [
+        _write_partition(master_dir, city_name, int(year), partition_df)
+        for (city_name, year), partition_df in df.groupby(['city', df['date'].dt.year], sort=True)
+    ]
+
+    current_paths = {os.path.join(master_dir, partition['path']) for partition in partitions}
+    for root, _, files in os.walk(master_dir):
+        for filename in files:
+            path = os.path.join(root, filename)
+            if filename.endswith('.parquet') and path not in current_paths:
+                _remove_partition_file(master_dir, path)
+
+    city_names = master_df['city'].dropna().unique().tolist() if 'city' in master_df.columns else []
+    manifest = _write_manifest(master_dir, city_names, partitions)
+    logging.info(f"Wrote the partitioned master dataset ({len(df)} rows in {len(partitions)} partitions) to {master_dir}")
+    return manifest
+
+def upsert_master_dataset(new_df, master_dir, configured_city_names):
+    """
+    Merges new rows into the partitioned master dataset, keyed by (city, date), rewriting
+    only the city/year partitions the new rows fall into. Values from the new rows win, while
+    columns the new rows leave empty keep their existing values. Partitions of cities that are
+    no longer configured are removed. The dataset must already exist (see `write_master_dataset`).
+
+    Args:
+        new_df (pd.DataFrame): The rows processed in this run.
+        master_dir (str): The root directory of the partitioned master dataset.
+        configured_city_names (set): The names of the configured cities.
+
+    Returns:
+        dict: The manifest that was written.
+
+    Raises:
+        FileNotFoundError: If the dataset has no manifest.
+    """
+    manifest = load_master_manifest(master_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No partitioned master dataset found at {master_dir}")
+
+    partitions = {(partition['city'], partition['year']): partition for partition in manifest.get('partitions', [])}
+    for key, partition in list(partitions.items()):
+        if partition['city'] not in configured_city_names:
+            _remove_partition_file(master_dir, os.path.join(master_dir, partition['path']))
+            del partitions[key]
+
+    df = _prepare_master_rows(new_df[new_df['city'].isin(configured_city_names)])
+    rewritten_count = 0
+    for (city_name, year), partition_df in df.groupby(['city', df['date'].dt.year], sort=True):
+        rewritten_count += 1
+        key = (city_name, int(year))
+        if key in partitions:
+            existing_df = pd.read_parquet(os.path.join(master_dir, partitions[key]['path']))
+            partition_df = partition_df.set_index('date').combine_first(existing_df.set_index('date')).reset_index()
+        partitions[key] = _write_partition(master_dir, city_name, int(year), partition_df.reindex(columns=MASTER_COLUMNS))
+
+    manifest = _write_manifest(master_dir, configured_city_names, list(partitions.values()))
+    logging.info(f"Upserted {len(df)} rows into the partitioned master dataset at {master_dir}, rewriting {rewritten_count} of {len(partitions)} partitions.")
+    return manifest
+
+def select_master_partitions(manifest, cities=None, start_date=None, end_date=None):
+    """
+    Returns the manifest entries of the partitions that can hold rows for the given cities
+    and date range. Dates are compared as YYYY-MM-DD strings.
+    """
+    selected = []
+    for partition in manifest.get('partitions', []):
+        if cities is not None and partition['city'] not in cities:
+            continue
+        if start_date is not None and partition['max_date'] < start_date:
+            continue
+        if end_date is not None and partition['min_date'] > end_date:
+            continue
+        selected.append(partition)
+    return selected
+
+def read_master_dataset(master_dir, cities=None, start_date=None, end_date=None, columns=None):
+    """
+    Reads the partitioned master dataset, pushing the city and date filters down: only the
+    partitions listed in the manifest for those cities and years are opened, and rows outside
+    the date range are filtered out while each partition is read.
+
+    Args:
+        master_dir (str): The root directory of the partitioned master dataset.
+        cities (list, optional): The cities to read. Defaults to all cities.
+        start_date (str, optional): The first date to include (YYYY-MM-DD). Defaults to no lower bound.
+        end_date (str, optional): The last date to include (YYYY-MM-DD). Defaults to no upper bound.
+        columns (list, optional): The columns to read; 'city' and 'date' are always included.
+            Defaults to all columns.
+
+    Returns:
+        pd.DataFrame: The matching rows sorted by city and date, with 'date' as datetime64.
+
+    Raises:
+        FileNotFoundError: If the dataset has no manifest.
+    """
+    manifest = load_master_manifest(master_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"No partitioned master dataset found at {master_dir}")
+    start_date = str(start_date)[:10] if start_date is not None else None
+    end_date = str(end_date)[:10] if end_date is not None else None
+    read_columns = MASTER_COLUMNS if columns is None else list(dict.fromkeys(['date', 'city'] + list(columns)))
+
+    filters = []
+    if start_date is not None:
+        filters.append(('date', '>=', pd.Timestamp(start_date)))
+    if end_date is not None:
+        filters.append(('date', '<=', pd.Timestamp(end_date)))
+
+    partitions = select_master_partitions(manifest, cities, start_date, end_date)
+    frames = [
+        pd.read_parquet(os.path.join(master_dir, partition['path']), columns=read_columns, filters=filters or None)
+        for partition in partitions
+    ]
+    logging.info(f"Read {len(partitions)} of {len(manifest.get('partitions', []))} master dataset partitions.")
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=DATE_DTYPE if column == 'date' else MEASUREMENT_DTYPES.get(column, 'float64')) for column in read_columns}).astype({'city': 'object'})
+    return pd.concat(frames, ignore_index=True).sort_values(['city', 'date'], ignore_index=True)
@@ -1,100 +1,153 @@
-import requests
 import time
 from datetime import datetime, timedelta
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type, retry_if_result
-
-def _is_server_error(response):
-    """Return True if the response status code is a 5xx server error, indicating a retriable issue."""
-    return response.status_code >= 500
-
-@retry(
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    stop=stop_after_attempt(3),
-    retry=(retry_if_exception_type(requests.exceptions.RequestException) | retry_if_result(_is_server_error)),
-    reraise=True
-)
-def _make_noaa_api_request(url, headers, params, log_identifier):
+from .http_cache import cached_request
+from .http_transport import http_get, api_retry, prefetch_in_order, response_size, FetchError
+from .run_metrics import span
+
+@api_retry
+def _make_noaa_api_request(url, headers, params, log_identifier, rate_limiter=None):
     """
-    Makes a single, robust request to the NOAA API, decorated to handle retries.
+    Makes a single, robust request to the NOAA API over the pooled HTTP transport.
+    Network errors, 5xx and 429 responses are retried, honouring any Retry-After header.
+    If a rate limiter is given, every attempt (including retries) waits for a token first.
     """
-    response = requests.get(url, headers=headers, params=params, timeout=20)
+    if rate_limiter is not None:
+        rate_limiter.acquire()
+    response = http_get(url, params=params, headers=headers, timeout=20)
     return response
  
-def fetch_noaa_data(base_url, token, station_id, start_date, end_date, datatypes='TMAX,TMIN', city_name=None):
+def _noaa_date_chunks(start_date, end_date):
+    """Splits a date range into consecutive chunks that fit within the API's one-year limit."""
+    start_date_dt = datetime.strptime(start_date, '%Y-%m-%d')
+    end_date_dt = datetime.strptime(end_date, '%Y-%m-%d')
+    current_start_dt = start_date_dt
+    chunks = []
+
+    while current_start_dt <= end_date_dt:
+        chunk_end_dt = current_start_dt + timedelta(days=364)
+        if chunk_end_dt > end_date_dt:
+            chunk_end_dt = end_date_dt
+        chunks.append((current_start_dt.strftime('%Y-%m-%d'), chunk_end_dt.strftime('%Y-%m-%d')))
+        current_start_dt = chunk_end_dt + timedelta(days=1)
+    return chunks
+
+def _iter_noaa_chunk_pages(endpoint_url, headers, station_id, chunk_start_str, chunk_end_str, datatypes, log_identifier, rate_limiter=None, cache=None):
+    """Pages sequentially through one date chunk (at most one year) of NOAA data, yielding each page of results."""
+    api_limit_per_request = 1000
+    print(f"\nFetching NOAA data chunk for {log_identifier} from {chunk_start_str} to {chunk_end_str}...")
+
+    offset = 1
+    while True:
+        params = {
+            'datasetid': 'GHCND',
+            'stationid': station_id,
+            'startdate': chunk_start_str,
+            'enddate': chunk_end_str,
+            'limit': api_limit_per_request,
+            'offset': offset,
+            'datatypeid': datatypes.split(','),
+            'units': 'metric'
+        }
+
+        with span('page', source='noaa', city=log_identifier, offset=offset) as span_tags:
+            try:
+                print(f"Requesting data for {log_identifier} with offset {offset}...")
+                response = cached_request(cache, endpoint_url, params, lambda: _make_noaa_api_request(endpoint_url, headers, params, log_identifier, rate_limiter=rate_limiter))
+            except Exception as e:
+                print(f"An unrecoverable error occurred for {log_identifier} after multiple attempts: {e}")
+                raise FetchError(f"NOAA request for {log_identifier} failed: {e}") from e
+
+            span_tags.update(status=response.status_code, bytes=response_size(response), cached=getattr(response, 'from_cache', False))
+            if response.status_code != 200:
+                print(f"Client error fetching NOAA data for {log_identifier}. Status: {response.status_code}, Response: {response.text}")
+                raise FetchError(f"NOAA request for {log_identifier} failed with status {response.status_code}.")
+
+            try:
+                results_this_page = response.json().get('results', [])
+            except (ValueError, AttributeError) as e:
+                print(f"Malformed NOAA response for {log_identifier}: {e}")
+                if cache is not None and getattr(response, 'from_cache', False):
+                    # An entry cached before bodies were checked must not fail every later run.
+                    cache.delete(endpoint_url, params)
+                raise FetchError(f"NOAA response for {log_identifier} could not be parsed: {e}") from e
+            span_tags['rows'] = len(results_this_page)
+
+        if results_this_page:
+            yield results_this_page
+
+        if not results_this_page or len(results_this_page) < api_limit_per_request:
+            break
+
+        offset += len(results_this_page)
+        if rate_limiter is None and not getattr(response, 'from_cache', False):
+            time.sleep(0.2)
+
+def iter_noaa_pages(base_url, token, station_id, start_date, end_date, datatypes='TMAX,TMIN', city_name=None, rate_limiter=None, cache=None, prefetch_workers=1):
     """
-    Fetches all weather data from the NOAA API for a given station and date range,
+    Fetches weather data from the NOAA API for a given station and date range page by page,
     handling pagination and the API's one-year limit automatically by chunking requests.
+    Each page is yielded as soon as it arrives, so callers never hold more than one page.
+
+    With `prefetch_workers` above 1, up to that many one-year chunks are fetched concurrently
+    (each chunk still pages in sequence), and their pages are yielded in chronological order.
+    Requests still go through the shared rate limiter, so the API's limits are respected.
+
+    Several stations can be fetched in one request by passing a list of station IDs; the pages
+    then mix their records, which carry a 'station' field to tell them apart.
 
     Args:
         base_url (str): The base URL for the NOAA API endpoint.
         token (str): Your NOAA API token.
-        station_id (str): The ID of the weather station.
+        station_id (str or list): The ID of the weather station, or a list of station IDs.
         start_date (str): The start date string in YYYY-MM-DD format.
         end_date (str): The end date string in YYYY-MM-DD format.
         datatypes (str): Comma-separated string of data types to fetch (e.g., 'TMAX,TMIN').
         city_name (str, optional): The name of the city for better logging. Defaults to None.
+        rate_limiter (TokenBucket, optional): Shared NOAA rate limiter. When omitted, a fixed
+            pause is used between pages instead. Defaults to None.
+        cache (ResponseCache, optional): Response cache consulted before each page request. Defaults to None.
+        prefetch_workers (int, optional): Number of chunks to fetch concurrently. Defaults to 1 (sequential).
 
-    Returns:
-        dict: A dictionary containing all results, or None if the request fails.
+    Yields:
+        list: The result records of one page.
+
+    Raises:
+        FetchError: If a page cannot be fetched after multiple attempts.
     """
     log_identifier = city_name if city_name else station_id
+    if isinstance(log_identifier, (list, tuple)):
+        log_identifier = f"{len(log_identifier)} stations"
     headers = {
         'token': token,
         'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
     }
     endpoint_url = f"{base_url.rstrip('/')}/data"
-    all_results = []
-    api_limit_per_request = 1000
+    chunks = _noaa_date_chunks(start_date, end_date)
 
-    start_date_dt = datetime.strptime(start_date, '%Y-%m-%d')
-    end_date_dt = datetime.strptime(end_date, '%Y-%m-%d')
-    current_start_dt = start_date_dt
+    def chunk_pages(chunk):
+        return _iter_noaa_chunk_pages(endpoint_url, headers, station_id, chunk[0], chunk[1], datatypes, log_identifier, rate_limiter=rate_limiter, cache=cache)
 
-    while current_start_dt <= end_date_dt:
-        chunk_end_dt = current_start_dt + timedelta(days=364)
-        if chunk_end_dt > end_date_dt:
-            chunk_end_dt = end_date_dt
+    if prefetch_workers <= 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from chunk_pages(chunk)
+        return
 
-        chunk_start_str = current_start_dt.strftime('%Y-%m-%d')
-        chunk_end_str = chunk_end_dt.strftime('%Y-%m-%d')
-
-        print(f"\nFetching NOAA data chunk for {log_identifier} from {chunk_start_str} to {chunk_end_str}...")
-
-        offset = 1
-        while True:
-            params = {
-                'datasetid': 'GHCND',
-                'stationid': station_id,
-                'startdate': chunk_start_str,
-                'enddate': chunk_end_str,
-                'limit': api_limit_per_request,
-                'offset': offset,
-                'datatypeid': datatypes.split(','),
-                'units': 'metric'
-            }
- 
-            try:
-                print(f"Requesting data for {log_identifier} with offset {offset}...")
-                response = _make_noaa_api_request(endpoint_url, headers, params, log_identifier)
- 
-                if response.status_code != 200:
-                    print(f"Client error fetching NOAA data for {log_identifier}. Status: {response.status_code}, Response: {response.text}")
-                    return None
- 
-                data = response.json()
-                results_this_page = data.get('results', [])
-                all_results.extend(results_this_page)
- 
-            except Exception as e:
-                print(f"An unrecoverable error occurred for {log_identifier} after multiple attempts: {e}")
-                return None
- 
-            if not results_this_page or len(results_this_page) < api_limit_per_request:
-                break
-            
-            offset += len(results_this_page)
-            time.sleep(0.2)
+    tasks = (lambda chunk=chunk: list(chunk_pages(chunk)) for chunk in chunks)
+    for pages in prefetch_in_order(tasks, prefetch_workers):
+        yield from pages
 
-        current_start_dt = chunk_end_dt + timedelta(days=1)
+def fetch_noaa_data(base_url, token, station_id, start_date, end_date, datatypes='TMAX,TMIN', city_name=None, rate_limiter=None, cache=None, prefetch_workers=1):
+    """
+    Fetches all weather data from the NOAA API for a given station and date range into memory.
+    Takes the same arguments as `iter_noaa_pages`; prefer that generator for large date ranges.
 
+    Returns:
+        dict: A dictionary containing all results, or None if the request fails.
+    """
+    all_results = []
+    try:
+        for page in iter_noaa_pages(base_url, token, station_id, start_date, end_date, datatypes=datatypes, city_name=city_name, rate_limiter=rate_limiter, cache=cache, prefetch_workers=prefetch_workers):
+            all_results.extend(page)
+    except FetchError:
+        return None
     return {'results': all_results}
@@ -1,61 +1,444 @@
 import os
 import json
 from datetime import datetime, timedelta
-import time
 import argparse
 import logging
+import logging.handlers
+import queue
+import multiprocessing
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from .config_loader import load_configuration
-from .noaa_fetcher import fetch_noaa_data
-from .eia_fetcher import fetch_eia_data
-from .data_processor import process_noaa_data, process_eia_data, merge_and_save_data, combine_processed_data
+from .rate_limiter import build_rate_limiters
+from .http_cache import build_response_cache
+from .http_transport import configure_transport, log_transport_stats, get_transport_stats, FetchError
+from .watermarks import load_watermarks, save_watermarks, get_incremental_start_date, last_complete_date, advance_watermark
+from .noaa_fetcher import iter_noaa_pages
+from .eia_fetcher import iter_eia_pages
+from .raw_store import PARQUET_AVAILABLE, write_raw_pages, write_demultiplexed_raw_pages, read_raw_partitions
+from .master_store import load_master_manifest, write_master_dataset, upsert_master_dataset, read_master_dataset
+from .analytic_store import write_analytic_store, upsert_analytic_store
+from .analytic_queries import query_master_rows
+from .hourly_store import DEFAULT_MAX_ROWS_IN_MEMORY, write_hourly_pages, utc_day_range
+from .rollups import write_rollups, update_rollups
+from .schema import apply_master_schema, log_memory_report
+from .atomic_files import write_json_atomically
+from .run_manifest import start_run_manifest
+from .run_metrics import span, run_in_span, add_spans, start_run_metrics, write_run_metrics
+from .data_processor import process_noaa_data, process_eia_data, process_noaa_frame, process_eia_frame, process_eia_hourly, merge_and_save_data, combine_processed_data, write_master_csv, MASTER_CSV_FILENAME, NOAA_RAW_COLUMNS, EIA_RAW_COLUMNS
  
-def fetch_and_save_noaa_data(city, noaa_base_url, noaa_token, full_raw_data_path, start_date, end_date):
-    """Fetches and saves NOAA weather data for a given city."""
+def _save_pages_as_ndjson(pages, filename):
+    """
+    Streams pages of records to a compact NDJSON file (one record per line) as they arrive.
+    Records are written to a temporary file that only replaces `filename` once every page
+    has been received. If the fetch fails part-way, an empty file is saved instead; on any
+    other error the temporary file is removed and the error raised.
+
+    Returns:
+        int: The number of records saved, or None if the fetch failed.
+    """
+    temp_filename = f"{filename}.part"
+    record_count = 0
+    completed = False
+    try:
+        with open(temp_filename, 'w') as f:
+            for page in pages:
+                f.writelines(json.dumps(record, separators=(',', ':')) + '\n' for record in page)
+                record_count += len(page)
+        os.replace(temp_filename, filename)
+        completed = True
+    except FetchError:
+        open(filename, 'w').close()
+        return None
+    finally:
+        if not completed and os.path.exists(temp_filename):
+            os.remove(temp_filename)
+    return record_count
+
+def _save_demultiplexed_pages_as_ndjson(pages, field, filenames_by_value):
+    """
+    Streams pages that mix the records of several entities to one NDJSON file per entity,
+    routing each record by the value of `field`. Follows the same all-or-nothing rule as
+    `_save_pages_as_ndjson`: if the fetch fails part-way, every file is saved empty, and on
+    any other error the temporary files are removed and the error raised.
+
+    Args:
+        pages (iterable): Pages (lists of record dicts).
+        field (str): The record field identifying the entity, e.g. 'station'.
+        filenames_by_value (dict): A mapping of field value to the list of files its records belong in.
+
+    Returns:
+        dict: The number of records saved per file, or None if the fetch failed.
+    """
+    filenames = list(dict.fromkeys(name for names in filenames_by_value.values() for name in names))
+    record_counts = dict.fromkeys(filenames, 0)
+    files = {}
+    completed = False
+    try:
+        for filename in filenames:
+            files[filename] = open(f"{filename}.part", 'w')
+        for page in pages:
+            for record in page:
+                line = json.dumps(record, separators=(',', ':')) + '\n'
+                for filename in filenames_by_value.get(record.get(field), []):
+                    files[filename].write(line)
+                    record_counts[filename] += 1
+        for filename, f in files.items():
+            f.close()
+            os.replace(f"{filename}.part", filename)
+        completed = True
+    except FetchError:
+        for filename in filenames:
+            open(filename, 'w').close()
+        return None
+    finally:
+        if not completed:
+            for filename, f in files.items():
+                f.close()
+                if os.path.exists(f"{filename}.part"):
+                    os.remove(f"{filename}.part")
+    return record_counts
+
+def _noaa_raw_filename(full_raw_data_path, city_name, start_date, end_date):
+    return os.path.join(full_raw_data_path, f"noaa_{city_name.lower().replace(' ', '_')}_{start_date}_to_{end_date}.ndjson")
+
+def _eia_raw_filename(full_raw_data_path, eia_ba_code, start_date, end_date):
+    return os.path.join(full_raw_data_path, f"eia_{eia_ba_code.lower()}_{start_date}_to_{end_date}.ndjson")
+
+def fetch_and_save_noaa_data(city, noaa_base_url, noaa_token, full_raw_data_path, start_date, end_date, rate_limiter=None, cache=None, prefetch_workers=1, run_manifest=None):
+    """Fetches NOAA weather data for a given city and streams it to an NDJSON file."""
     city_name = city['name']
     station_id = city['noaa_station_id']
     logging.info(f"Fetching NOAA data for {city_name} (Station: {station_id})...")
 
-    weather_data = fetch_noaa_data(noaa_base_url, noaa_token, station_id, start_date, end_date, city_name=city_name)
+    pages = iter_noaa_pages(noaa_base_url, noaa_token, station_id, start_date, end_date, city_name=city_name, rate_limiter=rate_limiter, cache=cache, prefetch_workers=prefetch_workers)
+    filename = _noaa_raw_filename(full_raw_data_path, city_name, start_date, end_date)
+    record_count = _save_pages_as_ndjson(pages, filename)
 
-    filename = os.path.join(full_raw_data_path, f"noaa_{city_name.lower().replace(' ', '_')}_{start_date}_to_{end_date}.json")
-    
-    if weather_data and 'results' in weather_data and weather_data['results']:
-        with open(filename, 'w') as f:
-            json.dump(weather_data['results'], f, indent=4)
-        logging.info(f"Successfully fetched and saved {len(weather_data['results'])} records to {filename}")
+    if record_count:
+        logging.info(f"Successfully fetched and saved {record_count} records to {filename}")
+        if run_manifest is not None:
+            run_manifest.mark_complete('noaa', [city_name], start_date, end_date)
     else:
         logging.warning(f"Failed to fetch or no NOAA data returned for {city_name}. Saving empty file.")
-        with open(filename, 'w') as f:
-            json.dump([], f)
     return filename
 
-def fetch_and_save_eia_data(city, eia_base_url, eia_api_key, full_raw_data_path, start_date, end_date):
-    """Fetches and saves EIA energy data for a given city."""
+def fetch_and_store_noaa_columnar(city, noaa_base_url, noaa_token, raw_columnar_path, start_date, end_date, rate_limiter=None, cache=None, prefetch_workers=1, run_manifest=None):
+    """
+    Fetches NOAA weather data for a given city and streams it into the columnar raw store.
+
+    Returns:
+        pd.DataFrame: The city's raw records for the date range, read back from the store.
+    """
     city_name = city['name']
+    station_id = city['noaa_station_id']
+    logging.info(f"Fetching NOAA data for {city_name} (Station: {station_id}) into the columnar raw store...")
+
+    pages = iter_noaa_pages(noaa_base_url, noaa_token, station_id, start_date, end_date, city_name=city_name, rate_limiter=rate_limiter, cache=cache, prefetch_workers=prefetch_workers)
+    record_count = write_raw_pages(pages, 'noaa', city_name, raw_columnar_path)
+
+    if record_count:
+        logging.info(f"Successfully fetched and stored {record_count} records for {city_name}")
+        if run_manifest is not None:
+            run_manifest.mark_complete('noaa', [city_name], start_date, end_date)
+    else:
+        logging.warning(f"Failed to fetch or no NOAA data returned for {city_name}. Using any previously stored records for the range.")
+    return read_raw_partitions('noaa', city_name, raw_columnar_path, start_date, end_date, columns=NOAA_RAW_COLUMNS)
+
+def _cities_by_station(cities):
+    """Maps each NOAA station ID to the names of the cities that use it."""
+    cities_by_station = {}
+    for city in cities:
+        cities_by_station.setdefault(city['noaa_station_id'], []).append(city['name'])
+    return cities_by_station
+
+def fetch_and_save_noaa_batch(cities, noaa_base_url, noaa_token, full_raw_data_path, start_date, end_date, rate_limiter=None, cache=None, prefetch_workers=1, run_manifest=None):
+    """
+    Fetches NOAA weather data for several cities with multi-station requests, and splits the
+    records by station into one NDJSON file per city, exactly as `fetch_and_save_noaa_data`
+    would have written them.
+
+    Returns:
+        dict: A mapping of city name to its raw NDJSON file.
+    """
+    cities_by_station = _cities_by_station(cities)
+    station_ids = list(cities_by_station)
+    logging.info(f"Fetching NOAA data for {len(cities)} cities ({', '.join(city['name'] for city in cities)}) in one batched request over {len(station_ids)} stations...")
+
+    filenames = {city['name']: _noaa_raw_filename(full_raw_data_path, city['name'], start_date, end_date) for city in cities}
+    pages = iter_noaa_pages(noaa_base_url, noaa_token, station_ids, start_date, end_date, rate_limiter=rate_limiter, cache=cache, prefetch_workers=prefetch_workers)
+    record_counts = _save_demultiplexed_pages_as_ndjson(pages, 'station', {
+        station_id: [filenames[city_name] for city_name in city_names]
+        for station_id, city_names in cities_by_station.items()
+    })
+
+    for city_name, filename in filenames.items():
+        if record_counts and record_counts[filename]:
+            logging.info(f"Successfully fetched and saved {record_counts[filename]} records to {filename}")
+            if run_manifest is not None:
+                run_manifest.mark_complete('noaa', [city_name], start_date, end_date)
+        else:
+            logging.warning(f"Failed to fetch or no NOAA data returned for {city_name}. Saving empty file.")
+    return filenames
+
+def fetch_and_store_noaa_batch_columnar(cities, noaa_base_url, noaa_token, raw_columnar_path, start_date, end_date, rate_limiter=None, cache=None, prefetch_workers=1, run_manifest=None):
+    """
+    Fetches NOAA weather data for several cities with multi-station requests, and stores the
+    records of each station under its cities in the columnar raw store.
+
+    Returns:
+        dict: A mapping of city name to its raw records for the date range, read back from the store.
+    """
+    cities_by_station = _cities_by_station(cities)
+    station_ids = list(cities_by_station)
+    logging.info(f"Fetching NOAA data for {len(cities)} cities ({', '.join(city['name'] for city in cities)}) in one batched request over {len(station_ids)} stations into the columnar raw store...")
+
+    pages = iter_noaa_pages(noaa_base_url, noaa_token, station_ids, start_date, end_date, rate_limiter=rate_limiter, cache=cache, prefetch_workers=prefetch_workers)
+    record_counts = write_demultiplexed_raw_pages(pages, 'noaa', 'station', cities_by_station, raw_columnar_path)
+
+    raw_frames = {}
+    for city in cities:
+        city_name = city['name']
+        if record_counts and record_counts.get(city_name):
+            logging.info(f"Successfully fetched and stored {record_counts[city_name]} records for {city_name}")
+            if run_manifest is not None:
+                run_manifest.mark_complete('noaa', [city_name], start_date, end_date)
+        else:
+            logging.warning(f"Failed to fetch or no NOAA data returned for {city_name}. Using any previously stored records for the range.")
+        raw_frames[city_name] = read_raw_partitions('noaa', city_name, raw_columnar_path, start_date, end_date, columns=NOAA_RAW_COLUMNS)
+    return raw_frames
+
+def fetch_and_store_eia_columnar(eia_ba_code, eia_base_url, eia_api_key, raw_columnar_path, start_date, end_date, city_names=None, rate_limiter=None, cache=None, prefetch_workers=1, run_manifest=None):
+    """
+    Fetches EIA energy data for a balancing authority and streams it into the columnar raw store.
+
+    Returns:
+        pd.DataFrame: The balancing authority's raw records for the date range, read back from the store.
+    """
+    cities_label = ', '.join(city_names) if city_names else eia_ba_code
+    logging.info(f"Fetching EIA data for Balancing Authority {eia_ba_code} (used by: {cities_label}) into the columnar raw store...")
+
+    pages = iter_eia_pages(eia_base_url, eia_api_key, eia_ba_code, start_date, end_date, rate_limiter=rate_limiter, cache=cache, prefetch_workers=prefetch_workers)
+    record_count = write_raw_pages(pages, 'eia', eia_ba_code, raw_columnar_path)
+
+    if record_count:
+        logging.info(f"Successfully fetched and stored {record_count} records for {eia_ba_code}")
+        if run_manifest is not None:
+            run_manifest.mark_complete('eia', city_names or [eia_ba_code], start_date, end_date)
+    else:
+        logging.warning(f"Failed to fetch or no EIA data returned for {eia_ba_code}. Using any previously stored records for the range.")
+    return read_raw_partitions('eia', eia_ba_code, raw_columnar_path, start_date, end_date, columns=EIA_RAW_COLUMNS)
+
+def fetch_and_store_eia_hourly(eia_ba_code, eia_hourly_base_url, eia_api_key, hourly_data_path, start_date, end_date, city_names=None, rate_limiter=None, cache=None, prefetch_workers=1, run_manifest=None, timezone=None):
+    """
+    Fetches hourly EIA demand for a balancing authority and streams it into the compact hourly store.
+    The hours are UTC hours, so for calendar days in `timezone` the fetch covers the UTC days
+    those local days overlap.
+
+    Returns:
+        int: The number of hours stored, or None if the fetch failed part-way.
+    """
+    cities_label = ', '.join(city_names) if city_names else eia_ba_code
+    logging.info(f"Fetching hourly EIA data for Balancing Authority {eia_ba_code} (used by: {cities_label}) into the hourly store...")
+
+    fetch_start_date, fetch_end_date = utc_day_range(start_date, end_date, timezone)
+    pages = iter_eia_pages(eia_hourly_base_url, eia_api_key, eia_ba_code, fetch_start_date, fetch_end_date, rate_limiter=rate_limiter, cache=cache, prefetch_workers=prefetch_workers, frequency='hourly')
+    hour_count = write_hourly_pages(pages, eia_ba_code, hourly_data_path)
+
+    if hour_count:
+        logging.info(f"Successfully fetched and stored {hour_count} hours for {eia_ba_code}")
+        if run_manifest is not None:
+            run_manifest.mark_complete('eia', city_names or [eia_ba_code], start_date, end_date)
+    else:
+        logging.warning(f"Failed to fetch or no hourly EIA data returned for {eia_ba_code}. Using any previously stored hours for the range.")
+    return hour_count
+
+def _get_valid_ba_code(city):
+    """Returns the city's EIA balancing authority code, or None (with a warning) if it has no usable code."""
     eia_ba_code = city.get('eia_ba_code')
-    
     if not eia_ba_code or str(eia_ba_code).strip().upper() in ['NONE', 'N/A']:
-        logging.warning(f"Skipping EIA data for {city_name}: no valid 'eia_ba_code' in config (found: {eia_ba_code}).")
-        filename = os.path.join(full_raw_data_path, f"eia_{city_name.lower().replace(' ', '_')}_{start_date}_to_{end_date}.json")
-        with open(filename, 'w') as f:
-            json.dump([], f)
-        return filename
+        logging.warning(f"Skipping EIA data for {city['name']}: no valid 'eia_ba_code' in config (found: {eia_ba_code}).")
+        return None
+    return str(eia_ba_code).strip().upper()
 
-    logging.info(f"Fetching EIA data for {city_name} (Balancing Authority: {eia_ba_code})...")
-    energy_data = fetch_eia_data(eia_base_url, eia_api_key, eia_ba_code, start_date, end_date, city_name=city_name)
+def fetch_and_save_eia_data(eia_ba_code, eia_base_url, eia_api_key, full_raw_data_path, start_date, end_date, city_names=None, rate_limiter=None, cache=None, prefetch_workers=1, run_manifest=None):
+    """
+    Fetches EIA energy data for a balancing authority and streams it to an NDJSON file.
+    The saved file is shared by every city that maps to this balancing authority.
+    """
+    cities_label = ', '.join(city_names) if city_names else eia_ba_code
+    logging.info(f"Fetching EIA data for Balancing Authority {eia_ba_code} (used by: {cities_label})...")
 
-    filename = os.path.join(full_raw_data_path, f"eia_{city_name.lower().replace(' ', '_')}_{start_date}_to_{end_date}.json")
+    pages = iter_eia_pages(eia_base_url, eia_api_key, eia_ba_code, start_date, end_date, rate_limiter=rate_limiter, cache=cache, prefetch_workers=prefetch_workers)
+    filename = _eia_raw_filename(full_raw_data_path, eia_ba_code, start_date, end_date)
+    record_count = _save_pages_as_ndjson(pages, filename)
 
-    if energy_data:
-        with open(filename, 'w') as f:
-            json.dump(energy_data, f, indent=4)
-        logging.info(f"Successfully fetched and saved {len(energy_data)} records to {filename}")
+    if record_count:
+        logging.info(f"Successfully fetched and saved {record_count} records to {filename}")
+        if run_manifest is not None:
+            run_manifest.mark_complete('eia', city_names or [eia_ba_code], start_date, end_date)
     else:
-        logging.warning(f"Failed to fetch or no EIA data returned for {city_name}. Saving empty file.")
-        with open(filename, 'w') as f:
-            json.dump([], f)
+        logging.warning(f"Failed to fetch or no EIA data returned for {eia_ba_code}. Saving empty file.")
     return filename
 
+def _stored_eia_input(eia_ba_code, start_date, end_date, params):
+    """
+    Returns the raw input for processing of EIA data that is already stored, as `_fetch_eia_group`
+    would have returned it, or None if a raw NDJSON file is missing.
+    """
+    if params["eia_hourly"]:
+        return {
+            "hourly_data_dir": params["full_hourly_data_path"], "ba_code": eia_ba_code, "start_date": start_date, "end_date": end_date,
+            "timezone": params["eia_hourly_timezone"], "max_rows_in_memory": params["eia_hourly_max_rows_in_memory"]
+        }
+    if params["raw_format"] == 'parquet':
+        return read_raw_partitions('eia', eia_ba_code, params["full_raw_columnar_path"], start_date, end_date, columns=EIA_RAW_COLUMNS)
+    filename = _eia_raw_filename(params["full_raw_data_path"], eia_ba_code, start_date, end_date)
+    return filename if os.path.exists(filename) else None
+
+def _fetch_eia_group(eia_ba_code, start_date, end_date, city_names, params, eia_api_key, rate_limiter, cache, run_manifest=None):
+    """
+    Fetches the EIA data for one balancing authority and date range, once, on behalf of
+    all the cities that share it. When the run manifest shows the data was already stored
+    by an interrupted run, it is read back instead of fetched.
+
+    Returns:
+        The raw input for processing: an NDJSON file path, a dataframe of raw records
+        when the columnar raw store is used, or the slice of the hourly store to roll up
+        (a dictionary of `process_eia_hourly` arguments) in hourly mode.
+    """
+    if run_manifest is not None and all(run_manifest.is_complete('eia', city_name, start_date, end_date) for city_name in city_names):
+        raw_input = _stored_eia_input(eia_ba_code, start_date, end_date, params)
+        if raw_input is not None:
+            logging.info(f"Resuming: EIA data for {eia_ba_code} from {start_date} to {end_date} was already fetched. Skipping fetch.")
+            return raw_input
+
+    fetch_kwargs = {'city_names': city_names, 'rate_limiter': rate_limiter, 'cache': cache, 'prefetch_workers': params["prefetch_workers"], 'run_manifest': run_manifest}
+    if params["eia_hourly"]:
+        fetch_and_store_eia_hourly(eia_ba_code, params["eia_hourly_base_url"], eia_api_key, params["full_hourly_data_path"], start_date, end_date, timezone=params["eia_hourly_timezone"], **fetch_kwargs)
+        return _stored_eia_input(eia_ba_code, start_date, end_date, params)
+    if params["raw_format"] == 'parquet':
+        return fetch_and_store_eia_columnar(eia_ba_code, params["eia_base_url"], eia_api_key, params["full_raw_columnar_path"], start_date, end_date, **fetch_kwargs)
+    return fetch_and_save_eia_data(eia_ba_code, params["eia_base_url"], eia_api_key, params["full_raw_data_path"], start_date, end_date, **fetch_kwargs)
+
+def _eia_group_failure_warning(eia_ba_code, city_names, error):
+    return {
+        "file": eia_ba_code,
+        "check": "EIA Balancing Authority Fetch",
+        "level": "CRITICAL",
+        "message": f"The pipeline failed to fetch or process EIA data for {eia_ba_code} (used by: {', '.join(city_names)}).",
+        "details": str(error)
+    }
+
+def _city_failure_warning(city_name, error):
+    return {
+        "file": city_name,
+        "check": "City Processing Loop",
+        "level": "CRITICAL",
+        "message": "The pipeline failed to process this city due to an unhandled exception.",
+        "details": str(error)
+    }
+
+def _stored_noaa_input(city_name, start_date, end_date, params):
+    """Returns the raw input for processing of NOAA data that is already stored, or None if its raw NDJSON file is missing."""
+    if params["raw_format"] == 'parquet':
+        return read_raw_partitions('noaa', city_name, params["full_raw_columnar_path"], start_date, end_date, columns=NOAA_RAW_COLUMNS)
+    filename = _noaa_raw_filename(params["full_raw_data_path"], city_name, start_date, end_date)
+    return filename if os.path.exists(filename) else None
+
+def _fetch_noaa_batch(start_date, end_date, cities, params, noaa_token, rate_limiter, cache, run_manifest=None):
+    """
+    Fetches the NOAA data for one batch of cities sharing a date range. Cities whose data the
+    run manifest shows was already stored by an interrupted run are read back instead of fetched.
+
+    Returns:
+        dict: A mapping of city name to its raw input: an NDJSON file path, or a dataframe of
+              raw records when the columnar raw store is used.
+    """
+    raw_inputs = {}
+    if run_manifest is not None:
+        for city in cities:
+            if run_manifest.is_complete('noaa', city['name'], start_date, end_date):
+                raw_input = _stored_noaa_input(city['name'], start_date, end_date, params)
+                if raw_input is not None:
+                    raw_inputs[city['name']] = raw_input
+        if raw_inputs:
+            logging.info(f"Resuming: NOAA data for {', '.join(raw_inputs)} from {start_date} to {end_date} was already fetched. Skipping fetch.")
+        cities = [city for city in cities if city['name'] not in raw_inputs]
+    if not cities:
+        return raw_inputs
+
+    fetch_args = (params["noaa_base_url"], noaa_token)
+    fetch_kwargs = {'rate_limiter': rate_limiter, 'cache': cache, 'prefetch_workers': params["prefetch_workers"], 'run_manifest': run_manifest}
+    if params["raw_format"] == 'parquet':
+        if len(cities) == 1:
+            raw_inputs[cities[0]['name']] = fetch_and_store_noaa_columnar(cities[0], *fetch_args, params["full_raw_columnar_path"], start_date, end_date, **fetch_kwargs)
+        else:
+            raw_inputs.update(fetch_and_store_noaa_batch_columnar(cities, *fetch_args, params["full_raw_columnar_path"], start_date, end_date, **fetch_kwargs))
+    elif len(cities) == 1:
+        raw_inputs[cities[0]['name']] = fetch_and_save_noaa_data(cities[0], *fetch_args, params["full_raw_data_path"], start_date, end_date, **fetch_kwargs)
+    else:
+        raw_inputs.update(fetch_and_save_noaa_batch(cities, *fetch_args, params["full_raw_data_path"], start_date, end_date, **fetch_kwargs))
+    return raw_inputs
+
+def _group_cities_by_noaa_request(cities, params, watermarks):
+    """
+    Packs cities that need NOAA data for the same date range into multi-station batches of
+    at most `noaa_stations_per_request` stations, so the daily request quota covers more cities.
+
+    Returns:
+        list: (start_date, end_date, cities) tuples, one per batched request. Cities with missing
+              keys, or whose NOAA data is already up to date, are left out.
+    """
+    cities_by_range = {}
+    for city in cities:
+        if 'name' not in city or 'noaa_station_id' not in city:
+            continue
+        start_date = params["start_date"]
+        if params["incremental"]:
+            start_date = get_incremental_start_date(watermarks, city['name'], 'noaa', params["start_date"])
+        if start_date > params["end_date"]:
+            logging.info(f"NOAA data for {city['name']} is already up to date through {params['end_date']}. Skipping fetch.")
+            continue
+        cities_by_range.setdefault((start_date, params["end_date"]), []).append(city)
+
+    batches = []
+    for (start_date, end_date), range_cities in cities_by_range.items():
+        batch, batch_stations = [], set()
+        for city in range_cities:
+            if city['noaa_station_id'] not in batch_stations and len(batch_stations) >= params["noaa_stations_per_request"]:
+                batches.append((start_date, end_date, batch))
+                batch, batch_stations = [], set()
+            batch.append(city)
+            batch_stations.add(city['noaa_station_id'])
+        batches.append((start_date, end_date, batch))
+    return batches
+
+def _group_cities_by_eia_request(cities, params, watermarks):
+    """
+    Groups cities that need the same EIA request, i.e. the same balancing authority and
+    date range, so each distinct request is only fetched once.
+
+    Returns:
+        dict: A mapping of (ba_code, start_date, end_date) to the list of city names sharing it.
+              Cities without a valid BA code, or whose EIA data is already up to date, are left out.
+    """
+    groups = {}
+    for city in cities:
+        if 'name' not in city or 'noaa_station_id' not in city:
+            continue
+        eia_ba_code = _get_valid_ba_code(city)
+        if not eia_ba_code:
+            continue
+        start_date = params["start_date"]
+        if params["incremental"]:
+            start_date = get_incremental_start_date(watermarks, city['name'], 'eia', params["start_date"])
+        if start_date > params["end_date"]:
+            logging.info(f"EIA data for {city['name']} is already up to date through {params['end_date']}. Skipping fetch.")
+            continue
+        groups.setdefault((eia_ba_code, start_date, params["end_date"]), []).append(city['name'])
+    return groups
+
 def _setup_pipeline_parameters(config, args):
     """
     Validates and extracts necessary parameters from the configuration object.
@@ -70,6 +453,13 @@ def _setup_pipeline_parameters(config, args):
     noaa_base_url = api_endpoints.get('noaa_base_url')
     eia_base_url = api_endpoints.get('eia_base_url')
     cities = config.get('cities', [])
+    pipeline_settings = config.get('pipeline', {}) or {}
+    max_workers = pipeline_settings.get('max_workers', 8)
+    prefetch_workers = max(1, int(pipeline_settings.get('prefetch_workers', 1)))
+    noaa_stations_per_request = max(1, int(pipeline_settings.get('noaa_stations_per_request', 1)))
+    process_workers = pipeline_settings.get('process_workers')
+    process_workers = os.cpu_count() or 1 if process_workers is None else max(0, int(process_workers))
+    queue_size = max(1, int(pipeline_settings.get('queue_size', 16)))
     
     if not all([noaa_base_url, eia_base_url]):
         logging.error("One or more API base URLs are missing in config.yaml. Exiting.")
@@ -79,6 +469,11 @@ def _setup_pipeline_parameters(config, args):
     raw_data_path = config.get('data_paths', {}).get('raw_data_dir', 'data/raw')
     processed_data_path = config.get('data_paths', {}).get('processed_data_dir', 'data/processed')
     output_data_path = config.get('data_paths', {}).get('output_data_dir', 'data/output')
+    cache_path = config.get('data_paths', {}).get('cache_dir', 'data/cache')
+    raw_columnar_path = config.get('data_paths', {}).get('raw_columnar_dir', 'data/raw_columnar')
+    master_dataset_path = config.get('data_paths', {}).get('master_dataset_dir', 'data/output/master')
+    analytic_db_path = config.get('data_paths', {}).get('analytic_db', 'data/output/energy_weather.db')
+    hourly_data_path = config.get('data_paths', {}).get('hourly_data_dir', 'data/hourly')
     full_raw_data_path = os.path.join(project_root, raw_data_path)
     full_processed_data_path = os.path.join(project_root, processed_data_path)
     full_output_data_path = os.path.join(project_root, output_data_path)
@@ -86,6 +481,31 @@ def _setup_pipeline_parameters(config, args):
     os.makedirs(full_processed_data_path, exist_ok=True)
     os.makedirs(full_output_data_path, exist_ok=True)
 
+    raw_format = (config.get('raw_storage', {}) or {}).get('format', 'ndjson')
+    if raw_format not in ('ndjson', 'parquet'):
+        logging.error(f"Unknown raw_storage format '{raw_format}' in config.yaml. Use 'ndjson' or 'parquet'. Exiting.")
+        return None
+    if raw_format == 'parquet' and not PARQUET_AVAILABLE:
+        logging.warning("raw_storage format 'parquet' requires pyarrow, which is not installed. Falling back to NDJSON raw files.")
+        raw_format = 'ndjson'
+
+    partitioned_master = (config.get('master_storage', {}) or {}).get('partitioned', False)
+    if partitioned_master and not PARQUET_AVAILABLE:
+        logging.warning("master_storage.partitioned requires pyarrow, which is not installed. Only the master CSV file will be written.")
+        partitioned_master = False
+    analytic_store = (config.get('master_storage', {}) or {}).get('analytic_store', False)
+    master_csv = (config.get('master_storage', {}) or {}).get('master_csv', True)
+    if not master_csv and not (partitioned_master or analytic_store):
+        logging.warning("master_storage.master_csv is false, but neither the partitioned master dataset nor the analytic store is enabled. Writing the master CSV file.")
+        master_csv = True
+
+    eia_hourly_settings = config.get('eia_hourly', {}) or {}
+    eia_hourly = eia_hourly_settings.get('enabled', False)
+    eia_hourly_base_url = api_endpoints.get('eia_hourly_base_url')
+    if eia_hourly and not (PARQUET_AVAILABLE and eia_hourly_base_url):
+        logging.warning("eia_hourly requires pyarrow and api_endpoints.eia_hourly_base_url. Fetching daily EIA data instead.")
+        eia_hourly = False
+
     if args.fetch_range:
         logging.info(f"Mode: Custom range fetch from {args.fetch_range[0]} to {args.fetch_range[1]}.")
         try:
@@ -115,16 +535,28 @@ def _setup_pipeline_parameters(config, args):
     return {
         "noaa_base_url": noaa_base_url, "eia_base_url": eia_base_url, "cities": cities,
         "full_raw_data_path": full_raw_data_path, "full_processed_data_path": full_processed_data_path, "full_output_data_path": full_output_data_path,
-        "start_date": start_date_str, "end_date": end_date_str
+        "start_date": start_date_str, "end_date": end_date_str,
+        "max_workers": max_workers, "prefetch_workers": prefetch_workers, "noaa_stations_per_request": noaa_stations_per_request,
+        "process_workers": process_workers, "queue_size": queue_size, "rate_limits": pipeline_settings.get('rate_limits', {}),
+        "incremental": args.incremental, "resume": args.resume,
+        "full_cache_path": os.path.join(project_root, cache_path), "http_cache": config.get('http_cache', {}), "offline": args.offline,
+        "http_transport": config.get('http_transport', {}),
+        "raw_format": raw_format, "full_raw_columnar_path": os.path.join(project_root, raw_columnar_path),
+        "partitioned_master": partitioned_master, "full_master_dataset_path": os.path.join(project_root, master_dataset_path),
+        "analytic_store": analytic_store, "full_analytic_db_path": os.path.join(project_root, analytic_db_path),
+        "master_csv": master_csv, "full_master_csv_path": os.path.join(full_output_data_path, MASTER_CSV_FILENAME),
+        "eia_hourly": eia_hourly, "eia_hourly_base_url": eia_hourly_base_url, "full_hourly_data_path": os.path.join(project_root, hourly_data_path),
+        "eia_hourly_timezone": eia_hourly_settings.get('timezone'),
+        "eia_hourly_max_rows_in_memory": int(eia_hourly_settings.get('max_rows_in_memory', DEFAULT_MAX_ROWS_IN_MEMORY))
     }
 
-def _clear_intermediate_data(raw_dir, processed_dir):
+def _clear_intermediate_data(*directories):
     """
-    Clears out the raw and processed data directories to ensure a clean pipeline run.
-    This prevents stale data from a previous run from contaminating the current one.
+    Clears out the given intermediate data directories (raw and processed) to ensure a clean
+    pipeline run. This prevents stale data from a previous run from contaminating the current one.
     """
     logging.info("--- Clearing Intermediate Data Directories for a Clean Run ---")
-    for directory in [raw_dir, processed_dir]:
+    for directory in directories:
         if os.path.exists(directory):
             logging.info(f"Clearing contents of {directory}...")
             for filename in os.listdir(directory):
@@ -135,12 +567,262 @@ def _clear_intermediate_data(raw_dir, processed_dir):
                 except Exception as e:
                     logging.error(f"Failed to delete {file_path}. Reason: {e}")
 
+def _init_process_worker(log_queue, log_level):
+    """
+    Runs once in each worker process: sends its log records to the parent process through
+    `log_queue`, where one listener thread writes them to the run's handlers, so the output
+    of concurrent workers is neither dropped nor interleaved mid-line.
+    """
+    root_logger = logging.getLogger()
+    for handler in root_logger.handlers[:]:
+        root_logger.removeHandler(handler)
+    root_logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    root_logger.setLevel(log_level)
+
+def _process_noaa_raw(raw_input, source_label):
+    """Processing-stage task for one city's NOAA data. Runs in a worker process."""
+    if isinstance(raw_input, str):
+        return process_noaa_data(raw_input)
+    return process_noaa_frame(raw_input, source_label)
+
+def _process_eia_raw(raw_input, source_label):
+    """Processing-stage task for one balancing authority's EIA data. Runs in a worker process."""
+    if isinstance(raw_input, dict):
+        return process_eia_hourly(**raw_input)
+    if isinstance(raw_input, str):
+        return process_eia_data(raw_input)
+    return process_eia_frame(raw_input, source_label)
+
+def _fetch_into_queue(work_queue, source, key, city_names, fetch, *fetch_args):
+    """
+    Fetch-stage task: runs a fetch on an I/O thread and hands its result (or its exception)
+    to the processing stage. Blocks while the queue is full, which throttles the fetchers
+    whenever processing falls behind. The fetch is timed as a span, without the wait for
+    room on the queue.
+    """
+    try:
+        with span('fetch', source=source, city=', '.join(city_names)):
+            raw_input = fetch(*fetch_args)
+        work_queue.put((source, key, raw_input, None))
+    except Exception as e:
+        logging.critical(f"An unrecoverable error occurred while fetching {source.upper()} data for {key}. Skipping.", exc_info=True)
+        work_queue.put((source, key, None, e))
+
+def _run_staged_pipeline(params, noaa_token, eia_api_key, rate_limiters, cache, noaa_batches, eia_groups, run_manifest=None):
+    """
+    Runs the fetch and processing stages concurrently. Fetchers on I/O threads put their raw
+    results on a bounded queue; the processing of each source, and the per-city merge, run
+    on a process pool as results arrive. At most two tasks per process are in flight, and
+    fetchers block on the full queue beyond that, so memory stays bounded on large backfills.
+    Fetches completed by an interrupted run (see `run_manifest`) are read back from disk.
+
+    Returns:
+        tuple: The data quality warnings (per city in configuration order, then per EIA group),
+               and a list of (city name, {source: last complete date}) pairs.
+    """
+    cities = [city for city in params["cities"] if 'name' in city and 'noaa_station_id' in city]
+    for city in params["cities"]:
+        if city not in cities:
+            logging.warning(f"Skipping an entry due to missing keys. Found: {list(city.keys())}. Required: ['name', 'noaa_station_id']")
+
+    batch_by_key = {f"NOAA batch {index + 1}": batch for index, batch in enumerate(noaa_batches)}
+    expected_sources = {city['name']: set() for city in cities}
+    for _, _, batch_cities in noaa_batches:
+        for city in batch_cities:
+            expected_sources[city['name']].add('noaa')
+    eia_group_by_city = {}
+    for group_key, city_names in eia_groups.items():
+        for city_name in city_names:
+            expected_sources[city_name].add('eia')
+            eia_group_by_city[city_name] = group_key
+
+    city_warnings = {city_name: [] for city_name in expected_sources}
+    group_warnings = {group_key: [] for group_key in eia_groups}
+    results = {city_name: {} for city_name in expected_sources}
+    failed_cities = set()
+    pending = {}
+
+    work_queue = queue.Queue(maxsize=params["queue_size"])
+    # The fetch threads are already running, so worker processes are not forked from this
+    # process (a child could inherit a lock held by one of them); they start from a clean one.
+    # Their log records are written by a listener thread in this process (see `_init_process_worker`).
+    log_listener = None
+    if params["process_workers"] > 0:
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        mp_context = multiprocessing.get_context(start_method)
+        log_queue = mp_context.Queue()
+        log_listener = logging.handlers.QueueListener(log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+        log_listener.start()
+        process_pool = ProcessPoolExecutor(max_workers=params["process_workers"], mp_context=mp_context, initializer=_init_process_worker, initargs=(log_queue, logging.getLogger().getEffectiveLevel()))
+    else:
+        process_pool = ThreadPoolExecutor(max_workers=params["max_workers"])
+    max_in_flight = 2 * max(1, params["process_workers"] or params["max_workers"])
+
+    def fail_city(city_name, error):
+        if city_name not in failed_cities:
+            failed_cities.add(city_name)
+            city_warnings[city_name].append(_city_failure_warning(city_name, error))
+
+    def merge_when_complete(city_name):
+        if city_name in failed_cities or set(results[city_name]) != expected_sources[city_name]:
+            return
+        weather_df, energy_df = results[city_name].get('noaa'), results[city_name].get('eia')
+        future = process_pool.submit(run_in_span, 'merge', {'city': city_name}, merge_and_save_data, weather_df, energy_df, city_name, params["full_processed_data_path"])
+        pending[future] = ('merge', city_name)
+
+    def dispatch(item):
+        source, key, raw_input, error = item
+        if source == 'noaa':
+            start_date, end_date, batch_cities = batch_by_key[key]
+            for city in batch_cities:
+                if error is not None:
+                    fail_city(city['name'], error)
+                    continue
+                source_label = f"noaa/{city['name'].lower().replace(' ', '_')} {start_date} to {end_date}"
+                future = process_pool.submit(run_in_span, 'process', {'source': 'noaa', 'city': city['name']}, _process_noaa_raw, raw_input[city['name']], source_label)
+                pending[future] = ('noaa', city['name'])
+        else:
+            eia_ba_code, start_date, end_date = key
+            if error is not None:
+                group_warnings[key].append(_eia_group_failure_warning(eia_ba_code, eia_groups[key], error))
+                for city_name in eia_groups[key]:
+                    results[city_name]['eia'] = None
+                    merge_when_complete(city_name)
+                return
+            future = process_pool.submit(run_in_span, 'process', {'source': 'eia', 'city': eia_ba_code}, _process_eia_raw, raw_input, f"eia/{eia_ba_code.lower()} {start_date} to {end_date}")
+            pending[future] = ('eia', key)
+
+    def collect(future):
+        task, key = pending.pop(future)
+        try:
+            result, spans = future.result()
+            add_spans(spans)
+        except Exception as e:
+            logging.critical(f"An unrecoverable error occurred in the {task} processing task for {key}. Skipping.", exc_info=True)
+            if task == 'eia':
+                group_warnings[key].append(_eia_group_failure_warning(key[0], eia_groups[key], e))
+                for city_name in eia_groups[key]:
+                    results[city_name]['eia'] = None
+                    merge_when_complete(city_name)
+            else:
+                fail_city(key, e)
+            return
+        if task == 'noaa':
+            weather_df, noaa_warnings = result
+            city_warnings[key].extend(noaa_warnings)
+            results[key]['noaa'] = weather_df
+            merge_when_complete(key)
+        elif task == 'eia':
+            energy_df, eia_warnings = result
+            group_warnings[key].extend(eia_warnings)
+            for city_name in eia_groups[key]:
+                results[city_name]['eia'] = energy_df
+                merge_when_complete(city_name)
+
+    try:
+        with ThreadPoolExecutor(max_workers=params["max_workers"]) as noaa_executor, ThreadPoolExecutor(max_workers=params["max_workers"]) as eia_executor, process_pool:
+            for key, (start_date, end_date, batch_cities) in batch_by_key.items():
+                noaa_executor.submit(_fetch_into_queue, work_queue, 'noaa', key, [city['name'] for city in batch_cities], _fetch_noaa_batch, start_date, end_date, batch_cities, params, noaa_token, rate_limiters['noaa'], cache, run_manifest)
+            for group_key, city_names in eia_groups.items():
+                eia_executor.submit(_fetch_into_queue, work_queue, 'eia', group_key, city_names, _fetch_eia_group, *group_key, city_names, params, eia_api_key, rate_limiters['eia'], cache, run_manifest)
+
+            # Cities with nothing to fetch (already up to date) still get their processed file.
+            for city_name, sources in expected_sources.items():
+                if not sources:
+                    merge_when_complete(city_name)
+
+            remaining_fetches = len(batch_by_key) + len(eia_groups)
+            while remaining_fetches or pending:
+                can_dispatch = remaining_fetches and len(pending) < max_in_flight
+                if can_dispatch:
+                    try:
+                        item = work_queue.get(timeout=0.05 if pending else None)
+                    except queue.Empty:
+                        item = None
+                    if item is not None:
+                        remaining_fetches -= 1
+                        dispatch(item)
+                if pending:
+                    done, _ = wait(list(pending), timeout=0 if can_dispatch else None, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        collect(future)
+    finally:
+        if log_listener is not None:
+            log_listener.stop()
+
+    all_warnings = [warning for city_name in city_warnings for warning in city_warnings[city_name]]
+    all_warnings += [warning for group_key in group_warnings for warning in group_warnings[group_key]]
+    city_watermarks_list = [
+        (city_name, {
+            'noaa': last_complete_date(results[city_name].get('noaa'), ['TMAX_F', 'TMIN_F']),
+            'eia': last_complete_date(results[city_name].get('eia'), ['energy_mwh'])
+        })
+        for city_name in expected_sources if city_name not in failed_cities
+    ]
+    return all_warnings, city_watermarks_list
+
+def _stored_master_exists(params):
+    """Returns whether an enabled master data store (the partitioned dataset or the analytic store) has been written."""
+    return bool(
+        (params["partitioned_master"] and load_master_manifest(params["full_master_dataset_path"]) is not None)
+        or (params["analytic_store"] and os.path.exists(params["full_analytic_db_path"]))
+    )
+
+def _read_stored_master_rows(params, start_date=None, end_date=None):
+    """
+    Reads the master rows of the configured cities, optionally for a date range, from the
+    partitioned master dataset, the analytic store or the master CSV file (the first that
+    exists), in the compact master schema.
+
+    Returns:
+        pd.DataFrame: The master rows, or None if no master data has been written.
+    """
+    ba_codes_by_city = {city['name']: city.get('eia_ba_code') for city in params["cities"] if 'name' in city}
+    if params["partitioned_master"] and load_master_manifest(params["full_master_dataset_path"]) is not None:
+        df = read_master_dataset(params["full_master_dataset_path"], start_date=start_date, end_date=end_date)
+    elif params["analytic_store"] and os.path.exists(params["full_analytic_db_path"]):
+        df = query_master_rows(params["full_analytic_db_path"], start_date, end_date)
+    elif os.path.exists(params["full_master_csv_path"]):
+        df = pd.read_csv(params["full_master_csv_path"])
+        dates = pd.to_datetime(df['date'])
+        if start_date is not None:
+            df = df[dates >= pd.Timestamp(start_date)]
+        if end_date is not None:
+            df = df[dates <= pd.Timestamp(end_date)]
+    else:
+        return None
+    return apply_master_schema(df[df['city'].isin(ba_codes_by_city.keys())], ba_codes_by_city)
+
+def export_master_csv(params):
+    """
+    Regenerates the master CSV file from the stored master data (see `_read_stored_master_rows`),
+    with placeholder rows for configured cities without data, as a full run would write it.
+
+    Returns:
+        pd.DataFrame: The master data as written, or None if no master data has been written.
+    """
+    master_df = _read_stored_master_rows(params)
+    if master_df is None:
+        logging.error("No master data found to export. Run the pipeline first.")
+        return None
+    ba_codes_by_city = {city['name']: city.get('eia_ba_code') for city in params["cities"] if 'name' in city}
+    missing_cities = sorted(set(ba_codes_by_city) - set(master_df['city'].dropna().astype(str)))
+    if missing_cities:
+        master_df = pd.concat([master_df, pd.DataFrame([{'city': name} for name in missing_cities])], ignore_index=True)
+    master_df = write_master_csv(apply_master_schema(master_df, ba_codes_by_city), params["full_master_csv_path"])
+    logging.info(f"Exported {len(master_df)} master rows to {params['full_master_csv_path']}.")
+    return master_df
+
 def main(args):
     """
     Main function to orchestrate the data fetching process.
     Accepts parsed command-line arguments.
+
+    Returns:
+        dict: The run's timing metrics (see `write_run_metrics`), or None if the run could not start.
     """
     logging.info("--- Starting Data Fetching Process ---")
+    start_run_metrics()
 
     config, noaa_token, eia_api_key = load_configuration()
 
@@ -157,54 +839,113 @@ def main(args):
     params = _setup_pipeline_parameters(config, args)
     if not params:
         return
+    if getattr(args, 'export_master_csv', False):
+        export_master_csv(params)
+        return
 
-    _clear_intermediate_data(params["full_raw_data_path"], params["full_processed_data_path"])
+    run_settings = {key: params[key] for key in ("start_date", "end_date", "incremental", "raw_format", "eia_hourly")}
+    run_manifest = start_run_manifest(params["full_output_data_path"], run_settings, resume=params["resume"])
+    if run_manifest.resumed:
+        # The raw files of completed fetch units are reused; processing is always redone from them.
+        _clear_intermediate_data(params["full_processed_data_path"])
+    else:
+        _clear_intermediate_data(params["full_raw_data_path"], params["full_processed_data_path"])
 
-    all_warnings = []
+    configure_transport(params["http_transport"])
+    rate_limiters = build_rate_limiters(params["rate_limits"])
+    response_cache = build_response_cache(params["http_cache"], params["full_cache_path"], offline=params["offline"])
 
-    for city in params["cities"]:
-        try:
-            required_keys = ['name', 'noaa_station_id']
-            if not all(key in city for key in required_keys):
-                logging.warning(f"Skipping an entry due to missing keys. Found: {list(city.keys())}. Required: {required_keys}")
-                continue
+    # A full run rebuilds the master file from this run's data only, so its watermarks start from scratch.
+    watermarks = load_watermarks(params["full_output_data_path"]) if params["incremental"] else {}
+    if params["incremental"]:
+        logging.info(f"Mode: Incremental. Loaded watermarks for {len(watermarks)} cities.")
+    logging.info(f"Processing {len(params['cities'])} cities with up to {params['max_workers']} concurrent workers.")
 
-            noaa_file = fetch_and_save_noaa_data(city, params["noaa_base_url"], noaa_token, params["full_raw_data_path"], params["start_date"], params["end_date"])
-            eia_file = fetch_and_save_eia_data(city, params["eia_base_url"], eia_api_key, params["full_raw_data_path"], params["start_date"], params["end_date"])
+    eia_groups = _group_cities_by_eia_request(params["cities"], params, watermarks)
+    city_count = sum(len(city_names) for city_names in eia_groups.values())
+    logging.info(f"EIA data for {city_count} cities will be fetched with {len(eia_groups)} balancing authority requests.")
 
-            logging.info(f"Processing available data for {city['name']}...")
+    noaa_batches = _group_cities_by_noaa_request(params["cities"], params, watermarks)
+    city_count = sum(len(batch_cities) for _, _, batch_cities in noaa_batches)
+    logging.info(f"NOAA data for {city_count} cities will be fetched with {len(noaa_batches)} batched station requests.")
 
-            weather_df, noaa_warnings = process_noaa_data(noaa_file)
-            energy_df, eia_warnings = process_eia_data(eia_file)
+    logging.info(f"Processing raw data on {params['process_workers'] or 'in-process'} worker processes, with up to {params['queue_size']} fetched results queued.")
+    all_warnings, city_watermarks_list = _run_staged_pipeline(params, noaa_token, eia_api_key, rate_limiters, response_cache, noaa_batches, eia_groups, run_manifest)
 
-            all_warnings.extend(noaa_warnings)
-            all_warnings.extend(eia_warnings)
+    # With an existing store to upsert into, an incremental run merges the new rows into the
+    # stores only, so its cost follows the new rows rather than the whole history. The master
+    # CSV file is then regenerated from the stores only if it is asked for. Without a store yet,
+    # the master CSV file holds the history the new rows are merged into.
+    upsert_into_stores = params["incremental"] and _stored_master_exists(params)
+    write_csv = not upsert_into_stores and (params["master_csv"] or params["incremental"])
+    if not (write_csv or params["master_csv"]) and os.path.exists(params["full_master_csv_path"]):
+        logging.info(f"master_storage.master_csv is false, so {params['full_master_csv_path']} is not updated. Regenerate it with: python run.py --export-master-csv")
+    with span('combine') as span_tags:
+        master_df, new_df = combine_processed_data(params["full_processed_data_path"], params["full_output_data_path"], params["cities"], upsert=params["incremental"], write_csv=write_csv)
+        span_tags['rows'] = len(new_df if master_df is None else master_df)
 
-            merge_and_save_data(weather_df, energy_df, city['name'], params["full_processed_data_path"])
+    # Stores that already exist take the new rows first, so a store written from scratch (e.g.
+    # the first write after enabling it) can be filled with the full history from one of them.
+    partitioned_exists = params["partitioned_master"] and load_master_manifest(params["full_master_dataset_path"]) is not None
+    analytic_exists = params["analytic_store"] and os.path.exists(params["full_analytic_db_path"])
+    if params["incremental"] and partitioned_exists:
+        with span('store', source='master', rows=len(new_df)):
+            upsert_master_dataset(new_df, params["full_master_dataset_path"], {city['name'] for city in params["cities"]})
+    if params["incremental"] and analytic_exists:
+        with span('store', source='sqlite', rows=len(new_df)):
+            upsert_analytic_store(new_df, params["full_analytic_db_path"], params["cities"])
+    if params["partitioned_master"] and not (params["incremental"] and partitioned_exists):
+        if master_df is None:
+            master_df = _read_stored_master_rows(params)
+        with span('store', source='master', rows=len(master_df)):
+            write_master_dataset(master_df, params["full_master_dataset_path"])
+    if params["analytic_store"] and not (params["incremental"] and analytic_exists):
+        if master_df is None:
+            master_df = _read_stored_master_rows(params)
+        with span('store', source='sqlite', rows=len(master_df)):
+            write_analytic_store(master_df, params["full_analytic_db_path"], params["cities"])
+    if upsert_into_stores and params["master_csv"]:
+        with span('store', source='csv') as span_tags:
+            master_df = export_master_csv(params)
+            span_tags['rows'] = len(master_df)
 
-            time.sleep(1)
-        except Exception as e:
-            logging.critical(f"An unrecoverable error occurred while processing city: {city.get('name', 'Unknown')}. Skipping.", exc_info=True)
-            all_warnings.append({
-                "file": city.get('name', 'Unknown'),
-                "check": "City Processing Loop",
-                "level": "CRITICAL",
-                "message": "The pipeline failed to process this city due to an unhandled exception.",
-                "details": str(e)
-            })
-            continue
+    # Incremental runs recompute only the rollup periods their new dates fall into.
+    city_names = [city['name'] for city in params["cities"] if 'name' in city]
+    with span('rollups') as span_tags:
+        rollup_rows = None
+        if params["incremental"]:
+            if master_df is not None:
+                read_rows = lambda start_date, end_date: master_df[master_df['date'].between(pd.Timestamp(start_date), pd.Timestamp(end_date))]
+            else:
+                read_rows = lambda start_date, end_date: _read_stored_master_rows(params, start_date, end_date)
+            rollup_rows = update_rollups(new_df, params["full_output_data_path"], city_names, read_rows)
+        if rollup_rows is None:
+            if master_df is None:
+                master_df = _read_stored_master_rows(params)
+            rollup_rows = write_rollups(master_df, params["full_output_data_path"], city_names)
+        span_tags['rows'] = rollup_rows
+
+    for city_name, city_watermarks in city_watermarks_list:
+        for source, new_date in city_watermarks.items():
+            advance_watermark(watermarks, city_name, source, new_date)
+    save_watermarks(params["full_output_data_path"], watermarks)
 
-    combine_processed_data(params["full_processed_data_path"], params["full_output_data_path"], params["cities"])
+    if response_cache is not None:
+        logging.info(f"HTTP response cache: {response_cache.hits} hits, {response_cache.misses} misses.")
+    log_transport_stats()
+    log_memory_report()
 
     report_path = os.path.join(params["full_output_data_path"], "data_quality_report.json")
     if all_warnings:
         logging.info(f"Saving {len(all_warnings)} data quality warnings to {report_path}...")
     else:
         logging.info("No data quality issues found. Creating an empty report file.")
-    with open(report_path, 'w') as f:
-        json.dump(all_warnings, f, indent=4)
+    write_json_atomically(report_path, all_warnings, indent=4)
+    run_metrics = write_run_metrics(params["full_output_data_path"], get_transport_stats())
+    run_manifest.finish()
 
     logging.info("--- All Processes Finished ---")
+    return run_metrics
 
 if __name__ == "__main__":
     main()
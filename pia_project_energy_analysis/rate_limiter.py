@@ -0,0 +1,107 @@
+import threading
+import time
+import logging
+from datetime import date
+from .run_metrics import record_span
+
+DEFAULT_RATE_LIMITS = {
+    'noaa': {'requests_per_second': 5, 'requests_per_day': 10000},
+    'eia': {'requests_per_second': 5, 'requests_per_day': None},
+}
+
+class DailyQuotaExceeded(Exception):
+    """Raised when a rate limiter has handed out its full daily request quota."""
+
+class TokenBucket:
+    """
+    A thread-safe token-bucket rate limiter shared by every worker that calls a given API.
+
+    Tokens are refilled continuously at `rate` per second up to `capacity`, so short
+    bursts are allowed while the sustained request rate never exceeds `rate`. An optional
+    `daily_limit` caps the total number of tokens handed out per calendar day.
+
+    Args:
+        rate (float): Number of requests allowed per second.
+        capacity (int, optional): Maximum burst size. Defaults to the rate (at least 1).
+        daily_limit (int, optional): Maximum number of requests per day. Defaults to no limit.
+        name (str, optional): Label used in log and error messages.
+    """
+    def __init__(self, rate, capacity=None, daily_limit=None, name='api'):
+        if rate <= 0:
+            raise ValueError(f"Rate limit for '{name}' must be positive, got {rate}.")
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity else max(1, int(rate)))
+        self.daily_limit = daily_limit
+        self.name = name
+        self._tokens = self.capacity
+        self._last_refill = time.monotonic()
+        self._day = date.today()
+        self._used_today = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._last_refill = now
+
+    def acquire(self):
+        """
+        Blocks until a token is available and consumes it.
+
+        Raises:
+            DailyQuotaExceeded: If the daily request quota has already been used up.
+        """
+        started = time.perf_counter()
+        slept = False
+        while True:
+            with self._lock:
+                today = date.today()
+                if today != self._day:
+                    self._day = today
+                    self._used_today = 0
+
+                if self.daily_limit is not None and self._used_today >= self.daily_limit:
+                    raise DailyQuotaExceeded(f"Daily quota of {self.daily_limit} requests for '{self.name}' has been used up.")
+
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    self._used_today += 1
+                    if slept:
+                        record_span('rate_limit_wait', time.perf_counter() - started, source=self.name.lower())
+                    return
+                wait_seconds = (1 - self._tokens) / self.rate
+            time.sleep(wait_seconds)
+            slept = True
+
+    @property
+    def used_today(self):
+        """The number of tokens handed out since the start of the current day."""
+        with self._lock:
+            return self._used_today
+
+def build_rate_limiters(rate_limits_config=None):
+    """
+    Builds one shared TokenBucket per API from the `pipeline.rate_limits` config section.
+
+    Args:
+        rate_limits_config (dict, optional): Mapping of API name ('noaa', 'eia') to a dict
+            with 'requests_per_second' and optional 'requests_per_day' and 'burst' keys.
+            Missing entries fall back to DEFAULT_RATE_LIMITS.
+
+    Returns:
+        dict: A dictionary mapping each API name to its TokenBucket.
+    """
+    rate_limits_config = rate_limits_config or {}
+    limiters = {}
+    for api_name, defaults in DEFAULT_RATE_LIMITS.items():
+        settings = {**defaults, **(rate_limits_config.get(api_name) or {})}
+        limiters[api_name] = TokenBucket(
+            rate=settings['requests_per_second'],
+            capacity=settings.get('burst'),
+            daily_limit=settings.get('requests_per_day'),
+            name=api_name.upper()
+        )
+        logging.info(f"Rate limit for {api_name.upper()}: {settings['requests_per_second']} req/s, daily quota: {settings.get('requests_per_day') or 'unlimited'}.")
+    return limiters
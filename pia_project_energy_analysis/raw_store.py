@@ -0,0 +1,201 @@
+import os
+import logging
+import tempfile
+import threading
+import pandas as pd
+from .http_transport import FetchError
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+# Per source: the field holding each record's date, the fields that identify a record
+# (used to upsert re-fetched records), and the name of the partition entity. EIA records
+# carry a timezone facet, so one period and type can hold several records.
+SOURCE_SCHEMAS = {
+    'noaa': {'date_field': 'date', 'key_fields': ['date', 'datatype', 'station'], 'entity': 'city'},
+    'eia': {'date_field': 'period', 'key_fields': ['period', 'respondent', 'type', 'timezone'], 'entity': 'ba'},
+}
+
+# Fetches run in threads that may upsert the same month partition (e.g. two cities sharing a
+# station), so each partition's read-modify-write is serialized by a lock for its path.
+_partition_locks = {}
+_partition_locks_lock = threading.Lock()
+
+def _slugify(name):
+    return str(name).lower().replace(' ', '_')
+
+def _entity_dir(root_dir, source, entity_name):
+    entity = SOURCE_SCHEMAS[source]['entity']
+    return os.path.join(root_dir, f"source={source}", f"{entity}={_slugify(entity_name)}")
+
+def _partition_path(root_dir, source, entity_name, year, month):
+    return os.path.join(_entity_dir(root_dir, source, entity_name), f"year={year:04d}", f"month={month:02d}", "part.parquet")
+
+def _normalize_records(df, source):
+    """Gives raw records a stable columnar schema: numeric values, every other field as a string."""
+    for field in SOURCE_SCHEMAS[source]['key_fields']:
+        if field not in df.columns:
+            df[field] = pd.NA
+    for column in df.columns:
+        if column == 'value':
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('float64')
+        else:
+            df[column] = df[column].astype('string')
+    return df
+
+def _partition_lock(path):
+    with _partition_locks_lock:
+        if path not in _partition_locks:
+            _partition_locks[path] = threading.Lock()
+        return _partition_locks[path]
+
+def _upsert_partition(path, new_df, key_fields, drop_new_duplicates=False):
+    """
+    Merges records into a month partition, replacing existing records with the same key, and
+    writes it atomically. Duplicates within `new_df` are kept (so processing still reports
+    them) unless `drop_new_duplicates` is set, in which case the last one wins.
+    """
+    if drop_new_duplicates:
+        new_df = new_df.drop_duplicates(subset=key_fields, keep='last')
+
+    with _partition_lock(path):
+        if os.path.exists(path):
+            existing_df = pd.read_parquet(path)
+            for field in key_fields:
+                if field not in existing_df.columns:
+                    existing_df[field] = pd.Series(pd.NA, index=existing_df.index, dtype=new_df[field].dtype)
+            replaced = existing_df[key_fields].merge(new_df[key_fields].drop_duplicates(), on=key_fields, how='left', indicator=True)['_merge'] == 'both'
+            combined_df = pd.concat([existing_df[~replaced.to_numpy()], new_df], ignore_index=True)
+        else:
+            combined_df = new_df
+        combined_df = combined_df.sort_values(key_fields, kind='stable')
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        os.close(fd)
+        try:
+            combined_df.to_parquet(temp_path, index=False)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+def _write_partitioned_pages(pages, source, root_dir, split_page):
+    """
+    Buffers pages one calendar month at a time per entity and upserts each completed month
+    into its partition. `split_page` maps a normalized page dataframe to (entity name, records) pairs.
+
+    Returns:
+        dict: The number of records stored per entity, or None if the fetch failed part-way.
+    """
+    schema = SOURCE_SCHEMAS[source]
+    buffered_months = {}
+    record_counts = {}
+
+    def flush(keys):
+        for entity_name, year, month in keys:
+            month_df = pd.concat(buffered_months.pop((entity_name, year, month)), ignore_index=True)
+            _upsert_partition(_partition_path(root_dir, source, entity_name, year, month), month_df, schema['key_fields'])
+
+    try:
+        for page in pages:
+            page_df = _normalize_records(pd.DataFrame(page), source)
+            for entity_name, entity_df in split_page(page_df):
+                record_dates = pd.to_datetime(entity_df[schema['date_field']].str.slice(0, 10))
+                for (year, month), month_df in entity_df.groupby([record_dates.dt.year, record_dates.dt.month]):
+                    buffered_months.setdefault((entity_name, int(year), int(month)), []).append(month_df)
+                record_counts[entity_name] = record_counts.get(entity_name, 0) + len(entity_df)
+
+            if buffered_months:
+                latest_month = max((year, month) for _, year, month in buffered_months)
+                flush([key for key in sorted(buffered_months) if key[1:] < latest_month])
+    except FetchError:
+        flush(sorted(buffered_months))
+        return None
+    flush(sorted(buffered_months))
+    return record_counts
+
+def write_raw_pages(pages, source, entity_name, root_dir):
+    """
+    Streams pages of raw API records into the columnar raw store, partitioned as
+    source=<source>/<entity>=<name>/year=YYYY/month=MM/part.parquet.
+
+    Records are buffered one calendar month at a time (the APIs return records in date order),
+    and each month is upserted into its partition, so re-fetching an overlapping range
+    replaces records instead of duplicating them. Months completed before a failure are kept.
+
+    Args:
+        pages (iterable): Pages (lists of record dicts), e.g. from `iter_noaa_pages`.
+        source (str): 'noaa' or 'eia'.
+        entity_name (str): The city name (NOAA) or balancing authority code (EIA).
+        root_dir (str): The root directory of the columnar raw store.
+
+    Returns:
+        int: The number of records stored, or None if the fetch failed part-way.
+    """
+    record_counts = _write_partitioned_pages(pages, source, root_dir, lambda page_df: [(entity_name, page_df)])
+    if record_counts is None:
+        return None
+    return record_counts.get(entity_name, 0)
+
+def write_demultiplexed_raw_pages(pages, source, field, entities_by_value, root_dir):
+    """
+    Streams pages that mix the records of several entities (e.g. a multi-station NOAA request)
+    into the columnar raw store, routing each record by the value of `field`. A value mapped to
+    several entities (two cities sharing a station) is stored under each of them.
+
+    Args:
+        pages (iterable): Pages (lists of record dicts).
+        source (str): 'noaa' or 'eia'.
+        field (str): The record field identifying the entity, e.g. 'station'.
+        entities_by_value (dict): A mapping of field value to the list of entity names it belongs to.
+        root_dir (str): The root directory of the columnar raw store.
+
+    Returns:
+        dict: The number of records stored per entity, or None if the fetch failed part-way.
+    """
+    def split_page(page_df):
+        for value, value_df in page_df.groupby(field, sort=False):
+            for entity_name in entities_by_value.get(value, []):
+                yield entity_name, value_df
+
+    return _write_partitioned_pages(pages, source, root_dir, split_page)
+
+def read_raw_partitions(source, entity_name, root_dir, start_date, end_date, columns=None):
+    """
+    Reads the raw records of one city or balancing authority for a date range from the
+    columnar raw store. Only the month partitions overlapping the range are opened, and
+    only the requested columns are read from them.
+
+    Args:
+        source (str): 'noaa' or 'eia'.
+        entity_name (str): The city name (NOAA) or balancing authority code (EIA).
+        root_dir (str): The root directory of the columnar raw store.
+        start_date (str): The first date to include (YYYY-MM-DD).
+        end_date (str): The last date to include (YYYY-MM-DD).
+        columns (list, optional): The columns to read. Defaults to all columns.
+
+    Returns:
+        pd.DataFrame: The matching raw records (empty if none are stored).
+    """
+    date_field = SOURCE_SCHEMAS[source]['date_field']
+    read_columns = None if columns is None else list(dict.fromkeys([date_field] + list(columns)))
+    months = pd.period_range(start=start_date, end=end_date, freq='M')
+
+    frames = []
+    for period in months:
+        path = _partition_path(root_dir, source, entity_name, period.year, period.month)
+        if os.path.exists(path):
+            frames.append(pd.read_parquet(path, columns=read_columns))
+
+    if not frames:
+        return pd.DataFrame(columns=read_columns or [date_field])
+
+    df = pd.concat(frames, ignore_index=True)
+    record_dates = df[date_field].str.slice(0, 10)
+    df = df[(record_dates >= start_date) & (record_dates <= end_date)]
+    logging.info(f"Read {len(df)} {source.upper()} records for {entity_name} from {len(frames)} columnar partitions.")
+    return df.reset_index(drop=True) if columns is None else df[list(columns)].reset_index(drop=True)
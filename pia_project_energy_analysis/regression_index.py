@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from .schema import export_measurements
+
+# The temperature metrics the dashboard offers; 'AVG' is the mean of TMAX and TMIN.
+REGRESSION_METRICS = ['TMAX', 'TMIN', 'AVG']
+# Sufficient statistics of a least-squares fit of energy (y) on temperature (x), over the days with both values.
+SUM_NAMES = ['n', 'sum_x', 'sum_y', 'sum_xx', 'sum_yy', 'sum_xy']
+
+def prefix_sum_columns(metric):
+    """Returns the prefix sum columns of a temperature metric ('TMAX', 'TMIN' or 'AVG'), in the order of `SUM_NAMES`."""
+    if metric not in REGRESSION_METRICS:
+        raise ValueError(f"Unknown temperature metric '{metric}'. Expected one of {REGRESSION_METRICS}.")
+    return [f"{name}_{metric}" for name in SUM_NAMES]
+
+PREFIX_SUM_COLUMNS = [column for metric in REGRESSION_METRICS for column in prefix_sum_columns(metric)]
+
+def build_prefix_sums(df, base=None):
+    """
+    Builds the running totals of `SUM_NAMES` for every temperature metric, per city and date,
+    so the sums over any date range are the difference of two rows.
+
+    Args:
+        df (pd.DataFrame): Daily rows with 'city', 'date', 'TMAX_F', 'TMIN_F' and 'energy_mwh'.
+        base (sequence, optional): Totals (in the order of `PREFIX_SUM_COLUMNS`) the running
+            totals continue from, when `df` holds one city's rows from some date on.
+
+    Returns:
+        pd.DataFrame: 'city', 'date' and `PREFIX_SUM_COLUMNS`, sorted by city and date.
+    """
+    df = export_measurements(df.dropna(subset=['date']))
+    df = df.assign(city=df['city'].astype(str)).sort_values(['city', 'date'], kind='stable')
+    temperatures = {'TMAX': df['TMAX_F'].to_numpy('float64'), 'TMIN': df['TMIN_F'].to_numpy('float64')}
+    temperatures['AVG'] = (temperatures['TMAX'] + temperatures['TMIN']) / 2
+    y = df['energy_mwh'].to_numpy('float64')
+
+    terms = {}
+    for metric, x in temperatures.items():
+        paired = ~np.isnan(x) & ~np.isnan(y)
+        x_paired, y_paired = np.where(paired, x, 0.0), np.where(paired, y, 0.0)
+        values = [paired.astype('float64'), x_paired, y_paired, x_paired * x_paired, y_paired * y_paired, x_paired * y_paired]
+        terms.update(zip(prefix_sum_columns(metric), values))
+
+    prefix_df = pd.DataFrame(terms, index=df.index).groupby(df['city'].to_numpy(), sort=False).cumsum()
+    if base is not None:
+        prefix_df += np.asarray(base, dtype='float64')
+    return pd.concat([df[['city', 'date']], prefix_df[PREFIX_SUM_COLUMNS]], axis=1).reset_index(drop=True)
+
+def prefix_sums_by_city(prefix_df):
+    """Splits prefix sums into each city's dates and a (days x `PREFIX_SUM_COLUMNS`) array, for `window_sums`."""
+    return {
+        city: (city_df['date'].to_numpy('datetime64[s]'), city_df[PREFIX_SUM_COLUMNS].to_numpy('float64'))
+        for city, city_df in prefix_df.groupby('city', sort=True)
+    }
+
+def window_sums(prefixes_by_city, start_date, end_date, metric, city=None):
+    """
+    Returns each city's sums over a date range: its running totals on the last day up to
+    `end_date` minus those on the last day before `start_date`. Each city costs two binary
+    searches, whatever the number of days in the range.
+
+    Args:
+        prefixes_by_city (dict): The per-city prefix sums of `prefix_sums_by_city`.
+        start_date (str): The first date to include (YYYY-MM-DD).
+        end_date (str): The last date to include (YYYY-MM-DD).
+        metric (str): 'TMAX', 'TMIN' or 'AVG'.
+        city (str, optional): Restricts the sums to one city. Defaults to all cities.
+
+    Returns:
+        pd.DataFrame: 'city' and `SUM_NAMES`, one row per city with days in the range.
+    """
+    first_column = PREFIX_SUM_COLUMNS.index(prefix_sum_columns(metric)[0])
+    metric_columns = slice(first_column, first_column + len(SUM_NAMES))
+    start, end = np.datetime64(pd.Timestamp(start_date), 's'), np.datetime64(pd.Timestamp(end_date), 's')
+    rows = []
+    for city_name, (dates, prefixes) in prefixes_by_city.items():
+        if city is not None and city_name != city:
+            continue
+        last = np.searchsorted(dates, end, side='right') - 1
+        before = np.searchsorted(dates, start, side='left') - 1
+        if last <= before:
+            continue
+        sums = prefixes[last, metric_columns]
+        if before >= 0:
+            sums = sums - prefixes[before, metric_columns]
+        rows.append([city_name, *sums])
+    return pd.DataFrame(rows, columns=['city'] + SUM_NAMES)
+
+def row_sums(df, temp_col):
+    """Returns each city's regression sums straight from daily rows with 'city', `temp_col` and 'energy_mwh', in the shape of `window_sums`."""
+    x = df[temp_col].astype('float64')
+    y = df['energy_mwh'].astype('float64')
+    paired = x.notna() & y.notna()
+    x, y = x[paired], y[paired]
+    terms = pd.DataFrame({'n': 1.0, 'sum_x': x, 'sum_y': y, 'sum_xx': x * x, 'sum_yy': y * y, 'sum_xy': x * y})
+    return terms.groupby(df.loc[paired, 'city'].astype(str).to_numpy(), sort=True).sum().rename_axis('city').reset_index()
+
+def regression_from_sums(sums):
+    """
+    Fits energy = intercept + slope * temperature by least squares from sufficient statistics,
+    with the same slope, intercept and R-squared as an OLS fit with a constant over the rows.
+
+    Args:
+        sums (pd.DataFrame): One row per group (e.g. per city) with the columns of `SUM_NAMES`.
+
+    Returns:
+        pd.DataFrame: 'n', 'slope', 'intercept', 'r_squared' and 'r' per row; NaN where a
+                      group has fewer than two days or no spread in temperature.
+    """
+    n = sums['n'].to_numpy('float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sxx = sums['sum_xx'].to_numpy('float64') - sums['sum_x'].to_numpy('float64') ** 2 / n
+        syy = sums['sum_yy'].to_numpy('float64') - sums['sum_y'].to_numpy('float64') ** 2 / n
+        sxy = sums['sum_xy'].to_numpy('float64') - sums['sum_x'].to_numpy('float64') * sums['sum_y'].to_numpy('float64') / n
+        defined = (n >= 2) & (sxx > 0)
+        slope = np.where(defined, sxy / sxx, np.nan)
+        intercept = np.where(defined, (sums['sum_y'].to_numpy('float64') - slope * sums['sum_x'].to_numpy('float64')) / n, np.nan)
+        r = np.where(defined & (syy > 0), sxy / np.sqrt(sxx * syy), np.nan)
+    return pd.DataFrame({'n': n.astype('int64'), 'slope': slope, 'intercept': intercept, 'r_squared': r ** 2, 'r': r}, index=sums.index)
@@ -0,0 +1,236 @@
+import os
+import json
+import logging
+from datetime import datetime
+import pandas as pd
+from .atomic_files import write_atomically, write_json_atomically
+from .schema import DATE_DTYPE, TEMPERATURE_DTYPE, MEASUREMENT_DTYPES, MEASUREMENT_DECIMALS
+
+# Rollups are stored as one CSV file per year of their period start, next to a manifest, so an
+# incremental run rewrites only the years its new dates fall into.
+ROLLUPS_DIRNAME = 'rollups'
+ROLLUPS_MANIFEST_FILENAME = 'manifest.json'
+LEGACY_ROLLUPS_FILENAME = 'rollups.csv'
+# Period frequency of each level of detail, finest first, and the days one point covers.
+ROLLUP_LEVELS = {'daily': 'D', 'weekly': 'W', 'monthly': 'M'}
+DAYS_PER_POINT = {'daily': 1, 'weekly': 7, 'monthly': 30.44}
+ROLLUP_VALUE_COLUMNS = ['TMAX_F', 'TMIN_F', 'temp_avg', 'energy_mwh']
+ROLLUP_COLUMNS = ['level', 'scope', 'key', 'period'] + ROLLUP_VALUE_COLUMNS + ['days']
+ROLLUP_SORT_COLUMNS = ['level', 'scope', 'key', 'period']
+ALL_CITIES_KEY = 'All Cities'
+# The most points a time-series chart sends to the browser, over all of its series.
+MAX_CHART_POINTS = 5000
+
+def _period_starts(dates, level):
+    """Returns the start of the `level` period each date falls in."""
+    if level == 'daily':
+        return dates
+    return dates.dt.to_period(ROLLUP_LEVELS[level]).dt.start_time.astype(DATE_DTYPE)
+
+def _period_ends(dates, level):
+    """Returns the last day of the `level` period each date falls in."""
+    if level == 'daily':
+        return dates
+    return dates.dt.to_period(ROLLUP_LEVELS[level]).dt.end_time.dt.normalize().astype(DATE_DTYPE)
+
+def _rollup(daily_df, keys, level):
+    """Averages daily rows over the periods of `level`, per `keys`, counting the days each period has rows for."""
+    daily_df = daily_df.assign(period=_period_starts(daily_df['date'], level))
+    grouped = daily_df.groupby(keys + ['period'], observed=True)
+    rolled = grouped[ROLLUP_VALUE_COLUMNS].mean()
+    rolled['days'] = grouped['date'].size()
+    return rolled.reset_index()
+
+def build_rollups(master_df):
+    """
+    Builds the time-series rollups of the master data: weekly and monthly means per city, and
+    daily, weekly and monthly means per balancing authority and over all cities. The daily
+    rows per city are the master data itself, so they are not repeated here.
+
+    Cities of one balancing authority share its demand, so a balancing authority's daily energy
+    is counted once and its temperatures are the mean of its cities. The all-city energy is the
+    daily total over cities, as the dashboard charts it; its weekly and monthly rows are the
+    mean daily total.
+
+    Args:
+        master_df (pd.DataFrame): The master data in the compact master schema.
+
+    Returns:
+        pd.DataFrame: Rollup rows with the columns of `ROLLUP_COLUMNS`. 'scope' is 'city', 'ba'
+                      or 'all', and 'key' the city, the balancing authority code or 'All Cities'.
+    """
+    df = master_df.dropna(subset=['date'])
+    df = pd.DataFrame({
+        'date': df['date'],
+        'city': df['city'],
+        'ba_code': df['ba_code'],
+        'TMAX_F': df['TMAX_F'].astype('float64'),
+        'TMIN_F': df['TMIN_F'].astype('float64'),
+        'energy_mwh': df['energy_mwh'].astype('float64')
+    })
+    df['temp_avg'] = (df['TMAX_F'] + df['TMIN_F']) / 2
+
+    ba_days = df.dropna(subset=['ba_code']).groupby(['ba_code', 'date'], observed=True)[ROLLUP_VALUE_COLUMNS].mean().reset_index()
+    all_days = df.groupby('date')[['TMAX_F', 'TMIN_F', 'temp_avg']].mean()
+    all_days['energy_mwh'] = df.groupby('date')['energy_mwh'].sum(min_count=1)
+    all_days = all_days.reset_index()
+
+    frames = []
+    for level in ROLLUP_LEVELS:
+        if level != 'daily':
+            frames.append(_rollup(df, ['city'], level).rename(columns={'city': 'key'}).assign(level=level, scope='city'))
+        frames.append(_rollup(ba_days, ['ba_code'], level).rename(columns={'ba_code': 'key'}).assign(level=level, scope='ba'))
+        frames.append(_rollup(all_days, [], level).assign(level=level, scope='all', key=ALL_CITIES_KEY))
+
+    rollups = pd.concat([frame.astype({'key': 'object'}) for frame in frames], ignore_index=True)
+    return rollups[ROLLUP_COLUMNS]
+
+def _rollup_year_path(rollups_dir, year):
+    return os.path.join(rollups_dir, f"year={year:04d}.csv")
+
+def _write_rollup_year(rollups_dir, year, rows):
+    rows = rows[ROLLUP_COLUMNS].sort_values(ROLLUP_SORT_COLUMNS, kind='stable')
+    write_atomically(_rollup_year_path(rollups_dir, year), lambda path: rows.round({column: MEASUREMENT_DECIMALS for column in ROLLUP_VALUE_COLUMNS}).to_csv(path, index=False))
+
+def _read_rollup_year(path):
+    dtypes = {column: 'category' for column in ['level', 'scope', 'key']}
+    dtypes.update({column: MEASUREMENT_DTYPES.get(column, TEMPERATURE_DTYPE) for column in ROLLUP_VALUE_COLUMNS})
+    rollups = pd.read_csv(path, dtype=dtypes, parse_dates=['period'])
+    return rollups.astype({'period': DATE_DTYPE})
+
+def _write_rollups_manifest(rollups_dir, city_names, years):
+    manifest = {
+        "updated_at": datetime.now().isoformat(timespec='seconds'),
+        "cities": sorted(city_names),
+        "years": sorted(years)
+    }
+    write_json_atomically(os.path.join(rollups_dir, ROLLUPS_MANIFEST_FILENAME), manifest, indent=4)
+
+def load_rollups_manifest(rollups_dir):
+    """Returns the manifest of the rollups (cities, years and updated_at), or None if they have not been written yet or it cannot be read."""
+    path = os.path.join(rollups_dir, ROLLUPS_MANIFEST_FILENAME)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logging.warning(f"Could not read the rollups manifest at {path}: {e}")
+        return None
+
+def write_rollups(master_df, output_dir, city_names=None):
+    """
+    Builds the rollups of the master data (see `build_rollups`) and atomically writes them to
+    `rollups/year=YYYY.csv` in `output_dir`, one file per year, replacing any previous rollups.
+
+    Args:
+        master_df (pd.DataFrame): The master data in the compact master schema.
+        output_dir (str): The output directory, next to the master data.
+        city_names (iterable, optional): The configured cities the rollups are built for, as
+            recorded in the manifest. Defaults to the cities of `master_df`.
+
+    Returns:
+        int: The number of rollup rows written.
+    """
+    rollups = build_rollups(master_df)
+    rollups_dir = os.path.join(output_dir, ROLLUPS_DIRNAME)
+    years = set()
+    for year, year_rows in rollups.groupby(rollups['period'].dt.year):
+        _write_rollup_year(rollups_dir, int(year), year_rows)
+        years.add(int(year))
+
+    for filename in os.listdir(rollups_dir) if os.path.isdir(rollups_dir) else []:
+        if filename.startswith('year=') and filename.endswith('.csv') and int(filename[5:9]) not in years:
+            os.remove(os.path.join(rollups_dir, filename))
+    legacy_path = os.path.join(output_dir, LEGACY_ROLLUPS_FILENAME)
+    if os.path.exists(legacy_path):
+        os.remove(legacy_path)
+
+    if city_names is None:
+        city_names = master_df['city'].dropna().astype(str).unique().tolist()
+    _write_rollups_manifest(rollups_dir, city_names, years)
+    logging.info(f"Saved {len(rollups)} daily, weekly and monthly rollup rows in {len(years)} yearly files to {rollups_dir}.")
+    return len(rollups)
+
+def update_rollups(new_df, output_dir, city_names, read_rows):
+    """
+    Recomputes only the rollup periods (days, weeks and months) that the new rows' dates fall
+    into, and rewrites only the yearly files holding them. Rows of other periods are kept as
+    they are.
+
+    Args:
+        new_df (pd.DataFrame): The rows processed in this run.
+        output_dir (str): The output directory holding the rollups.
+        city_names (iterable): The configured cities.
+        read_rows (callable): `read_rows(start_date, end_date)` returns the master rows of every
+            city over a date range (in the compact master schema), including the new rows.
+
+    Returns:
+        int: The number of rollup rows recomputed, or None if the rollups must be built in full
+             with `write_rollups`: when they do not exist yet or were built for other cities.
+    """
+    rollups_dir = os.path.join(output_dir, ROLLUPS_DIRNAME)
+    manifest = load_rollups_manifest(rollups_dir)
+    if manifest is None or set(manifest.get('cities', [])) != set(city_names):
+        return None
+
+    dates = pd.to_datetime(new_df['date']).dropna() if 'date' in new_df.columns else pd.Series(dtype=DATE_DTYPE)
+    if dates.empty:
+        return 0
+    dates = pd.Series(dates.unique()).astype(DATE_DTYPE)
+    touched = pd.concat([pd.DataFrame({'level': level, 'period': _period_starts(dates, level)}) for level in ROLLUP_LEVELS], ignore_index=True).drop_duplicates()
+    touched_index = pd.MultiIndex.from_frame(touched)
+    window_start = touched['period'].min()
+    window_end = max(_period_ends(dates, level).max() for level in ROLLUP_LEVELS)
+
+    # Periods at the edges of the window that no new date falls into are only partly read, so only the touched ones are kept.
+    rebuilt = build_rollups(read_rows(window_start.strftime('%Y-%m-%d'), window_end.strftime('%Y-%m-%d')))
+    rebuilt = rebuilt[pd.MultiIndex.from_arrays([rebuilt['level'], rebuilt['period']]).isin(touched_index)]
+
+    years = sorted(set(touched['period'].dt.year.astype(int)))
+    for year in years:
+        path = _rollup_year_path(rollups_dir, year)
+        year_rows = rebuilt[rebuilt['period'].dt.year == year]
+        if os.path.exists(path):
+            existing = _read_rollup_year(path)
+            replaced = pd.MultiIndex.from_arrays([existing['level'].astype(str), existing['period']]).isin(touched_index)
+            year_rows = pd.concat([existing[~replaced].astype({'level': 'object', 'scope': 'object', 'key': 'object'}), year_rows], ignore_index=True)
+        _write_rollup_year(rollups_dir, year, year_rows)
+
+    _write_rollups_manifest(rollups_dir, city_names, set(manifest.get('years', [])) | set(years))
+    logging.info(f"Recomputed {len(rebuilt)} rollup rows of {len(touched)} touched periods, rewriting {len(years)} yearly files in {rollups_dir}.")
+    return len(rebuilt)
+
+def read_rollups(rollups_dir):
+    """Reads the yearly rollup files with categorical level, scope and key and the master schema's value dtypes, or returns None if the rollups have not been written."""
+    manifest = load_rollups_manifest(rollups_dir)
+    if manifest is None:
+        return None
+    frames = [_read_rollup_year(path) for path in (_rollup_year_path(rollups_dir, year) for year in manifest.get('years', [])) if os.path.exists(path)]
+    if not frames:
+        return pd.DataFrame({column: pd.Series(dtype=DATE_DTYPE if column == 'period' else 'float64') for column in ROLLUP_COLUMNS}).astype({column: 'category' for column in ['level', 'scope', 'key']})
+    rollups = pd.concat([frame.astype({'level': 'object', 'scope': 'object', 'key': 'object'}) for frame in frames], ignore_index=True)
+    return rollups.astype({column: 'category' for column in ['level', 'scope', 'key']})
+
+def choose_rollup_level(start_date, end_date, series_count, max_points=MAX_CHART_POINTS):
+    """
+    Returns the finest level of detail at which `series_count` series over the date range
+    stay within `max_points` chart points, or 'monthly' if none does.
+    """
+    span_days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    for level, days_per_point in DAYS_PER_POINT.items():
+        if series_count * span_days / days_per_point <= max_points:
+            return level
+    return 'monthly'
+
+def select_rollup_rows(rollups, level, scope, start_date, end_date, key=None):
+    """
+    Returns the rollup rows of one level and scope whose periods overlap the date range, so
+    the first week or month of a range starting mid-period is included. With `key`, only
+    the rows of that city, balancing authority or 'All Cities' are returned.
+    """
+    first_period = _period_starts(pd.Series([pd.Timestamp(start_date)]).astype(DATE_DTYPE), level).iloc[0]
+    in_range = (rollups['level'] == level) & (rollups['scope'] == scope) & rollups['period'].between(first_period, pd.Timestamp(end_date))
+    if key is not None:
+        in_range &= rollups['key'] == key
+    return rollups[in_range]
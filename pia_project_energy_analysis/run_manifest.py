@@ -0,0 +1,110 @@
+import os
+import json
+import logging
+import threading
+from datetime import datetime
+from .atomic_files import write_json_atomically
+
+RUN_MANIFEST_FILENAME = 'run_manifest.json'
+
+class RunManifest:
+    """
+    Records the fetch units a pipeline run has completed, so an interrupted run can be resumed
+    without fetching them again. A unit is one source ('noaa' or 'eia') for one city over one
+    date range, and is complete once its raw records are stored on disk. The manifest is saved
+    atomically after every completed unit, and is thread-safe, as fetchers report from I/O threads.
+
+    Args:
+        path (str): The path of the manifest file.
+        settings (dict): The run settings that decide where and how raw data is stored
+            (date range, raw format, ...). A run is only resumed with identical settings.
+        completed_units (list, optional): Units carried over from the interrupted run.
+    """
+    def __init__(self, path, settings, completed_units=None):
+        self.path = path
+        self.settings = settings
+        self.started_at = datetime.now().isoformat(timespec='seconds')
+        self.status = 'running'
+        self._units = {self._unit_key(**unit): unit for unit in (completed_units or [])}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _unit_key(source, city, start_date, end_date, **_):
+        return (source, city, start_date, end_date)
+
+    @property
+    def resumed(self):
+        """True if this run carries over units completed by an interrupted run."""
+        return bool(self._units)
+
+    def is_complete(self, source, city_name, start_date, end_date):
+        """Returns True if the source's data for the city and date range is already stored."""
+        with self._lock:
+            return (source, city_name, start_date, end_date) in self._units
+
+    def mark_complete(self, source, city_names, start_date, end_date):
+        """Records the source's data for the cities and date range as stored, and saves the manifest."""
+        completed_at = datetime.now().isoformat(timespec='seconds')
+        with self._lock:
+            for city_name in city_names:
+                unit = {'source': source, 'city': city_name, 'start_date': start_date, 'end_date': end_date, 'completed_at': completed_at}
+                self._units[self._unit_key(**unit)] = unit
+            self._write()
+
+    def finish(self):
+        """Marks the run as finished, so a later `--resume` starts a fresh run."""
+        with self._lock:
+            self.status = 'complete'
+            self._write()
+
+    def save(self):
+        """Saves the manifest."""
+        with self._lock:
+            self._write()
+
+    def _write(self):
+        write_json_atomically(self.path, {
+            'settings': self.settings,
+            'status': self.status,
+            'started_at': self.started_at,
+            'completed_units': sorted(self._units.values(), key=lambda unit: self._unit_key(**unit))
+        }, indent=4)
+
+def start_run_manifest(output_dir, settings, resume=False):
+    """
+    Starts the run manifest of a pipeline run. With `resume`, the completed units of the
+    previous run are carried over, provided it was interrupted (not finished) and used the
+    same settings; otherwise the run starts from scratch.
+
+    Args:
+        output_dir (str): The directory holding the master data and the manifest file.
+        settings (dict): The run settings (see `RunManifest`).
+        resume (bool, optional): Resume the previous run if possible. Defaults to False.
+
+    Returns:
+        RunManifest: The manifest of this run, already saved.
+    """
+    path = os.path.join(output_dir, RUN_MANIFEST_FILENAME)
+    completed_units = []
+    if resume:
+        previous = None
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    previous = json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                logging.warning(f"Could not read the run manifest at {path}: {e}")
+
+        if previous is None:
+            logging.info("Resume requested, but no interrupted run was recorded. Starting a fresh run.")
+        elif previous.get('status') == 'complete':
+            logging.info("Resume requested, but the previous run finished. Starting a fresh run.")
+        elif previous.get('settings') != settings:
+            logging.warning(f"Resume requested, but the previous run used different settings ({previous.get('settings')}). Starting a fresh run.")
+        else:
+            completed_units = previous.get('completed_units', [])
+            logging.info(f"Resuming the run started at {previous.get('started_at')}: {len(completed_units)} completed fetch units will not be fetched again.")
+
+    run_manifest = RunManifest(path, settings, completed_units)
+    run_manifest.save()
+    return run_manifest
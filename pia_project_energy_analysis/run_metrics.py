@@ -0,0 +1,173 @@
+import os
+import time
+import logging
+import threading
+import contextlib
+import contextvars
+from datetime import datetime
+import numpy as np
+from .atomic_files import write_json_atomically
+
+RUN_METRICS_FILENAME = 'run_metrics.json'
+
+_lock = threading.Lock()
+_spans = []
+_run = {'started_at': time.time(), 'active': False}
+_captured_spans = contextvars.ContextVar('captured_spans', default=None)
+
+def start_run_metrics():
+    """
+    Discards the spans of any previous run and starts recording a new one. Outside a run
+    (e.g. in the dashboard) spans are timed but not kept, so they cannot pile up.
+    """
+    with _lock:
+        _spans.clear()
+        _run.update(started_at=time.time(), active=True)
+
+def _add_span(record):
+    captured = _captured_spans.get()
+    if captured is not None:
+        captured.append(record)
+        return
+    with _lock:
+        if _run['active']:
+            _spans.append(record)
+
+def record_span(name, seconds, started_at=None, **tags):
+    """
+    Records a span that was timed elsewhere, such as the wait before a retry.
+
+    Args:
+        name (str): The span name, e.g. 'retry'.
+        seconds (float): The duration of the span.
+        started_at (float, optional): The start as a Unix timestamp. Defaults to `seconds` ago.
+        **tags: Attributes of the span (source, city, rows, bytes, ...).
+    """
+    if started_at is None:
+        started_at = time.time() - seconds
+    _add_span({'name': name, 'started_at': round(started_at, 4), 'seconds': round(seconds, 6), **tags})
+
+@contextlib.contextmanager
+def span(name, **tags):
+    """
+    Times the enclosed block as a span. The yielded dictionary holds the span's tags, so
+    the block can add tags it only learns while running (rows, bytes, status, ...).
+    If the block raises, the span is tagged with the exception type and the error re-raised.
+    """
+    started_at = time.time()
+    started = time.perf_counter()
+    try:
+        yield tags
+    except BaseException as e:
+        tags['error'] = type(e).__name__
+        raise
+    finally:
+        record_span(name, time.perf_counter() - started, started_at=started_at, **tags)
+
+def _row_count(result):
+    if isinstance(result, tuple):
+        result = result[0] if result else None
+    if isinstance(result, int):
+        return result
+    return len(result) if hasattr(result, '__len__') else None
+
+def run_in_span(name, tags, function, *args):
+    """
+    Process-pool task wrapper: runs `function(*args)` inside a span tagged with the result's
+    row count. Spans recorded in a worker process are not visible to the pipeline, so they
+    are returned with the result and added back with `add_spans`.
+
+    Returns:
+        tuple: The function's result and the list of spans recorded while it ran.
+    """
+    token = _captured_spans.set([])
+    try:
+        with span(name, **tags) as span_tags:
+            result = function(*args)
+            rows = _row_count(result)
+            if rows is not None:
+                span_tags['rows'] = rows
+        return result, _captured_spans.get()
+    finally:
+        _captured_spans.reset(token)
+
+def add_spans(spans):
+    """Adds spans recorded elsewhere (see `run_in_span`) to the current run."""
+    with _lock:
+        _spans.extend(spans)
+
+def summarize_spans(spans):
+    """
+    Aggregates spans per name and source. Spans without a source (HTTP requests and
+    retries) are grouped by host instead.
+
+    Returns:
+        list: One dictionary per (name, source) with the count, total and p50/p95/max
+              seconds, and the summed rows, bytes and errors.
+    """
+    groups = {}
+    for record in spans:
+        groups.setdefault((record['name'], record.get('source') or record.get('host', '')), []).append(record)
+
+    summary = []
+    for (name, source), records in sorted(groups.items()):
+        seconds = np.array([record['seconds'] for record in records])
+        summary.append({
+            'name': name,
+            'source': source,
+            'count': len(records),
+            'total_seconds': round(float(seconds.sum()), 4),
+            'p50_seconds': round(float(np.percentile(seconds, 50)), 4),
+            'p95_seconds': round(float(np.percentile(seconds, 95)), 4),
+            'max_seconds': round(float(seconds.max()), 4),
+            'rows': sum(record.get('rows', 0) for record in records),
+            'bytes': sum(record.get('bytes', 0) for record in records),
+            'errors': sum(1 for record in records if 'error' in record)
+        })
+    return summary
+
+def write_run_metrics(output_dir, transport_stats=None):
+    """
+    Ends the run, and writes its spans, their per-stage summary and the HTTP transport
+    counters to `run_metrics.json` in `output_dir`, next to the data quality report.
+    Span start times are stored as seconds since the start of the run.
+
+    Args:
+        output_dir (str): The output directory of the run.
+        transport_stats (dict, optional): Per-host counters from `get_transport_stats`.
+
+    Returns:
+        dict: The metrics that were written.
+    """
+    with _lock:
+        started_at = _run['started_at']
+        spans = sorted(_spans, key=lambda record: record['started_at'])
+        _spans.clear()
+        _run['active'] = False
+    finished_at = time.time()
+    metrics = {
+        'started_at': datetime.fromtimestamp(started_at).isoformat(timespec='seconds'),
+        'finished_at': datetime.fromtimestamp(finished_at).isoformat(timespec='seconds'),
+        'wall_seconds': round(finished_at - started_at, 3),
+        'summary': summarize_spans(spans),
+        'transport': transport_stats or {},
+        'spans': [dict(record, started_at=round(record['started_at'] - started_at, 4)) for record in spans]
+    }
+    path = os.path.join(output_dir, RUN_METRICS_FILENAME)
+    write_json_atomically(path, metrics, indent=2)
+    logging.info(f"Saved {len(spans)} timing spans to {path}.")
+    return metrics
+
+def format_metrics_summary(metrics):
+    """Formats the per-stage summary of `write_run_metrics` as a table for the end of a run."""
+    lines = [
+        f"Run finished in {metrics['wall_seconds']:.1f}s.",
+        f"{'stage':<16} {'source':<16} {'count':>7} {'total s':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'rows':>10} {'MB':>8} {'errors':>6}"
+    ]
+    for stage in metrics['summary']:
+        lines.append(
+            f"{stage['name']:<16} {stage['source']:<16} {stage['count']:>7} {stage['total_seconds']:>9.2f} "
+            f"{stage['p50_seconds'] * 1000:>9.1f} {stage['p95_seconds'] * 1000:>9.1f} {stage['max_seconds'] * 1000:>9.1f} "
+            f"{stage['rows']:>10} {stage['bytes'] / 1e6:>8.2f} {stage['errors']:>6}"
+        )
+    return "\n".join(lines)
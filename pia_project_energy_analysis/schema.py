@@ -0,0 +1,112 @@
+import logging
+import numpy as np
+import pandas as pd
+
+# The canonical in-memory schema of the master data, shared by the pipeline and the dashboard.
+# City and balancing authority repeat on every row, so they are categoricals; float32 holds the
+# two-decimal temperatures, but daily balancing authority totals reach tens of millions of MWh,
+# past the 16.7 million up to which float32 holds whole numbers exactly, so energy stays
+# float64; pandas has no day resolution for datetime64, so dates use seconds, its coarsest unit.
+MASTER_COLUMNS = ['date', 'TMAX_F', 'TMIN_F', 'energy_mwh', 'city', 'ba_code']
+MEASUREMENT_COLUMNS = ['TMAX_F', 'TMIN_F', 'energy_mwh']
+TEMPERATURE_DTYPE = 'float32'
+ENERGY_DTYPE = 'float64'
+MEASUREMENT_DTYPES = {'TMAX_F': TEMPERATURE_DTYPE, 'TMIN_F': TEMPERATURE_DTYPE, 'energy_mwh': ENERGY_DTYPE}
+DATE_DTYPE = 'datetime64[s]'
+MEASUREMENT_DECIMALS = 2
+
+_memory_report = []
+
+def apply_master_schema(df, ba_codes_by_city=None):
+    """
+    Converts master rows to the canonical compact schema: categorical 'city' and 'ba_code'
+    (with sorted categories, so sorting by city is unchanged), float32 temperatures, float64
+    energy and datetime64[s] dates. Missing columns are added empty; extra columns are kept at the end.
+
+    Args:
+        df (pd.DataFrame): Master rows, e.g. as read from the master CSV file.
+        ba_codes_by_city (dict, optional): A mapping of city name to balancing authority code.
+            When given, 'ba_code' is (re)derived from it.
+
+    Returns:
+        pd.DataFrame: The rows in the compact schema.
+    """
+    columns = {}
+    city = df['city'] if 'city' in df.columns else pd.Series(pd.NA, index=df.index, dtype='object')
+    city_names = sorted(set(city.dropna().astype(str)))
+    columns['city'] = city.astype(pd.CategoricalDtype(city_names))
+
+    if ba_codes_by_city is not None:
+        ba_code = columns['city'].map(ba_codes_by_city).astype('object')
+    elif 'ba_code' in df.columns:
+        ba_code = df['ba_code']
+    else:
+        ba_code = pd.Series(pd.NA, index=df.index, dtype='object')
+    columns['ba_code'] = ba_code.astype(pd.CategoricalDtype(sorted(set(ba_code.dropna().astype(str)))))
+
+    date = df['date'] if 'date' in df.columns else pd.Series(pd.NaT, index=df.index)
+    columns['date'] = pd.to_datetime(date).astype(DATE_DTYPE)
+    for column in MEASUREMENT_COLUMNS:
+        values = df[column] if column in df.columns else pd.Series(np.nan, index=df.index)
+        columns[column] = pd.to_numeric(values, errors='coerce').astype(MEASUREMENT_DTYPES[column])
+
+    extra_columns = [column for column in df.columns if column not in MASTER_COLUMNS]
+    compact_df = pd.DataFrame({column: columns[column] for column in MASTER_COLUMNS}, index=df.index)
+    return pd.concat([compact_df, df[extra_columns]], axis=1) if extra_columns else compact_df
+
+def export_measurements(df):
+    """
+    Returns the rows with the measurements as float64, rounded back to their two decimals, for
+    writers (CSV, SQLite) that would otherwise print float32 artifacts such as 85.0999984741211.
+    """
+    present = [column for column in MEASUREMENT_COLUMNS if column in df.columns]
+    return df.astype({column: 'float64' for column in present}).round({column: MEASUREMENT_DECIMALS for column in present})
+
+def frame_memory_bytes(df):
+    """Returns the memory used by a dataframe, including the contents of string columns."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+def record_memory_usage(stage, before_bytes, df):
+    """
+    Records and logs the memory a stage's frame uses in the compact schema, against its size
+    before conversion.
+
+    Args:
+        stage (str): The name of the stage, e.g. 'processed city files'.
+        before_bytes (int): The frame's memory use before conversion (see `frame_memory_bytes`).
+        df (pd.DataFrame): The converted frame.
+    """
+    after_bytes = frame_memory_bytes(df)
+    _memory_report.append({'stage': stage, 'rows': len(df), 'before_bytes': before_bytes, 'after_bytes': after_bytes})
+    reduction = (1 - after_bytes / before_bytes) * 100 if before_bytes else 0.0
+    logging.info(f"Memory for {stage}: {before_bytes / 1024 / 1024:.2f} MB -> {after_bytes / 1024 / 1024:.2f} MB ({reduction:.0f}% less) for {len(df)} rows.")
+
+def get_memory_report():
+    """Returns the recorded memory usage of every stage: stage, rows, before_bytes and after_bytes."""
+    return list(_memory_report)
+
+def log_memory_report():
+    """Logs a table of the memory used per stage before and after conversion to the compact schema."""
+    if not _memory_report:
+        return
+    lines = [f"{'stage':<28} {'rows':>10} {'before MB':>10} {'after MB':>9} {'saved':>6}"]
+    for entry in _memory_report:
+        reduction = (1 - entry['after_bytes'] / entry['before_bytes']) * 100 if entry['before_bytes'] else 0.0
+        lines.append(
+            f"{entry['stage']:<28} {entry['rows']:>10} {entry['before_bytes'] / 1024 / 1024:>10.2f} "
+            f"{entry['after_bytes'] / 1024 / 1024:>9.2f} {reduction:>5.0f}%"
+        )
+    logging.info("Master data memory report:\n" + "\n".join(lines))
+
+def measurement_round_trip_mismatches(df):
+    """
+    Returns, per measurement column, the number of values that change when master rows are
+    converted to the compact schema and exported again (see `apply_master_schema` and
+    `export_measurements`). Values are compared at their two decimals; a non-zero count
+    means a dtype is too narrow for the data.
+    """
+    present = [column for column in MEASUREMENT_COLUMNS if column in df.columns]
+    original = df[present].apply(pd.to_numeric, errors='coerce').round(MEASUREMENT_DECIMALS)
+    exported = export_measurements(apply_master_schema(df))[present]
+    changed = (original != exported) & ~(original.isna() & exported.isna())
+    return {column: int(changed[column].sum()) for column in present}
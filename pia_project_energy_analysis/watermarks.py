@@ -0,0 +1,84 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+import pandas as pd
+from .atomic_files import write_json_atomically
+
+WATERMARKS_FILENAME = 'watermarks.json'
+
+def load_watermarks(output_dir):
+    """
+    Loads the per-city, per-source watermarks saved by previous incremental runs.
+
+    Args:
+        output_dir (str): The directory holding the master data file and the watermarks file.
+
+    Returns:
+        dict: A mapping of city name to {source: last complete date (YYYY-MM-DD)}.
+              Returns an empty dict if no watermarks have been recorded yet.
+    """
+    path = os.path.join(output_dir, WATERMARKS_FILENAME)
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logging.warning(f"Could not read watermarks from {path}, falling back to a full fetch: {e}")
+        return {}
+
+def save_watermarks(output_dir, watermarks):
+    """Atomically saves the watermarks dictionary next to the master data file."""
+    path = os.path.join(output_dir, WATERMARKS_FILENAME)
+    write_json_atomically(path, watermarks, indent=4, sort_keys=True)
+    logging.info(f"Saved fetch watermarks for {len(watermarks)} cities to {path}")
+
+def get_incremental_start_date(watermarks, city_name, source, default_start_date):
+    """
+    Returns the first date that still needs to be fetched for a city and source.
+
+    Args:
+        watermarks (dict): The loaded watermarks.
+        city_name (str): The name of the city.
+        source (str): The data source, 'noaa' or 'eia'.
+        default_start_date (str): The start date (YYYY-MM-DD) to use when no watermark exists.
+
+    Returns:
+        str: The day after the recorded watermark, or `default_start_date` if there is none.
+    """
+    watermark = watermarks.get(city_name, {}).get(source)
+    if not watermark:
+        return default_start_date
+    next_day = datetime.strptime(watermark, '%Y-%m-%d') + timedelta(days=1)
+    return next_day.strftime('%Y-%m-%d')
+
+def last_complete_date(df, value_columns):
+    """
+    Returns the latest date in a processed dataframe that has data for any of the value columns.
+
+    Args:
+        df (pd.DataFrame or None): A processed dataframe with a 'date' column.
+        value_columns (list): The measurement columns to check (e.g. ['TMAX_F', 'TMIN_F']).
+
+    Returns:
+        str: The date in YYYY-MM-DD format, or None if the dataframe holds no data.
+    """
+    if df is None or df.empty:
+        return None
+    present_columns = [col for col in value_columns if col in df.columns]
+    if not present_columns:
+        return None
+    has_data = df[present_columns].notna().any(axis=1)
+    if not has_data.any():
+        return None
+    return pd.to_datetime(df.loc[has_data, 'date']).max().strftime('%Y-%m-%d')
+
+def advance_watermark(watermarks, city_name, source, new_date):
+    """Moves a city's watermark for a source forward to `new_date`. Watermarks never move backwards."""
+    if not new_date:
+        return
+    city_marks = watermarks.setdefault(city_name, {})
+    current = city_marks.get(source)
+    if current is None or new_date > current:
+        city_marks[source] = new_date
@@ -23,7 +23,10 @@ def run_pipeline(args):
         sys.path.insert(0, project_root)
 
         from pia_project_energy_analysis.pipeline import main as pipeline_main
-        pipeline_main(args)
+        from pia_project_energy_analysis.run_metrics import format_metrics_summary
+        run_metrics = pipeline_main(args)
+        if run_metrics:
+            logging.info(f"Stage timings (details in data/output/run_metrics.json):\n{format_metrics_summary(run_metrics)}")
         logging.info("--- Data Pipeline Finished Successfully ---")
         return True
     except Exception as e:
@@ -54,11 +57,35 @@ def main():
     group.add_argument("--fetch-daily", action="store_true", help="Fetch data for the last full day (yesterday).")
     group.add_argument("--fetch-range", nargs=2, metavar=('START_DATE', 'END_DATE'), help="Fetch data for a specific date range (YYYY-MM-DD).")
 
+    parser.add_argument(
+        '--incremental',
+        action='store_true',
+        help="Only fetch dates after each city's last complete date (its watermark) and upsert them into the existing master data."
+    )
+
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help="Resume an interrupted run with the same settings, skipping the fetches it already completed (see data/output/run_manifest.json)."
+    )
+
+    parser.add_argument(
+        '--offline',
+        action='store_true',
+        help='Replay API responses from the local HTTP cache only, without making any network requests.'
+    )
+
+    parser.add_argument(
+        '--export-master-csv',
+        action='store_true',
+        help='Regenerate the master CSV file from the partitioned master dataset or the analytic store, without fetching, and exit.'
+    )
+
     args = parser.parse_args()
 
     pipeline_success = run_pipeline(args)
 
-    if not args.pipeline_only:
+    if not (args.pipeline_only or args.export_master_csv):
         if pipeline_success:
             run_dashboard()
         else: